@@ -0,0 +1,340 @@
+'''
+多进程/多机部署时共享连接与绑定关系并转发消息的背板
+- InMemoryBackplane : 单进程，所有连接都在本地，不做任何转发
+- SocketBackplane : 各 worker 通过 Unix 域套接字或 TCP 连接到同一个 BackplaneBroker，
+  broker 向所有 worker 广播上线、下线与绑定事件，每个 worker 保存一份全局副本用于同步查询，
+  发往其他 worker 上连接的消息经 broker 转发给该连接所在的 worker
+在 src 目录下可单独运行 broker: python -m backplane [地址]
+'''
+import asyncio
+import json
+import os
+import sys
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+import config
+import custom_logger
+from client_registry import ClientRegistry
+
+LINE_LIMIT = 1024 * 1024
+CONNECT_RETRY_TIME = 10
+RECONNECT_DELAY = 0.2  # 与 broker 断开后首次重连的等待秒数，之后按指数退避
+RECONNECT_MAX_DELAY = 5
+WRITE_BUFFER_LIMIT = 4 * 1024 * 1024  # 单个连接待发送的字节数超过该值时丢弃转发的消息
+CONTROL_BUFFER_FACTOR = 4  # 待发送字节数超过上限的该倍数时连上线、绑定等事件也无法送达，直接断开由 worker 重连同步
+
+DeliverCallback = Callable[[str, str, int, Optional[str]], Awaitable[None]]
+
+
+def parse_address(address: str) -> Tuple[str, str, int]:
+    '''
+    含 "/" 的地址视为 Unix 域套接字路径，否则为 host:port
+    '''
+    if "/" in address or os.sep in address:
+        return "unix", address, 0
+    host, _, port = address.rpartition(":")
+    return "tcp", host or "127.0.0.1", int(port)
+
+
+async def open_connection(address: str):
+    family, host, port = parse_address(address)
+    if family == "unix":
+        return await asyncio.open_unix_connection(host, limit=LINE_LIMIT)
+    return await asyncio.open_connection(host, port, limit=LINE_LIMIT)
+
+
+async def start_server(handle, address: str):
+    family, host, port = parse_address(address)
+    if family == "unix":
+        if os.path.exists(host):
+            os.remove(host)
+        return await asyncio.start_unix_server(handle, host, limit=LINE_LIMIT)
+    return await asyncio.start_server(handle, host, port, limit=LINE_LIMIT)
+
+
+def encode_event(event: dict) -> bytes:
+    return (json.dumps(event, ensure_ascii=False, separators=(",", ":")) + "\n").encode()
+
+
+class EventWriter:
+    '''
+    背板连接的写入端，按传输层待发送的字节数限制缓冲，对端读取慢时不会无限占用内存
+    - 转发的消息超过 WRITE_BUFFER_LIMIT 时丢弃并计数
+    - 上线、下线与绑定事件不能丢弃，超过上限的 CONTROL_BUFFER_FACTOR 倍时断开连接，重连后重新同步全部状态
+    '''
+
+    def __init__(self, writer: asyncio.StreamWriter, name: str, buffer_limit: int = WRITE_BUFFER_LIMIT):
+        self.writer = writer
+        self.name = name
+        self.buffer_limit = buffer_limit
+        self.dropped_count = 0
+        self.dropping = False
+
+    def is_closing(self) -> bool:
+        return self.writer.is_closing()
+
+    def close(self):
+        self.writer.close()
+
+    def write(self, data: bytes, droppable: bool = False) -> bool:
+        if self.writer.is_closing():
+            return False
+        buffer_size = self.writer.transport.get_write_buffer_size()
+        if buffer_size >= self.buffer_limit:
+            if droppable:
+                self.dropped_count += 1
+                if not self.dropping:
+                    self.dropping = True
+                    custom_logger.warning(f"【Backplane】 {self.name} is not reading, dropping relayed messages")
+                return False
+            if buffer_size >= self.buffer_limit * CONTROL_BUFFER_FACTOR:
+                custom_logger.warning(f"【Backplane】 {self.name} write buffer exceeds {buffer_size} bytes, disconnecting")
+                self.writer.close()
+                return False
+        elif self.dropping:
+            self.dropping = False
+            custom_logger.warning(f"【Backplane】 {self.name} resumed, {self.dropped_count} relayed messages dropped in total")
+        self.writer.write(data)
+        return True
+
+
+class Backplane:
+    '''
+    背板接口，registry 保存本进程的连接与全局绑定关系
+    - register / unregister : 本地连接上线、下线
+    - bind : 建立绑定关系
+    - is_online : uid 是否在任一 worker 上在线
+    - publish : 将已编码的消息 Json 转发给其他 worker 上的 uid，uid 不在其他 worker 或与 broker 的连接拥塞丢弃消息时返回 False
+    '''
+
+    def __init__(self, registry: ClientRegistry):
+        self.registry = registry
+
+    async def start(self, deliver: DeliverCallback):
+        pass
+
+    async def stop(self):
+        pass
+
+    def register(self, uid: str):
+        pass
+
+    def unregister(self, uid: str):
+        pass
+
+    def bind(self, client_id: str, target_id: str):
+        self.registry.bind(client_id, target_id)
+
+    def is_online(self, uid: str) -> bool:
+        return uid in self.registry
+
+    def publish(self, uid: str, text: str, kind: int = 0, key: Optional[str] = None) -> bool:
+        return False
+
+
+class InMemoryBackplane(Backplane):
+    pass
+
+
+class SocketBackplane(Backplane):
+    def __init__(self, registry: ClientRegistry, address: str):
+        super().__init__(registry)
+        self.address = address
+        self.remote_uid_set: Set[str] = set()
+        self._deliver: Optional[DeliverCallback] = None
+        self._writer: Optional[EventWriter] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: DeliverCallback):
+        self._deliver = deliver
+        loop = asyncio.get_running_loop()
+        end_time = loop.time() + CONNECT_RETRY_TIME
+        while True:
+            try:
+                reader = await self._connect()
+                break
+            except OSError:
+                if loop.time() > end_time:
+                    raise
+                await asyncio.sleep(0.2)
+        self._task = asyncio.create_task(self._run(reader))
+
+    async def _connect(self) -> asyncio.StreamReader:
+        '''
+        连接 broker 后重新发送本进程的全部连接与绑定关系，首次连接与断线重连共用
+        '''
+        reader, writer = await open_connection(self.address)
+        self._writer = EventWriter(writer, f"Broker {self.address}")
+        for uid, _ in self.registry.items():
+            self._send({"op": "register", "uid": uid})
+        for client_id, target_id in self.registry.get_pair_list():
+            self._send({"op": "bind", "clientId": client_id, "targetId": target_id})
+        custom_logger.info(f"【Server】 Backplane connected to {self.address}")
+        return reader
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def register(self, uid: str):
+        self._send({"op": "register", "uid": uid})
+
+    def unregister(self, uid: str):
+        self._send({"op": "unregister", "uid": uid})
+
+    def bind(self, client_id: str, target_id: str):
+        self.registry.bind(client_id, target_id)
+        self._send({"op": "bind", "clientId": client_id, "targetId": target_id})
+
+    def is_online(self, uid: str) -> bool:
+        return uid in self.registry or uid in self.remote_uid_set
+
+    def publish(self, uid: str, text: str, kind: int = 0, key: Optional[str] = None) -> bool:
+        if uid not in self.remote_uid_set or self._writer is None:
+            return False
+        return self._send({"op": "deliver", "uid": uid, "text": text, "kind": kind, "key": key}, True)
+
+    def _send(self, event: dict, droppable: bool = False) -> bool:
+        if self._writer is None:
+            return False
+        return self._writer.write(encode_event(event), droppable)
+
+    async def _run(self, reader: asyncio.StreamReader):
+        '''
+        读取 broker 的事件，断开后清除其他 worker 上的连接，并按指数退避一直重连到成功或背板停止
+        '''
+        while True:
+            try:
+                await self._read(reader)
+            except (ConnectionError, ValueError) as e:
+                custom_logger.warning(f"【Server】 Backplane connection error: {e!r}")
+            finally:
+                custom_logger.warning(f"【Server】 Backplane disconnected from {self.address}")
+                if self._writer is not None:
+                    self._writer.close()
+                    self._writer = None
+                for uid in self.remote_uid_set:
+                    self.registry.unbind(uid)
+                self.remote_uid_set.clear()
+            delay = RECONNECT_DELAY
+            while True:
+                await asyncio.sleep(delay)
+                try:
+                    reader = await self._connect()
+                    break
+                except OSError as e:
+                    delay = min(delay * 2, RECONNECT_MAX_DELAY)
+                    custom_logger.warning(f"【Server】 Backplane reconnect to {self.address} failed: {e!r}, retry in {delay:.1f}s")
+
+    async def _read(self, reader: asyncio.StreamReader):
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            try:
+                await self._on_event(json.loads(line))
+            except Exception as e:
+                custom_logger.error(f"【Server】 Backplane event error: {e!r}")
+
+    async def _on_event(self, event: dict):
+        op = event["op"]
+        if op == "deliver":
+            await self._deliver(event["uid"], event["text"], event.get("kind", 0), event.get("key"))
+        elif op == "register":
+            self.remote_uid_set.add(event["uid"])
+        elif op == "unregister":
+            self.remote_uid_set.discard(event["uid"])
+            self.registry.unbind(event["uid"])
+        elif op == "bind":
+            self.registry.bind(event["clientId"], event["targetId"])
+
+
+class BackplaneBroker:
+    '''
+    背板中心节点，记录每个 uid 所在的 worker 与全局绑定关系，新 worker 连接时先同步当前全部状态
+    '''
+
+    def __init__(self):
+        self.uid_to_writer: Dict[str, EventWriter] = {}
+        self.client_to_target: Dict[str, str] = {}
+        self.writer_set: Set[EventWriter] = set()
+
+    async def serve(self, address: str):
+        server = await start_server(self._handle, address)
+        custom_logger.info(f"【Backplane】 Broker listening on {address}")
+        async with server:
+            await server.serve_forever()
+
+    def _broadcast(self, event: dict, exclude: Optional[EventWriter] = None):
+        data = encode_event(event)
+        for writer in list(self.writer_set):
+            if writer is not exclude:
+                writer.write(data)
+
+    def _unregister(self, uid: str, writer: EventWriter):
+        if self.uid_to_writer.get(uid) is not writer:
+            return
+        del self.uid_to_writer[uid]
+        self.client_to_target.pop(uid, None)
+        for client_id, bound_target_id in list(self.client_to_target.items()):
+            if bound_target_id == uid:
+                del self.client_to_target[client_id]
+        self._broadcast({"op": "unregister", "uid": uid}, writer)
+
+    async def _handle(self, reader: asyncio.StreamReader, stream_writer: asyncio.StreamWriter):
+        writer = EventWriter(stream_writer, f"Worker {stream_writer.get_extra_info('peername') or id(stream_writer)}")
+        self.writer_set.add(writer)
+        for uid in self.uid_to_writer:
+            writer.write(encode_event({"op": "register", "uid": uid}))
+        for client_id, target_id in self.client_to_target.items():
+            writer.write(encode_event({"op": "bind", "clientId": client_id, "targetId": target_id}))
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                event = json.loads(line)
+                op = event["op"]
+                if op == "deliver":
+                    target_writer = self.uid_to_writer.get(event["uid"])
+                    if target_writer is not None:
+                        target_writer.write(line, True)
+                elif op == "register":
+                    self.uid_to_writer[event["uid"]] = writer
+                    self._broadcast(event, writer)
+                elif op == "unregister":
+                    self._unregister(event["uid"], writer)
+                elif op == "bind":
+                    self.client_to_target[event["clientId"]] = event["targetId"]
+                    self._broadcast(event, writer)
+        except (ConnectionError, ValueError) as e:
+            custom_logger.warning(f"【Backplane】 Worker connection error: {e!r}")
+        finally:
+            self.writer_set.discard(writer)
+            for uid in [uid for uid, uid_writer in self.uid_to_writer.items() if uid_writer is writer]:
+                self._unregister(uid, writer)
+            writer.close()
+
+
+def create_backplane(registry: ClientRegistry) -> Backplane:
+    if config.BACKPLANE == "socket" or config.WORKERS > 1:
+        return SocketBackplane(registry, config.BACKPLANE_ADDRESS)
+    return InMemoryBackplane(registry)
+
+
+def run_broker(address: str):
+    try:
+        asyncio.run(BackplaneBroker().serve(address))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    run_broker(sys.argv[1] if len(sys.argv) > 1 else config.BACKPLANE_ADDRESS)
@@ -0,0 +1,119 @@
+'''
+多进程背板联调脚本
+启动一个 broker 与 WORKER_COUNT 个监听不同端口的服务进程(模拟负载均衡把连接分到不同 worker)，
+控制端、APP 与 Http 请求分别落在不同进程上，校验绑定、双向转发、按会话 Http 发送、断开通知与转发延迟
+在 src 目录下运行: python -m benchmark.backplane [broker 地址]
+'''
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+import urllib.request
+import websockets
+
+WORKER_COUNT = 3
+BASE_PORT = 4610
+RELAY_COUNT = 200
+
+
+def run_worker(address: str, port: int):
+    import config
+    config.LOG_LEVEL = logging.WARNING
+    config.BACKPLANE = "socket"
+    config.BACKPLANE_ADDRESS = address
+    config.BACKPLANE_BROKER = False
+    config.WORKERS = 1
+    config.WS_SERVER_PORT = port
+    config.QR_CODE_MODE = "headless"
+    import server
+    server.server_run()
+
+
+async def receive(websocket) -> dict:
+    return json.loads(await asyncio.wait_for(websocket.recv(), 5))
+
+
+def post(port: int, path: str, body: dict) -> int:
+    request = urllib.request.Request(f"http://127.0.0.1:{port}{path}", data=json.dumps(body).encode(),
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return response.status
+
+
+async def wait_ready(port_list):
+    end_time = time.monotonic() + 15
+    for port in port_list:
+        while True:
+            try:
+                async with websockets.connect(f"ws://127.0.0.1:{port}/probe"):
+                    break
+            except OSError:
+                if time.monotonic() > end_time:
+                    raise
+                await asyncio.sleep(0.2)
+    await asyncio.sleep(0.5)
+
+
+async def check(port_list):
+    await wait_ready(port_list)
+    controller_port, app_port, http_port = port_list[0], port_list[1 % len(port_list)], port_list[2 % len(port_list)]
+    async with websockets.connect(f"ws://127.0.0.1:{controller_port}/") as controller:
+        client_id = (await receive(controller))["clientId"]
+        await asyncio.sleep(0.2)
+        async with websockets.connect(f"ws://127.0.0.1:{app_port}/{client_id}") as app:
+            target_id = (await receive(app))["clientId"]
+            await app.send(json.dumps({"type": "bind", "clientId": client_id, "targetId": target_id, "message": "DGLAB"}))
+            assert (await receive(app))["message"] == "200"
+            assert (await receive(controller))["type"] == "bind"
+            print(f"bind across workers {controller_port} <-> {app_port}: ok")
+
+            await app.send(json.dumps({"type": "msg", "clientId": client_id, "targetId": target_id, "message": "strength-10+20+100+100"}))
+            assert (await receive(controller))["message"] == "strength-10+20+100+100"
+            await controller.send(json.dumps({"type": "msg", "clientId": client_id, "targetId": target_id, "message": "strength-1+2+5"}))
+            assert (await receive(app))["message"] == "strength-1+2+5"
+            print("relay app <-> controller: ok")
+
+            await asyncio.to_thread(post, http_port, f"/dungeon_lab_clear_message/{target_id}", {"channel": 1})
+            assert (await receive(app))["message"] == "clear-1"
+            print(f"http on worker {http_port} to app: ok")
+
+            latency_list = []
+            for i in range(RELAY_COUNT):
+                message = f"pulse-A:[\"0A0A0A0A{i % 100:02d}{i % 100:02d}{i % 100:02d}{i % 100:02d}\"]"
+                start = time.perf_counter()
+                await controller.send(json.dumps({"type": "msg", "clientId": client_id, "targetId": target_id, "message": message}))
+                assert (await receive(app))["message"] == message
+                latency_list.append(time.perf_counter() - start)
+            latency_list.sort()
+            print(f"cross-worker relay latency: median {statistics.median(latency_list) * 1000:.2f} ms, "
+                  f"p99 {latency_list[int(len(latency_list) * 0.99) - 1] * 1000:.2f} ms")
+        break_message = await receive(controller)
+        assert break_message["type"] == "break" and break_message["message"] == "209"
+        print("break across workers: ok")
+
+
+def main():
+    import backplane
+    address = sys.argv[1] if len(sys.argv) > 1 else os.path.join(tempfile.mkdtemp(), "backplane.sock")
+    context = multiprocessing.get_context("spawn")
+    process_list = [context.Process(target=backplane.run_broker, args=(address,), daemon=True)]
+    port_list = [BASE_PORT + i for i in range(WORKER_COUNT)]
+    process_list += [context.Process(target=run_worker, args=(address, port), daemon=True) for port in port_list]
+    for process in process_list:
+        process.start()
+    try:
+        asyncio.run(check(port_list))
+    finally:
+        for process in process_list:
+            process.terminate()
+        for process in process_list:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+'''
+批量发送耗时基准: 逐个会话 Http 请求 vs /dungeon_lab_batch_message
+使用内存中的假连接替代 APP，只统计服务端处理与编码耗时
+在 src 目录下运行: python -m benchmark.batch
+'''
+import time
+import utils
+import server
+from fastapi.testclient import TestClient
+
+TARGET_COUNT_LIST = [10, 100, 1000]
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent_count = 0
+
+    async def send_text(self, text: str):
+        self.sent_count += 1
+
+
+def build_sessions(target_count: int):
+    server.registry.clear()
+    session_id_list = []
+    for _ in range(target_count):
+        client_id = server.registry.add(FakeWebSocket())
+        target_id = server.registry.add(FakeWebSocket())
+        server.registry.bind(client_id, target_id)
+        session_id_list.append(target_id)
+    return session_id_list
+
+
+def measure(http: TestClient, target_count: int, preset: str):
+    session_id_list = build_sessions(target_count)
+    body = {"channel": 1, "preset": preset}
+    start = time.perf_counter()
+    for session_id in session_id_list:
+        http.post(f"/dungeon_lab_preset_pulse_message/{session_id}", json=body)
+    single_time = time.perf_counter() - start
+    start = time.perf_counter()
+    response = http.post("/dungeon_lab_batch_message", json={"sessions": session_id_list, "preset": body})
+    batch_time = time.perf_counter() - start
+    assert response.json()["successCount"] == target_count
+    print(f"{target_count:>8} {single_time * 1000:>12.1f} {batch_time * 1000:>12.1f} {single_time / batch_time:>8.1f}x")
+
+
+def main():
+    preset = utils.get_preset_wave_data("心跳节奏")
+    server.config.PULSE_STREAM = False
+    with TestClient(server.app) as http:
+        print(f"{'targets':>8} {'single(ms)':>12} {'batch(ms)':>12} {'speedup':>9}")
+        for target_count in TARGET_COUNT_LIST:
+            measure(http, target_count, preset)
+    server.registry.clear()
+
+
+if __name__ == "__main__":
+    main()
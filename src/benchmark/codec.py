@@ -0,0 +1,50 @@
+'''
+消息编解码吞吐对比: pydantic 模型 vs codec
+在 src 目录下运行: python -m benchmark.codec
+'''
+import timeit
+import uuid
+import codec
+import utils
+from enums import ChannelType, MessageType
+from models import DungeonLabMessage
+
+NUMBER = 20000
+
+
+def pydantic_encode(type: MessageType, client_id: str, target_id: str, message: str) -> str:
+    return DungeonLabMessage(type=type, clientId=client_id, targetId=target_id, message=message).model_dump_json()
+
+
+def pydantic_decode(text: str) -> DungeonLabMessage:
+    return DungeonLabMessage.model_validate_json(json_data=text)
+
+
+def report(name: str, before, after):
+    before_time = min(timeit.repeat(before, number=NUMBER, repeat=3))
+    after_time = min(timeit.repeat(after, number=NUMBER, repeat=3))
+    print(f"{name:<12} {NUMBER / before_time:>14,.0f} {NUMBER / after_time:>14,.0f} {before_time / after_time:>8.2f}x")
+
+
+def main():
+    client_id = str(uuid.uuid4())
+    target_id = str(uuid.uuid4())
+    preset = utils.get_preset_wave_data("心跳节奏")
+    message_dict = {
+        "heartbeat": (MessageType.HEARTBEAT, "200"),
+        "strength": (MessageType.MSG, "strength-10+20+100+100"),
+        "pulse": (MessageType.MSG, utils.get_pulse_str(ChannelType.A, utils.get_preset_pulse_section_str_list(preset)[1])),
+    }
+    print(f"{'frame':<12} {'pydantic(f/s)':>14} {'codec(f/s)':>14} {'speedup':>9}")
+    for name, (type, message) in message_dict.items():
+        assert codec.encode_message(type, client_id, target_id, message) == pydantic_encode(type, client_id, target_id, message)
+        report(f"encode-{name}",
+               lambda: pydantic_encode(type, client_id, target_id, message),
+               lambda: codec.encode_message(type, client_id, target_id, message))
+    for name, (type, message) in message_dict.items():
+        text = pydantic_encode(type, client_id, target_id, message)
+        report(f"decode-{name}", lambda: pydantic_decode(text), lambda: codec.decode_message(text))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,472 @@
+'''
+端到端压测工具
+在子进程(默认)或本进程中启动服务，也可连接已运行的服务，模拟 PAIRS 组控制端与 APP：
+控制端连接后由 APP 按扫码流程发送 bind 消息完成绑定，之后按设定频率发送
+- strength : APP 每组每秒上报强度 STRENGTH_RATE 次，经服务端转发给控制端
+- pulse : 控制端每组每秒发送波形 PULSE_RATE 次，经服务端转发给 APP
+- preset : 每组每秒通过 Http 按会话发送 APP 导出波形 PRESET_RATE 次
+统计各类消息的转发延迟分位数、吞吐、丢失数，以及服务进程的 CPU 与每连接内存占用，
+结果以 Json 输出，可通过 --baseline 与历史结果对比，延迟或吞吐劣化超出 --tolerance 时以非 0 状态退出
+在 src 目录下运行: python -m benchmark.load --pairs 1000 --duration 10 --output result.json
+'''
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+import websockets
+
+CONNECT_TIMEOUT = 10
+DRAIN_TIME = 1.0
+
+
+def run_server(port: int, override_dict: dict):
+    raise_open_file_limit()
+    import config
+    config.LOG_LEVEL = logging.ERROR
+    config.QR_CODE_MODE = "headless"
+    config.WS_SERVER_PORT = port
+    for key, value in override_dict.items():
+        setattr(config, key, value)
+    import server
+    import uvicorn
+    uvicorn.run(server.app, host=config.WS_SERVER_HOST, port=port, log_level="warning")
+
+
+def raise_open_file_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def parse_override(text: str):
+    key, _, value = text.partition("=")
+    try:
+        return key, json.loads(value)
+    except ValueError:
+        return key, value
+
+
+class ProcessSampler:
+    '''
+    通过 /proc 读取进程的 CPU 时间与常驻内存，非 Linux 系统返回 None
+    '''
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.clock_tick = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+    def get_cpu_time(self) -> Optional[float]:
+        try:
+            with open(f"/proc/{self.pid}/stat") as f:
+                field_list = f.read().rpartition(")")[2].split()
+            return (int(field_list[11]) + int(field_list[12])) / self.clock_tick
+        except OSError:
+            return None
+
+    def get_rss(self) -> Optional[int]:
+        try:
+            with open(f"/proc/{self.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        return None
+
+
+class LatencyRecorder:
+    '''
+    按消息文本记录发送时间，收到相同文本时取最早一条计算延迟，未收到的记为丢失(被合并或丢弃)
+    '''
+
+    def __init__(self):
+        self.pending_dict: Dict[str, Deque[float]] = {}
+        self.latency_list: List[float] = []
+        self.sent_count = 0
+        self.recording = False
+
+    def sent(self, text: str):
+        if not self.recording:
+            return
+        self.sent_count += 1
+        self.pending_dict.setdefault(text, deque()).append(time.perf_counter())
+
+    def received(self, text: str):
+        time_queue = self.pending_dict.get(text)
+        if not time_queue:
+            return
+        self.latency_list.append(time.perf_counter() - time_queue.popleft())
+        if not time_queue:
+            del self.pending_dict[text]
+
+    def observe(self, latency: float):
+        if self.recording:
+            self.sent_count += 1
+            self.latency_list.append(latency)
+
+    def summary(self, duration: float) -> dict:
+        latency_list = sorted(self.latency_list)
+        count = len(latency_list)
+
+        def percentile(p: float) -> Optional[float]:
+            if not count:
+                return None
+            return round(latency_list[min(count - 1, int(count * p))] * 1000, 3)
+
+        return {
+            "sent": self.sent_count,
+            "received": count,
+            "lost": self.sent_count - count,
+            "throughput": round(count / duration, 1) if duration else 0,
+            "latencyMs": {
+                "p50": percentile(0.5),
+                "p90": percentile(0.9),
+                "p99": percentile(0.99),
+                "p999": percentile(0.999),
+                "max": round(latency_list[-1] * 1000, 3) if count else None,
+                "mean": round(sum(latency_list) / count * 1000, 3) if count else None,
+            },
+        }
+
+
+class Pair:
+    def __init__(self, controller, app, client_id: str, target_id: str):
+        self.controller = controller
+        self.app = app
+        self.client_id = client_id
+        self.target_id = target_id
+        self.seq = 0
+
+    def next_seq(self) -> int:
+        self.seq += 1
+        return self.seq
+
+
+class LoadGenerator:
+    def __init__(self, args):
+        self.args = args
+        self.ws_url = f"ws://{args.host}:{args.port}"
+        self.http_host = args.host
+        self.http_port = args.port
+        self.pair_list: List[Pair] = []
+        self.strength_recorder = LatencyRecorder()
+        self.pulse_recorder = LatencyRecorder()
+        self.preset_recorder = LatencyRecorder()
+        self.preset_frame_count = 0
+        self.error_count = 0
+        self.stopped = False
+        self.task_list: List[asyncio.Task] = []
+
+    async def connect_pair(self, semaphore: asyncio.Semaphore):
+        async with semaphore:
+            controller = await websockets.connect(f"{self.ws_url}/", max_queue=None, open_timeout=CONNECT_TIMEOUT)
+            client_id = json.loads(await asyncio.wait_for(controller.recv(), CONNECT_TIMEOUT))["clientId"]
+            app = await websockets.connect(f"{self.ws_url}/{client_id}", max_queue=None, open_timeout=CONNECT_TIMEOUT)
+            target_id = json.loads(await asyncio.wait_for(app.recv(), CONNECT_TIMEOUT))["clientId"]
+            await app.send(json.dumps({"type": "bind", "clientId": client_id, "targetId": target_id, "message": "DGLAB"}))
+            bind_result = json.loads(await asyncio.wait_for(app.recv(), CONNECT_TIMEOUT))
+            if bind_result["message"] != "200":
+                raise RuntimeError(f"Bind failed: {bind_result}")
+            while json.loads(await asyncio.wait_for(controller.recv(), CONNECT_TIMEOUT))["type"] != "bind":
+                pass
+            self.pair_list.append(Pair(controller, app, client_id, target_id))
+
+    async def receive_loop(self, websocket, recorder: LatencyRecorder, is_app: bool):
+        try:
+            async for text in websocket:
+                data = json.loads(text)
+                if data["type"] != "msg":
+                    continue
+                message = data["message"]
+                if is_app and message.startswith("pulse-B"):
+                    self.preset_frame_count += 1
+                else:
+                    recorder.received(message)
+        except websockets.ConnectionClosed:
+            if not self.stopped:
+                self.error_count += 1
+
+    async def send_loop(self, rate: float, index: int, send):
+        interval = 1 / rate
+        # 各组错开发送时间，避免所有连接在同一时刻发送
+        await asyncio.sleep(interval * index / max(1, len(self.pair_list)))
+        next_time = time.perf_counter()
+        while not self.stopped:
+            try:
+                await send()
+            except Exception:
+                self.error_count += 1
+                if self.stopped:
+                    return
+            next_time += interval
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                next_time = time.perf_counter()
+
+    async def send_strength(self, pair: Pair):
+        seq = pair.next_seq()
+        message = f"strength-{seq % 101}+{seq // 101 % 101}+100+100"
+        self.strength_recorder.sent(message)
+        await pair.app.send(json.dumps({"type": "msg", "clientId": pair.client_id, "targetId": pair.target_id, "message": message}))
+
+    async def send_pulse(self, pair: Pair):
+        seq = pair.next_seq()
+        message = f"pulse-A:[\"{seq & 0xFFFFFFFF:08X}64646464\"]"
+        self.pulse_recorder.sent(message)
+        await pair.controller.send(json.dumps({"type": "msg", "clientId": pair.client_id, "targetId": pair.target_id, "message": message}))
+
+    async def send_preset(self, pair: Pair):
+        body = json.dumps({"channel": 2, "preset": self.args.preset_data}).encode()
+        start_time = time.perf_counter()
+        status = await self.post(f"/dungeon_lab_preset_pulse_message/{pair.target_id}", body)
+        if status != 200:
+            raise RuntimeError(f"Http status {status}")
+        self.preset_recorder.observe(time.perf_counter() - start_time)
+
+    async def post(self, path: str, body: bytes) -> int:
+        reader, writer = await asyncio.open_connection(self.http_host, self.http_port)
+        try:
+            writer.write(f"POST {path} HTTP/1.1\r\nHost: {self.http_host}\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+            status_line = await reader.readline()
+            await reader.read()
+            return int(status_line.split()[1])
+        finally:
+            writer.close()
+
+    def start_traffic(self):
+        rate_list = ((self.args.strength_rate, self.send_strength), (self.args.pulse_rate, self.send_pulse),
+                     (self.args.preset_rate, self.send_preset))
+        for index, pair in enumerate(self.pair_list):
+            self.task_list.append(asyncio.create_task(self.receive_loop(pair.controller, self.strength_recorder, False)))
+            self.task_list.append(asyncio.create_task(self.receive_loop(pair.app, self.pulse_recorder, True)))
+            for rate, send in rate_list:
+                if rate > 0:
+                    self.task_list.append(asyncio.create_task(
+                        self.send_loop(rate, index, lambda send=send, pair=pair: send(pair))))
+
+    def set_recording(self, recording: bool):
+        for recorder in (self.strength_recorder, self.pulse_recorder, self.preset_recorder):
+            recorder.recording = recording
+
+    async def close(self):
+        self.stopped = True
+        for task in self.task_list:
+            task.cancel()
+        await asyncio.gather(*self.task_list, return_exceptions=True)
+        await asyncio.gather(*(websocket.close() for pair in self.pair_list for websocket in (pair.controller, pair.app)),
+                             return_exceptions=True)
+
+
+async def wait_ready(host: str, port: int):
+    end_time = time.monotonic() + 15
+    while True:
+        try:
+            async with websockets.connect(f"ws://{host}:{port}/probe"):
+                return
+        except OSError:
+            if time.monotonic() > end_time:
+                raise
+            await asyncio.sleep(0.2)
+
+
+async def run(args, sampler: Optional[ProcessSampler]) -> dict:
+    await wait_ready(args.host, args.port)
+    await asyncio.sleep(0.5)
+    generator = LoadGenerator(args)
+    rss_before = sampler.get_rss() if sampler else None
+
+    start_time = time.perf_counter()
+    semaphore = asyncio.Semaphore(args.connect_concurrency)
+    result_list = await asyncio.gather(*(generator.connect_pair(semaphore) for _ in range(args.pairs)), return_exceptions=True)
+    connect_time = time.perf_counter() - start_time
+    connect_error_list = [repr(result) for result in result_list if isinstance(result, BaseException)]
+    await asyncio.sleep(0.5)
+    rss_after = sampler.get_rss() if sampler else None
+    connection_count = len(generator.pair_list) * 2
+
+    generator.start_traffic()
+    await asyncio.sleep(args.warmup)
+    generator.set_recording(True)
+    generator.preset_frame_count = 0
+    cpu_start = sampler.get_cpu_time() if sampler else None
+    start_time = time.perf_counter()
+    await asyncio.sleep(args.duration)
+    duration = time.perf_counter() - start_time
+    cpu_end = sampler.get_cpu_time() if sampler else None
+    generator.set_recording(False)
+    preset_frame_count = generator.preset_frame_count
+    await asyncio.sleep(DRAIN_TIME)
+    rss_peak = sampler.get_rss() if sampler else None
+    await generator.close()
+
+    cpu_time = cpu_end - cpu_start if cpu_start is not None and cpu_end is not None else None
+    memory_per_connection = None
+    if rss_before is not None and rss_after is not None and connection_count:
+        memory_per_connection = round((rss_after - rss_before) / connection_count)
+    strength = generator.strength_recorder.summary(duration)
+    pulse = generator.pulse_recorder.summary(duration)
+    preset = generator.preset_recorder.summary(duration)
+    preset["frames"] = preset_frame_count
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpuCount": os.cpu_count()},
+        "config": {
+            "mode": args.mode,
+            "pairs": args.pairs,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "strengthRate": args.strength_rate,
+            "pulseRate": args.pulse_rate,
+            "presetRate": args.preset_rate,
+            "preset": args.preset,
+            "overrides": dict(parse_override(text) for text in args.set),
+        },
+        "connect": {
+            "connections": connection_count,
+            "errors": len(connect_error_list),
+            "errorSamples": connect_error_list[:5],
+            "seconds": round(connect_time, 3),
+            "pairsPerSecond": round(len(generator.pair_list) / connect_time, 1) if connect_time else 0,
+        },
+        "strength": strength,
+        "pulse": pulse,
+        "preset": preset,
+        "relayThroughput": round(strength["throughput"] + pulse["throughput"], 1),
+        "errors": generator.error_count,
+        "server": {
+            "cpuSeconds": round(cpu_time, 3) if cpu_time is not None else None,
+            "cpuPercent": round(cpu_time / duration * 100, 1) if cpu_time is not None else None,
+            "rssBefore": rss_before,
+            "rssAfterConnect": rss_after,
+            "rssPeak": rss_peak,
+            "memoryPerConnection": memory_per_connection,
+        },
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> List[str]:
+    '''
+    返回劣化超出容差的指标说明列表，压测参数不同时结果不可比，直接返回参数差异
+    '''
+    config_dict = baseline.get("config", {})
+    diff_list = [f"{key}: {config_dict.get(key)!r} -> {value!r}" for key, value in result["config"].items()
+                 if config_dict.get(key) != value]
+    if diff_list:
+        return [f"config differs from baseline, {', '.join(diff_list)}"]
+    regression_list = []
+    for name in ("strength", "pulse", "preset"):
+        for key in ("p50", "p99"):
+            current = result[name]["latencyMs"][key]
+            origin = baseline.get(name, {}).get("latencyMs", {}).get(key)
+            if current is not None and origin and current > origin * (1 + tolerance):
+                regression_list.append(f"{name} {key} latency {origin} ms -> {current} ms")
+    current = result["relayThroughput"]
+    origin = baseline.get("relayThroughput")
+    if origin and current < origin * (1 - tolerance):
+        regression_list.append(f"relay throughput {origin} msg/s -> {current} msg/s")
+    current = result["server"]["memoryPerConnection"]
+    origin = baseline.get("server", {}).get("memoryPerConnection")
+    if current is not None and origin and current > origin * (1 + tolerance):
+        regression_list.append(f"memory per connection {origin} B -> {current} B")
+    return regression_list
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="DG-LAB WebSocket relay load generator")
+    parser.add_argument("--mode", choices=("subprocess", "inprocess", "external"), default="subprocess",
+                        help="启动服务的方式，external 为连接 --host/--port 上已运行的服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4620)
+    parser.add_argument("--pid", type=int, help="external 模式下用于采集 CPU 与内存的服务进程 pid")
+    parser.add_argument("--pairs", type=int, default=500, help="控制端与 APP 的组数")
+    parser.add_argument("--connect-concurrency", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=10, help="统计时长(秒)")
+    parser.add_argument("--warmup", type=float, default=2, help="开始统计前的预热时长(秒)")
+    parser.add_argument("--strength-rate", type=float, default=2, help="每组每秒 APP 上报强度次数")
+    parser.add_argument("--pulse-rate", type=float, default=10, help="每组每秒控制端发送波形次数")
+    parser.add_argument("--preset-rate", type=float, default=0, help="每组每秒 Http 发送预设波形次数")
+    parser.add_argument("--preset", default="呼吸", help="预设波形名")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="覆盖服务端配置项，值按 Json 解析，可重复")
+    parser.add_argument("--output", help="结果 Json 写入的文件，默认输出到标准输出")
+    parser.add_argument("--baseline", help="用于对比的历史结果 Json 文件")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="对比时允许的劣化比例")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    raise_open_file_limit()
+    import utils
+    args.preset_data = utils.get_preset_wave_data(args.preset)
+    if args.preset_data is None:
+        raise SystemExit(f"Unknown preset: {args.preset}")
+    override_dict = dict(parse_override(text) for text in args.set)
+    process = None
+    sampler = None
+    if args.mode == "subprocess":
+        process = multiprocessing.get_context("spawn").Process(target=run_server, args=(args.port, override_dict), daemon=True)
+        process.start()
+        sampler = ProcessSampler(process.pid)
+    elif args.mode == "external" and args.pid:
+        sampler = ProcessSampler(args.pid)
+
+    async def run_inprocess() -> dict:
+        import config
+        config.LOG_LEVEL = logging.ERROR
+        config.QR_CODE_MODE = "headless"
+        for key, value in override_dict.items():
+            setattr(config, key, value)
+        import custom_logger
+        custom_logger.set_level(logging.ERROR)
+        import server
+        import uvicorn
+        uvicorn_server = uvicorn.Server(uvicorn.Config(server.app, host=args.host, port=args.port, log_level="warning"))
+        serve_task = asyncio.create_task(uvicorn_server.serve())
+        try:
+            # 本进程模式下采集的 CPU 与内存包含压测客户端自身
+            return await run(args, ProcessSampler(os.getpid()))
+        finally:
+            uvicorn_server.should_exit = True
+            await serve_task
+
+    try:
+        if args.mode == "inprocess":
+            result = asyncio.run(run_inprocess())
+        else:
+            result = asyncio.run(run(args, sampler))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.join()
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regression_list = compare(result, json.load(f), args.tolerance)
+        result["regressions"] = regression_list
+        for regression in regression_list:
+            print(f"regression: {regression}", file=sys.stderr)
+        exit_code = 1 if regression_list else 0
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,42 @@
+'''
+滑条/频率查找表校验与耗时对比
+在 src 目录下运行: python -m benchmark.lookup_table
+'''
+import timeit
+import utils
+
+REPEAT = 200
+
+
+def check():
+    for value in range(-10, utils.SLIDER_MAX + 11):
+        assert utils.get_real_pulse_frequency(value) == utils.calc_real_pulse_frequency(value), value
+        assert utils.get_real_section_time(value) == utils.calc_real_section_time(value), value
+    for value in range(0, utils.FREQUENCY_MAX + 101):
+        assert utils.get_pulse_frequency_code(value) == utils.calc_pulse_frequency_code(value), value
+    for value in range(-10, 266):
+        clamp_value = utils.clamp(value, 0, 255)
+        assert utils.decimal_to_hex_byte(value) == f'{clamp_value:02X}', value
+    print("All lookup tables match the branch implementations")
+
+
+def compare(name: str, table_func, calc_func, domain):
+    table_time = min(timeit.repeat(lambda: [table_func(v) for v in domain], number=REPEAT, repeat=3))
+    calc_time = min(timeit.repeat(lambda: [calc_func(v) for v in domain], number=REPEAT, repeat=3))
+    count = REPEAT * len(domain)
+    print(f"{name:<26} {calc_time / count * 1e9:>10.1f} {table_time / count * 1e9:>10.1f}")
+
+
+def main():
+    check()
+    print(f"{'mapping':<26} {'calc(ns)':>10} {'table(ns)':>10}")
+    slider_domain = range(utils.SLIDER_MAX + 1)
+    frequency_domain = range(utils.FREQUENCY_MIN, utils.FREQUENCY_MAX + 1)
+    compare("get_real_pulse_frequency", utils.get_real_pulse_frequency, utils.calc_real_pulse_frequency, slider_domain)
+    compare("get_real_section_time", utils.get_real_section_time, utils.calc_real_section_time, slider_domain)
+    compare("get_pulse_frequency_code", utils.get_pulse_frequency_code, utils.calc_pulse_frequency_code, frequency_domain)
+    compare("decimal_to_hex_byte", utils.decimal_to_hex_byte, lambda v: f'{utils.clamp(v, 0, 255):02X}', range(256))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+'''
+pulse 消息切分的随机性质校验与耗时
+- 每条消息长度不超过 MESSAGE_MAX_LENGTH
+- 所有消息按顺序拼接后的波形帧与原消息一致
+- 消息条数与最优切分(动态规划)一致
+在 src 目录下运行: python -m benchmark.message_chunk [随机用例数]
+'''
+import random
+import sys
+import timeit
+import utils
+from enums import ChannelType
+
+CASE_COUNT = 500
+
+
+def random_frame(rng: random.Random) -> str:
+    if rng.random() < 0.9:
+        return '"' + "".join(rng.choice("0123456789ABCDEF") for _ in range(16)) + '"'
+    return '"' + "".join(rng.choice("0123456789ABCDEF") for _ in range(rng.randint(0, 40))) + '"'
+
+
+def get_frame_list(message: str):
+    value = message[message.find(":") + 1:]
+    return value[1:-1].split(",")
+
+
+def get_min_message_count(head_length: int, frame_list, max_length: int) -> int:
+    value_max_length = max_length - head_length
+    frame_count = len(frame_list)
+    min_count = [0] + [frame_count + 1] * frame_count
+    for end in range(1, frame_count + 1):
+        length = 1
+        for start in range(end - 1, -1, -1):
+            length += len(frame_list[start]) + 1
+            if length > value_max_length:
+                break
+            min_count[end] = min(min_count[end], min_count[start] + 1)
+    return min_count[frame_count]
+
+
+def check(case_count: int):
+    rng = random.Random(1950)
+    for _ in range(case_count):
+        channel = rng.choice(list(ChannelType))
+        frame_list = [random_frame(rng) for _ in range(rng.randint(1, 600))]
+        max_length = rng.choice([utils.MESSAGE_MAX_LENGTH, rng.randint(60, 400)])
+        message = utils.get_pulse_str(channel, utils.get_pulse_frames_value_str(frame_list))
+        message_list = utils.split_pulse_message(message, max_length)
+        if len(message) <= max_length:
+            assert message_list == [message]
+            continue
+        head = utils.get_pulse_str(channel, "")
+        assert all(len(m) <= max_length for m in message_list)
+        assert all(m.startswith(head) for m in message_list)
+        assert [f for m in message_list for f in get_frame_list(m)] == frame_list
+        assert len(message_list) == get_min_message_count(len(head), frame_list, max_length)
+    print(f"{case_count} random pulse messages split correctly")
+
+
+def main():
+    case_count = int(sys.argv[1]) if len(sys.argv) > 1 else CASE_COUNT
+    check(case_count)
+    rng = random.Random(0)
+    frame_list = [random_frame(rng) for _ in range(3000)]
+    message = utils.get_pulse_str(ChannelType.A, utils.get_pulse_frames_value_str(frame_list))
+    number = 200
+    seconds = timeit.timeit(lambda: utils.split_pulse_message(message), number=number)
+    print(f"split {len(message)} chars into {len(utils.split_pulse_message(message))} messages: {seconds / number * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+'''
+预编译波形库 vs 按需编译
+以内置预设波形为基础生成 PRESET_COUNT 个命名波形，对比
+- 编译波形库与以 mmap 加载的耗时
+- 随机取波形消息时，波形库直接取片段与 PresetFrameCache(容量 PRESET_CACHE_SIZE，LRU 淘汰)按需编译的耗时
+在 src 目录下运行: python -m benchmark.preset_library
+'''
+import os
+import random
+import tempfile
+import time
+import utils
+from enums import ChannelType
+from preset_cache import PresetFrameCache
+from preset_library import PresetLibrary, build_library
+
+PRESET_COUNT = 5000
+PRESET_CACHE_SIZE = 256
+LOOKUP_COUNT = 20000
+
+
+def build_preset_dict() -> dict:
+    preset_dict = {}
+    base_list = list(utils.get_preset_wave_data_dict().items())
+    for i in range(PRESET_COUNT):
+        name, preset = base_list[i % len(base_list)]
+        # 修改小节休息时长使各波形内容有所不同
+        head, _, body = preset.partition(":")
+        rest, _, tail = body.partition(",")
+        preset_dict[f"{name}-{i}"] = f"{head}:{(int(rest) + i) % 100},{tail}"
+    return preset_dict
+
+
+def main():
+    preset_dict = build_preset_dict()
+    path = os.path.join(tempfile.mkdtemp(), "presets.dgpl")
+    start = time.perf_counter()
+    build_library(preset_dict, path)
+    build_time = time.perf_counter() - start
+    start = time.perf_counter()
+    library = PresetLibrary(path)
+    load_time = time.perf_counter() - start
+    print(f"presets: {len(library)}, file: {os.path.getsize(path) / 1024:.0f} KiB, "
+          f"build: {build_time:.2f}s, mmap load: {load_time * 1000:.1f}ms")
+
+    rng = random.Random(0)
+    lookup_list = [(rng.choice(list(preset_dict)), rng.choice(list(ChannelType))) for _ in range(LOOKUP_COUNT)]
+    start = time.perf_counter()
+    for name, channel in lookup_list:
+        library.get_body_list(name, channel)
+    library_time = time.perf_counter() - start
+    cache = PresetFrameCache(PRESET_CACHE_SIZE)
+    start = time.perf_counter()
+    for name, channel in lookup_list:
+        cache.get(preset_dict[name], channel).body_list
+    cache_time = time.perf_counter() - start
+    print(f"{'path':<24} {'per lookup(us)':>15}")
+    print(f"{'library (mmap)':<24} {library_time / LOOKUP_COUNT * 1e6:>15.2f}")
+    print(f"{'PresetFrameCache':<24} {cache_time / LOOKUP_COUNT * 1e6:>15.2f}   hit rate {cache.stats.hit_count / LOOKUP_COUNT:.1%}")
+    library.close()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+'''
+PulseSection 与 NumPy 波形生成耗时对比，并校验两者输出一致
+在 src 目录下运行: python -m benchmark.pulse_engine [重复次数]
+'''
+import sys
+import timeit
+import utils
+import pulse_engine
+from pulse_section import PulseSection
+
+REPEAT = 200
+
+
+def build_long_section(section_time: float, gradient_type: int) -> PulseSection:
+    section = PulseSection(10, 1000, section_time, gradient_type)
+    for strength in range(0, 100, 10):
+        section.add_pulse(strength)
+    return section
+
+
+def compare(name: str, section_list, repeat: int):
+    for section in section_list:
+        if pulse_engine.get_pulse_value_str(section) != section.get_pulse_value_str():
+            raise AssertionError(f"Output mismatch: {name}")
+    python_time = min(timeit.repeat(lambda: [s.get_pulse_value_str() for s in section_list], number=repeat, repeat=3)) / repeat
+    numpy_time = min(timeit.repeat(lambda: [pulse_engine.get_pulse_value_str(s) for s in section_list], number=repeat, repeat=3)) / repeat
+    print(f"{name:<16} {python_time * 1e6:>12.1f} {numpy_time * 1e6:>12.1f} {python_time / numpy_time:>8.2f}x")
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else REPEAT
+    print(f"{'preset':<16} {'python(us)':>12} {'numpy(us)':>12} {'speedup':>9}")
+    for name, preset in utils.get_preset_wave_data_dict().items():
+        compare(name, utils.simple_decode_dg_pulse_str(preset), repeat)
+    for section_time in (30, 300):
+        for gradient_type in (1, 2, 3):
+            compare(f"long-{section_time}s-t{gradient_type}", [build_long_section(section_time, gradient_type)], max(1, repeat // 50))
+
+
+if __name__ == "__main__":
+    main()
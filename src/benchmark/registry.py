@@ -0,0 +1,71 @@
+'''
+连接索引查询耗时基准
+在 src 目录下运行: python -m benchmark.registry
+'''
+import random
+import sys
+import timeit
+from client_registry import ClientRegistry
+
+SIZE_LIST = [10, 100, 1000, 10000, 50000]
+LOOKUP_COUNT = 20000
+
+
+class FakeWebSocket:
+    pass
+
+
+def build_registry(size: int) -> ClientRegistry:
+    registry = ClientRegistry()
+    websocket_list = [FakeWebSocket() for _ in range(size)]
+    uid_list = [registry.add(ws) for ws in websocket_list]
+    for i in range(0, len(uid_list) - 1, 2):
+        registry.bind(uid_list[i], uid_list[i + 1])
+    return registry
+
+
+def measure(size: int) -> dict:
+    registry = build_registry(size)
+    websocket_list = list(registry.websocket_to_uid.keys())
+    client_id_list = list(registry.client_to_target.keys())
+    target_id_list = list(registry.target_to_client.keys())
+    sample_websocket = random.choices(websocket_list, k=LOOKUP_COUNT)
+    sample_client_id = random.choices(client_id_list, k=LOOKUP_COUNT)
+    sample_target_id = random.choices(target_id_list, k=LOOKUP_COUNT)
+
+    def lookup_uid():
+        for ws in sample_websocket:
+            registry.get_uid(ws)
+
+    def lookup_target_id():
+        for client_id in sample_client_id:
+            registry.get_target_id(client_id)
+
+    def lookup_client_id():
+        for target_id in sample_target_id:
+            registry.get_client_id(target_id)
+
+    def lookup_is_bound():
+        for target_id in sample_target_id:
+            registry.is_bound(target_id)
+
+    result = {"connections": size}
+    for name, func in (("get_uid", lookup_uid), ("get_target_id", lookup_target_id),
+                       ("get_client_id", lookup_client_id), ("is_bound", lookup_is_bound)):
+        seconds = min(timeit.repeat(func, number=1, repeat=5))
+        result[name] = seconds / LOOKUP_COUNT * 1e9
+    return result
+
+
+def main():
+    size_list = [int(v) for v in sys.argv[1:]] or SIZE_LIST
+    header = f"{'connections':>12} {'get_uid':>10} {'get_target_id':>14} {'get_client_id':>14} {'is_bound':>10}  (ns/op)"
+    print(header)
+    for size in size_list:
+        result = measure(size)
+        print(f"{result['connections']:>12} {result['get_uid']:>10.1f} {result['get_target_id']:>14.1f} "
+              f"{result['get_client_id']:>14.1f} {result['is_bound']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
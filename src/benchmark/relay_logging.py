@@ -0,0 +1,50 @@
+'''
+日志开关对消息转发吞吐的影响
+APP 上报的强度消息经 on_receive_message 转发给绑定的控制端，对比 DEBUG 与 INFO 级别下的每秒转发数
+终端输出重定向到空设备，只统计格式化与日志处理本身的耗时
+在 src 目录下运行: python -m benchmark.relay_logging
+'''
+import asyncio
+import logging
+import os
+import time
+import custom_logger
+import server
+
+MESSAGE_COUNT = 20000
+
+
+class FakeWebSocket:
+    async def send_text(self, text: str):
+        pass
+
+
+async def measure(level: int) -> float:
+    custom_logger.set_level(level)
+    server.registry.clear()
+    client_websocket = FakeWebSocket()
+    target_websocket = FakeWebSocket()
+    client_id = server.registry.add(client_websocket)
+    target_id = server.registry.add(target_websocket)
+    server.registry.bind(client_id, target_id)
+    text = server.utils.get_dg_message_json(server.MessageType.MSG, client_id, target_id, "strength-10+20+100+100")
+    start = time.perf_counter()
+    for _ in range(MESSAGE_COUNT):
+        await server.on_receive_message(target_websocket, text)
+    duration = time.perf_counter() - start
+    server.registry.clear()
+    return MESSAGE_COUNT / duration
+
+
+async def main():
+    custom_logger.console_handler.setStream(open(os.devnull, "w"))
+    origin_level = custom_logger.logger.level
+    print(f"queue handler: {custom_logger.queue_handler is not None}")
+    print(f"{'level':<8} {'relay(msg/s)':>14}")
+    for name, level in (("DEBUG", logging.DEBUG), ("INFO", logging.INFO)):
+        print(f"{name:<8} {await measure(level):>14,.0f}")
+    custom_logger.set_level(origin_level)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
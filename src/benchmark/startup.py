@@ -0,0 +1,188 @@
+'''
+冷启动耗时
+对每个入口 (server.py, client.py, main.py) 分别启动新的解释器，统计
+- import : python -X importtime 得到的入口模块导入耗时，以及自身耗时最高的模块
+- first connection : 从启动进程到第一个连接被接受的耗时，server/main 为压测端连上服务并收到绑定消息，
+  client 为本脚本启动的 WebSocket 服务收到内置客户端的连接
+每项重复 REPEAT 次取中位数，--output 指定文件时同时写入 Json 结果
+在 src 目录下运行: python -m benchmark.startup [--repeat 5] [--output startup.json]
+'''
+import argparse
+import asyncio
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+import websockets
+
+ENTRY_LIST = ["server", "client", "main"]
+BASE_PORT = 4640
+TOP_COUNT = 8
+READY_TIMEOUT = 30
+
+CONFIG_SNIPPET = (
+    "import logging, config\n"
+    "config.LOG_LEVEL = logging.WARNING\n"
+    "config.QR_CODE_MODE = 'headless'\n"
+    "config.RUN_TEMP_CLIENT = False\n"
+    "config.WS_SERVER_PORT = {port}\n"
+    "config.WS_CLIENT_HOST = '127.0.0.1'\n"
+)
+
+RUN_SNIPPET_DICT = {
+    "server": "import server\nserver.server_run()\n",
+    "client": "import client\nclient.client_run(0)\n",
+    "main": "import main\nmain.main()\n",
+}
+
+
+def get_base_path() -> str:
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure_import(entry: str) -> Tuple[float, Dict[str, float]]:
+    '''
+    返回入口模块累计导入耗时(秒)与各模块自身导入耗时
+    '''
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {entry}"],
+                            cwd=get_base_path(), capture_output=True, text=True, check=True)
+    total = 0.0
+    self_time_dict = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_time, cumulative, name = line[len("import time:"):].split("|")
+        if not self_time.strip().isdigit():
+            continue
+        self_time_dict[name.strip()] = int(self_time) / 1e6
+        if name.strip() == entry:
+            total = int(cumulative) / 1e6
+    return total, self_time_dict
+
+
+async def wait_server_connection(port: int, process: subprocess.Popen) -> float:
+    end_time = time.perf_counter() + READY_TIMEOUT
+    while True:
+        if process.poll() is not None:
+            raise RuntimeError(f"Process exited with {process.returncode}")
+        try:
+            async with websockets.connect(f"ws://127.0.0.1:{port}/", open_timeout=1) as websocket:
+                await asyncio.wait_for(websocket.recv(), 5)
+                return time.perf_counter()
+        except (OSError, asyncio.TimeoutError):
+            if time.perf_counter() > end_time:
+                raise
+            await asyncio.sleep(0.01)
+
+
+async def wait_client_connection(port: int) -> Tuple[asyncio.Future, object]:
+    accepted = asyncio.get_running_loop().create_future()
+
+    async def handle(websocket):
+        if not accepted.done():
+            accepted.set_result(time.perf_counter())
+        await websocket.wait_closed()
+
+    listener = await websockets.serve(handle, "127.0.0.1", port)
+    return accepted, listener
+
+
+def stop_process_group(process: subprocess.Popen):
+    if hasattr(os, "killpg"):
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    else:
+        process.terminate()
+    try:
+        process.wait(5)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+async def wait_port_closed(port: int):
+    '''
+    服务子进程收到信号后会先优雅关闭，等端口不再监听再开始下一次测量
+    '''
+    end_time = time.perf_counter() + READY_TIMEOUT
+    while time.perf_counter() < end_time:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+        except OSError:
+            return
+        writer.close()
+        await asyncio.sleep(0.05)
+
+
+async def measure_first_connection(entry: str, port: int) -> float:
+    code = CONFIG_SNIPPET.format(port=port) + RUN_SNIPPET_DICT[entry]
+    accepted, listener = None, None
+    if entry == "client":
+        accepted, listener = await wait_client_connection(port)
+    start_time = time.perf_counter()
+    # main 会再启动服务子进程，放到独立的进程组中以便一并结束
+    process = subprocess.Popen([sys.executable, "-c", code], cwd=get_base_path(), start_new_session=True,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if accepted is not None:
+            end_time = await asyncio.wait_for(accepted, READY_TIMEOUT)
+        else:
+            end_time = await wait_server_connection(port, process)
+        return end_time - start_time
+    finally:
+        stop_process_group(process)
+        if listener is not None:
+            listener.close()
+            await listener.wait_closed()
+        else:
+            await wait_port_closed(port)
+
+
+async def measure_entry(entry: str, repeat: int, port: int) -> dict:
+    import_time_list: List[float] = []
+    self_time_dict: Dict[str, List[float]] = {}
+    for _ in range(repeat):
+        total, module_time_dict = measure_import(entry)
+        import_time_list.append(total)
+        for name, value in module_time_dict.items():
+            self_time_dict.setdefault(name, []).append(value)
+    connect_time_list = []
+    for _ in range(repeat):
+        connect_time_list.append(await measure_first_connection(entry, port))
+    top_list = sorted(((name, statistics.median(value_list)) for name, value_list in self_time_dict.items()),
+                      key=lambda item: item[1], reverse=True)[:TOP_COUNT]
+    return {
+        "importMs": round(statistics.median(import_time_list) * 1000, 1),
+        "firstConnectionMs": round(statistics.median(connect_time_list) * 1000, 1),
+        "firstConnectionMaxMs": round(max(connect_time_list) * 1000, 1),
+        "slowestModules": [{"module": name, "selfMs": round(value * 1000, 1)} for name, value in top_list],
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Cold start profile of each entry point")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--entry", action="append", choices=ENTRY_LIST, help="只测指定入口，可重复")
+    parser.add_argument("--output", help="结果 Json 写入的文件")
+    args = parser.parse_args()
+    result_dict = {}
+    print(f"{'entry':<8} {'import(ms)':>11} {'first conn(ms)':>15} {'max(ms)':>9}  slowest modules (self ms)")
+    for index, entry in enumerate(args.entry or ENTRY_LIST):
+        result = await measure_entry(entry, args.repeat, BASE_PORT + index)
+        result_dict[entry] = result
+        slowest = ", ".join(f"{item['module']} {item['selfMs']}" for item in result["slowestModules"][:4])
+        print(f"{entry:<8} {result['importMs']:>11.1f} {result['firstConnectionMs']:>15.1f} "
+              f"{result['firstConnectionMaxMs']:>9.1f}  {slowest}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "repeat": args.repeat, "entries": result_dict}, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
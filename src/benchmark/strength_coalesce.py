@@ -0,0 +1,50 @@
+'''
+拖动强度滑条时的强度消息合并效果
+模拟 APP 每 10ms 上报一次强度、接收方每条消息发送耗时 SEND_TIME 秒，统计实际发送的消息数与最终强度
+在 src 目录下运行: python -m benchmark.strength_coalesce
+'''
+import asyncio
+from enums import OutboundFrameKind
+from outbound_queue import OutboundQueue, get_strength_coalesce_key
+
+REPORT_COUNT = 200
+REPORT_INTERVAL = 0.01
+SEND_TIME_LIST = [0.005, 0.02, 0.05]
+
+
+async def measure(send_time: float, coalesce: bool):
+    sent_list = []
+
+    async def send_text(text: str):
+        await asyncio.sleep(send_time)
+        sent_list.append(text)
+
+    async def on_close():
+        pass
+
+    queue = OutboundQueue(send_text, on_close, REPORT_COUNT, coalesce=coalesce)
+    loop = asyncio.get_running_loop()
+    start_time = loop.time()
+    for i in range(REPORT_COUNT):
+        message = f"strength-{i % 101}+0+100+100"
+        queue.put(message, OutboundFrameKind.STRENGTH, get_strength_coalesce_key(message))
+        await asyncio.sleep(REPORT_INTERVAL)
+    while len(queue):
+        await asyncio.sleep(send_time)
+    await asyncio.sleep(send_time * 2)
+    duration = loop.time() - start_time
+    queue.close()
+    assert sent_list[-1] == f"strength-{(REPORT_COUNT - 1) % 101}+0+100+100"
+    return len(sent_list), queue.stats.coalesced_count, queue.stats.max_depth, duration
+
+
+async def main():
+    print(f"{'send(ms)':>8} {'coalesce':>9} {'sent':>6} {'coalesced':>10} {'maxDepth':>9} {'drain(s)':>9}")
+    for send_time in SEND_TIME_LIST:
+        for coalesce in (False, True):
+            sent_count, coalesced_count, max_depth, duration = await measure(send_time, coalesce)
+            print(f"{send_time * 1000:>8.0f} {str(coalesce):>9} {sent_count:>6} {coalesced_count:>10} {max_depth:>9} {duration:>9.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,68 @@
+from collections import OrderedDict
+from typing import Any, Generic, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class CacheStats:
+    def __init__(self):
+        self.hit_count = 0
+        self.miss_count = 0
+        self.evict_count = 0
+
+
+class BoundedCache(Generic[T]):
+    '''
+    按条目数与估算内存双重限制的 LRU 缓存
+    - max_size : 最大条目数
+    - max_memory : 最大估算内存(字节)，0 为不限制，单条超过上限的值不会被缓存
+    '''
+
+    def __init__(self, max_size: int, max_memory: int = 0):
+        self.max_size = max(1, max_size)
+        self.max_memory = max(0, max_memory)
+        self.memory = 0
+        self.stats = CacheStats()
+        self._item_dict: OrderedDict[Hashable, Any] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._item_dict)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._item_dict
+
+    def clear(self):
+        self._item_dict.clear()
+        self.memory = 0
+
+    def get(self, key: Hashable) -> Optional[T]:
+        item = self._item_dict.get(key)
+        if item is None:
+            self.stats.miss_count += 1
+            return None
+        self.stats.hit_count += 1
+        self._item_dict.move_to_end(key)
+        return item[0]
+
+    def set(self, key: Hashable, value: T, size: int = 0):
+        if self.max_memory and size > self.max_memory:
+            return
+        exist_item = self._item_dict.pop(key, None)
+        if exist_item is not None:
+            self.memory -= exist_item[1]
+        self._item_dict[key] = (value, size)
+        self.memory += size
+        while len(self._item_dict) > self.max_size or (self.max_memory and self.memory > self.max_memory):
+            _, (_, evict_size) = self._item_dict.popitem(last=False)
+            self.memory -= evict_size
+            self.stats.evict_count += 1
+
+    def remove(self, key: Hashable) -> bool:
+        item = self._item_dict.pop(key, None)
+        if item is None:
+            return False
+        self.memory -= item[1]
+        return True
+
+    def is_full(self) -> bool:
+        return len(self._item_dict) >= self.max_size
@@ -1,131 +1,272 @@
 import multiprocessing
+import random
 import config
 import utils
 import custom_logger
 import asyncio
 import websockets
 import json
-from utils import DungeonLabMessage
+import codec
 from enums import MessageType, ChannelType, StrengthChangeMode
+from session import StrengthState
+from typing import Optional
 
 
-disconnect_event = asyncio.Event()
+class DungeonLabClient:
+    '''
+    DG-LAB 控制端，每个实例维护一条连接及其 clientId、绑定的 targetId 与 APP 上报的强度信息，
+    多个实例可共享同一事件循环，连接断开后按指数退避自动重连
+    重连后服务端会分配新的 clientId，APP 需要重新扫码绑定
+    async with DungeonLabClient(uri) as dg_client:
+        await dg_client.wait_bound()
+        await dg_client.send_strength_dg_message(ChannelType.A, StrengthChangeMode.INCREASE, 5)
+    '''
 
-websocket = None
+    def __init__(self, uri: str, reconnect: bool = True,
+                 reconnect_delay: float = config.CLIENT_RECONNECT_DELAY,
+                 reconnect_max_delay: float = config.CLIENT_RECONNECT_MAX_DELAY):
+        self.uri = uri
+        self.reconnect = reconnect
+        self.reconnect_delay = reconnect_delay
+        self.reconnect_max_delay = reconnect_max_delay
+        self.websocket = None
+        self.client_id = ""
+        self.target_id = ""
+        self.strength = StrengthState()
+        self.connect_count = 0
+        self.closed = False
+        self._connected_event = asyncio.Event()
+        self._bound_event = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
 
-client_id = ""
-target_id = ""
-strength_a = 0
-strength_b = 0
-strength_limit_a = 0
-strength_limit_b = 0
+    async def __aenter__(self) -> "DungeonLabClient":
+        self.start()
+        return self
 
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
 
-def client_run():
-    async def run():
+    @property
+    def connected(self) -> bool:
+        return self._connected_event.is_set()
+
+    @property
+    def bound(self) -> bool:
+        return self._bound_event.is_set()
+
+    def start(self):
+        if self._task is None:
+            self.closed = False
+            self._task = asyncio.create_task(self.run())
+
+    async def close(self):
+        self.closed = True
+        task = self._task
+        self._task = None
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        if self.websocket is not None:
+            await self.websocket.close()
+
+    def shutdown(self):
+        '''
+        在事件循环线程中同步停止，不等待连接关闭
+        '''
+        self.closed = True
+        if self._task is not None:
+            self._task.cancel()
+
+    async def wait_closed(self):
+        if self._task is not None:
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def wait_connected(self, timeout: Optional[float] = None):
+        '''
+        等待连接建立并收到服务端分配的 clientId
+        '''
+        await asyncio.wait_for(self._connected_event.wait(), timeout)
+
+    async def wait_bound(self, timeout: Optional[float] = None):
+        '''
+        等待 APP 扫码绑定
+        '''
+        await asyncio.wait_for(self._bound_event.wait(), timeout)
+
+    async def run(self):
+        delay = self.reconnect_delay
+        while not self.closed:
+            connect_count = self.connect_count
+            try:
+                await self.connect()
+            except asyncio.CancelledError:
+                raise
+            except websockets.ConnectionClosed:
+                custom_logger.info("【Client】 Connection closed")
+            except Exception as e:
+                custom_logger.error(f"【Client】 WebSocket connection error: {e!r}")
+            if self.closed or not self.reconnect:
+                break
+            # 本次连接成功过则从最小等待时间重新开始退避
+            if self.connect_count > connect_count:
+                delay = self.reconnect_delay
+            wait_time = random.uniform(delay / 2, delay)
+            custom_logger.info(f"【Client】 Reconnect in {wait_time:.1f}s")
+            await asyncio.sleep(wait_time)
+            delay = min(delay * 2, self.reconnect_max_delay)
+
+    async def connect(self):
+        '''
+        建立一次连接并处理消息直到断开
+        '''
+        async with websockets.connect(self.uri) as websocket:
+            self.websocket = websocket
+            try:
+                async for response in websocket:
+                    await self.on_receive_message(response)
+            finally:
+                self.websocket = None
+                self.target_id = ""
+                self._connected_event.clear()
+                self._bound_event.clear()
+
+    async def on_receive_message(self, response: str):
         try:
-            await asyncio.sleep(1)
-            uri = f"ws://{config.WS_CLIENT_HOST}:{config.WS_SERVER_PORT}"
-            await websocket_client(uri)
+            custom_logger.debug("【Client】 Received message: %s", response)
+            data = codec.decode_message(response)
+            type = data.type
+            message = data.message
+            if type == MessageType.BIND:
+                if message == "targetId":
+                    self.client_id = data.clientId
+                    self.connect_count += 1
+                    self._connected_event.set()
+                    custom_logger.info(f"【Client】 Bind clientId: {self.client_id}")
+                elif message == "DGLAB" and data.clientId == self.client_id:
+                    self.target_id = data.targetId
+                    self._bound_event.set()
+                    custom_logger.info(f"【Client】 Bind targetId: {self.target_id}")
+            elif type == MessageType.MSG:
+                if message.startswith("strength"):
+                    self.strength.update_from_message(message)
+            elif type == MessageType.BREAK:
+                self.target_id = ""
+                self._bound_event.clear()
+                custom_logger.info(f"【Client】 Target disconnected: {message}")
+            else:
+                pass
+        except json.JSONDecodeError as e:
+            custom_logger.error(f"【Client】 JSON decode error: {e}")
         except Exception as e:
-            custom_logger.error(f"【Client】 WebSocket connection error: {e}")
-        finally:
-            if websocket:
-                await websocket.close()
+            custom_logger.error(f"【Client】 Error processing message: {e}")
+
+    async def send_all_preset_pulse_message(self, channel: ChannelType):
+        preset_dict = utils.get_preset_wave_data_dict()
+        for preset in preset_dict.values():
+            await self.send_preset_pulse_message(channel, preset)
+
+    async def send_preset_pulse_message(self, channel: ChannelType, preset: str) -> bool:
+        preset = utils.get_preset_pulse_str(channel, preset)
+        return await self.send_dg_message(MessageType.MSG, preset)
+
+    async def send_pulse_dg_message(self, channel: ChannelType, pulse: str) -> bool:
+        pulse = utils.get_pulse_str(channel, pulse)
+        return await self.send_dg_message(MessageType.MSG, pulse)
+
+    async def send_clear_pulse_dg_message(self, channel: ChannelType) -> bool:
+        return await self.send_dg_message(MessageType.MSG, utils.get_clear_str(channel))
+
+    async def send_strength_dg_message(self, channel: ChannelType, mode: StrengthChangeMode, value: int) -> bool:
+        return await self.send_dg_message(MessageType.MSG, utils.get_strength_str(channel, mode, value))
+
+    async def send_dg_message(self, type: MessageType, message: str) -> bool:
+        '''
+        未连接时不发送并返回 False
+        '''
+        websocket = self.websocket
+        if websocket is None:
+            return False
+        message_list = utils.split_pulse_message(message) if type == MessageType.MSG else [message]
+        for message in message_list:
+            json_str = utils.get_dg_message_json(type, self.client_id, self.target_id, message)
+            custom_logger.debug("【Client】 Send message: %s", json_str)
+            await websocket.send(json_str)
+        return True
+
+    def get_qr_code_str(self) -> Optional[str]:
+        if self.websocket is None or not self.client_id:
+            return None
+        remote_address = self.websocket.remote_address
+        return utils.get_qr_code_str(remote_address[0], remote_address[1], self.client_id)
+
+    def show_qr_code(self):
+        qr_code_str = self.get_qr_code_str()
+        if qr_code_str is not None:
+            custom_logger.debug("【Client】 QR code string: %s", qr_code_str)
+            utils.show_qr_code(qr_code_str)
+
+
+default_client: Optional[DungeonLabClient] = None
+
+
+def get_default_uri() -> str:
+    return f"ws://{config.get_client_host()}:{config.WS_SERVER_PORT}"
+
+
+def client_run(start_delay: float = 1):
+    async def run():
+        global default_client
+        # 与服务同时启动时等待服务开始监听
+        await asyncio.sleep(start_delay)
+        async with DungeonLabClient(get_default_uri()) as default_client:
+            await default_client.wait_closed()
     asyncio.run(run())
 
 
 def client_shutdown():
-    global disconnect_event
-    disconnect_event.set()
-
-
-async def websocket_client(uri):
-    global disconnect_event, websocket
-    try:
-        async with websockets.connect(uri) as ws:
-            websocket = ws
-            while not disconnect_event.is_set():
-                response = await websocket.recv(True)
-                await on_receive_message(response)
-            await websocket.close()
-    except websockets.ConnectionClosed:
-        custom_logger.info("【Client】 Connection closed")
-    except Exception as e:
-        custom_logger.error(f"【Client】 Error: {e}")
-
-
-async def on_receive_message(response: str):
-    global client_id, target_id
-    try:
-        custom_logger.debug(rf"【Client】 Received message: {response}")
-        data = DungeonLabMessage.model_validate_json(json_data=response)
-        type = data.type
-        message = data.message
-        if type == MessageType.BIND:
-            if message == "targetId":
-                client_id = data.clientId
-                custom_logger.info(f"【Client】 Bind clientId: {client_id}")
-            elif message == "DGLAB" and data.clientId == client_id:
-                target_id = data.targetId
-                custom_logger.info(f"【Client】 Bind targetId: {target_id}")
-        elif type == MessageType.MSG:
-            if message.startswith("strength"):
-                global strength_a, strength_b, strength_limit_a, strength_limit_b
-                strength_arr = message.split("-")
-                strength_str = strength_arr[1]
-                strength_value_arr = strength_str.split("+")
-                strength_a = int(strength_value_arr[0])
-                strength_b = int(strength_value_arr[1])
-                strength_limit_a = int(strength_value_arr[2])
-                strength_limit_b = int(strength_value_arr[3])
-        else:
-            pass
-    except json.JSONDecodeError as e:
-        custom_logger.error(f"【Client】 JSON decode error: {e}")
-    except Exception as e:
-        custom_logger.error(f"【Client】 Error processing message: {e}")
+    if default_client is not None:
+        default_client.shutdown()
 
 
 async def send_all_preset_pulse_message(channel: ChannelType):
-    preset_dict = utils.get_preset_wave_data_dict()
-    for preset in preset_dict.values():
-        await send_preset_pulse_message(channel, preset)
+    if default_client is not None:
+        await default_client.send_all_preset_pulse_message(channel)
 
 
 async def send_preset_pulse_message(channel: ChannelType, preset: str):
-    preset = utils.get_preset_pulse_str(channel, preset)
-    await send_dg_message(MessageType.MSG, preset)
+    if default_client is not None:
+        await default_client.send_preset_pulse_message(channel, preset)
 
 
 async def send_pulse_dg_message(channel: ChannelType, pulse: str):
-    pulse = utils.get_pulse_str(channel, pulse)
-    await send_dg_message(MessageType.MSG, pulse)
+    if default_client is not None:
+        await default_client.send_pulse_dg_message(channel, pulse)
 
 
 async def send_clear_pulse_dg_message(channel: ChannelType):
-    await send_dg_message(MessageType.MSG, utils.get_clear_str(channel))
+    if default_client is not None:
+        await default_client.send_clear_pulse_dg_message(channel)
 
 
 async def send_strength_dg_message(channel: ChannelType, mode: StrengthChangeMode, value: int):
-    await send_dg_message(MessageType.MSG, utils.get_strength_str(channel, mode, value))
+    if default_client is not None:
+        await default_client.send_strength_dg_message(channel, mode, value)
 
 
 async def send_dg_message(type: MessageType, message: str):
-    custom_logger.debug(f"【Client】 Received message: {message}")
-    global websocket, client_id, target_id
-    if websocket:
-        json_str = utils.get_dg_message_json(type, client_id, target_id, message)
-        custom_logger.debug(f"【Client】 Send message: {json_str}")
-        await websocket.send(json_str)
+    if default_client is not None:
+        await default_client.send_dg_message(type, message)
 
 
 def show_qr_code():
-    if websocket:
-        remote_address = websocket.remote_address
-        qr_code_str = utils.get_qr_code_str(remote_address[0], remote_address[1], client_id)
-        custom_logger.debug(f"【Client】 QR code string: {qr_code_str}")
-        utils.show_qr_code(qr_code_str)
+    if default_client is not None:
+        default_client.show_qr_code()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,99 @@
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+class ClientRegistry:
+    '''
+    连接与绑定关系的双向索引，所有查询均为 O(1)
+    - uid_to_websocket : uid -> websocket
+    - websocket_to_uid : websocket -> uid
+    - client_to_target : client_id -> target_id
+    - target_to_client : target_id -> client_id
+    '''
+
+    def __init__(self):
+        self.uid_to_websocket: Dict[str, Any] = {}
+        self.websocket_to_uid: Dict[Any, str] = {}
+        self.client_to_target: Dict[str, str] = {}
+        self.target_to_client: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.uid_to_websocket)
+
+    def __contains__(self, uid: str) -> bool:
+        return uid in self.uid_to_websocket
+
+    def clear(self):
+        self.uid_to_websocket.clear()
+        self.websocket_to_uid.clear()
+        self.client_to_target.clear()
+        self.target_to_client.clear()
+
+    def add(self, websocket, uid: Optional[str] = None) -> str:
+        exist_uid = self.websocket_to_uid.get(websocket)
+        if exist_uid is not None:
+            return exist_uid
+        if uid is None:
+            uid = str(uuid.uuid4())
+        self.uid_to_websocket[uid] = websocket
+        self.websocket_to_uid[websocket] = uid
+        return uid
+
+    def remove(self, websocket) -> Optional[str]:
+        uid = self.websocket_to_uid.pop(websocket, None)
+        if uid is None:
+            return None
+        self.uid_to_websocket.pop(uid, None)
+        self.unbind(uid)
+        return uid
+
+    def bind(self, client_id: str, target_id: str):
+        self.client_to_target[client_id] = target_id
+        self.target_to_client[target_id] = client_id
+
+    def unbind(self, uid: str):
+        target_id = self.client_to_target.pop(uid, None)
+        if target_id is not None:
+            self.target_to_client.pop(target_id, None)
+        client_id = self.target_to_client.pop(uid, None)
+        if client_id is not None:
+            self.client_to_target.pop(client_id, None)
+
+    def get_websocket(self, uid: str):
+        return self.uid_to_websocket.get(uid)
+
+    def get_uid(self, websocket) -> Optional[str]:
+        return self.websocket_to_uid.get(websocket)
+
+    def get_target_id(self, client_id: str) -> Optional[str]:
+        return self.client_to_target.get(client_id)
+
+    def get_client_id(self, target_id: str) -> Optional[str]:
+        return self.target_to_client.get(target_id)
+
+    def get_pair(self, uid: str) -> Optional[Tuple[str, str]]:
+        '''
+        uid 为绑定关系中的任一方时返回 (client_id, target_id)
+        '''
+        target_id = self.client_to_target.get(uid)
+        if target_id is not None:
+            return uid, target_id
+        client_id = self.target_to_client.get(uid)
+        if client_id is not None:
+            return client_id, uid
+        return None
+
+    def get_pair_list(self) -> List[Tuple[str, str]]:
+        return list(self.client_to_target.items())
+
+    def is_client(self, uid: str) -> bool:
+        return uid in self.client_to_target
+
+    def is_target(self, uid: str) -> bool:
+        return uid in self.target_to_client
+
+    def is_bound(self, uid: str) -> bool:
+        return uid in self.client_to_target or uid in self.target_to_client
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        return iter(list(self.uid_to_websocket.items()))
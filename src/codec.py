@@ -0,0 +1,53 @@
+'''
+APP 收信协议消息 {type, clientId, targetId, message} 的快速编解码
+- 编码: 按 (type, clientId, targetId) 缓存已转义的 Json 前缀，发送时只需转义并拼接 message，输出与 DungeonLabMessage.model_dump_json 一致
+- 解码: 使用 pydantic_core.from_json 解析后直接取四个字段，缺少字段或类型不符时回退到 DungeonLabMessage.model_validate_json 完整校验
+'''
+from functools import lru_cache
+from json.encoder import encode_basestring
+from pydantic_core import from_json
+from enums import MessageType
+from models import DungeonLabMessage
+
+MESSAGE_TYPE_DICT = {message_type.value: message_type for message_type in MessageType}
+
+
+class DungeonLabFrame:
+    '''
+    解码后的消息，字段与 DungeonLabMessage 相同
+    '''
+    __slots__ = ("type", "clientId", "targetId", "message")
+
+    def __init__(self, type: MessageType, clientId: str, targetId: str, message: str):
+        self.type = type
+        self.clientId = clientId
+        self.targetId = targetId
+        self.message = message
+
+
+@lru_cache(maxsize=4096)
+def get_message_head(type: MessageType, client_id: str, target_id: str) -> str:
+    return ('{"type":' + encode_basestring(type.value) + ',"clientId":' + encode_basestring(client_id)
+            + ',"targetId":' + encode_basestring(target_id) + ',"message":')
+
+
+def encode_message_body(message: str) -> str:
+    return encode_basestring(message) + "}"
+
+
+def encode_message(type: MessageType, client_id: str, target_id: str, message: str) -> str:
+    return get_message_head(type, client_id, target_id) + encode_basestring(message) + "}"
+
+
+def decode_message(text: str) -> DungeonLabFrame:
+    try:
+        data = from_json(text)
+        client_id = data["clientId"]
+        target_id = data["targetId"]
+        message = data["message"]
+        if type(client_id) is str and type(target_id) is str and type(message) is str:
+            return DungeonLabFrame(MESSAGE_TYPE_DICT[data["type"]], client_id, target_id, message)
+    except (ValueError, KeyError, TypeError):
+        pass
+    model = DungeonLabMessage.model_validate_json(json_data=text)
+    return DungeonLabFrame(model.type, model.clientId, model.targetId, model.message)
@@ -2,6 +2,7 @@ import os
 import socket
 import logging
 import sys
+import threading
 import tomllib
 
 default_config = """
@@ -9,6 +10,44 @@ default_config = """
 PORT = 4503
 RUN_TEMP_CLIENT = true
 HEARTBEAT_INTERVAL = 30
+HEARTBEAT_BATCH_SIZE = 500
+HEARTBEAT_SEND_TIMEOUT = 5
+HEARTBEAT_TIMEOUT = 0
+PRESET_CACHE_SIZE = 256
+PRESET_CACHE_MEMORY_MB = 32
+DECODE_CACHE_SIZE = 1024
+DECODE_CACHE_MEMORY_MB = 16
+PULSE_ENGINE = "python"
+PULSE_STREAM = false
+PULSE_STREAM_BATCH_FRAMES = 10
+PULSE_STREAM_LOOKAHEAD = 1.0
+BATCH_SEND_CONCURRENCY = 64
+BATCH_SEND_TIMEOUT = 5
+OUTBOUND_QUEUE_SIZE = 256
+OUTBOUND_OVERFLOW_POLICY = "drop_oldest"
+STRENGTH_COALESCE = true
+STRENGTH_RAMP_TICK_RATE = 10
+EVENT_KEEPALIVE_INTERVAL = 15
+EVENT_BUFFER_SIZE = 64
+WORKERS = 1
+BACKPLANE = "memory"
+BACKPLANE_ADDRESS = "127.0.0.1:4504"
+BACKPLANE_BROKER = true
+QR_CODE_MODE = "window"
+QR_CODE_CACHE_SIZE = 256
+QR_CODE_MAX_PENDING = 8
+CLIENT_RECONNECT_DELAY = 1
+CLIENT_RECONNECT_MAX_DELAY = 30
+PROCESS_RESTART_DELAY = 1
+PROCESS_RESTART_MAX_DELAY = 60
+CLIENT_HOST = ""
+LOCAL_IP_TIMEOUT = 1.0
+PRESET_LIBRARY = ""
+COMPOSE_CACHE_SIZE = 128
+COMPOSE_CACHE_MEMORY_MB = 32
+COMPOSE_MAX_FRAMES = 6000
+LOG_LEVEL = "INFO"
+LOG_QUEUE = true
 LOG_TO_FILE = false
 """
 
@@ -39,20 +78,87 @@ def load_toml_config():
         return tomllib.load(f)
 
 
-def get_local_ip():
+def get_local_ip(timeout: float = 1.0) -> str:
+    '''
+    UDP 连接不发送数据，只用于取出口网卡地址；失败时在后台线程中按主机名解析，超时返回 127.0.0.1
+    '''
     try:
         with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.settimeout(timeout)
             s.connect(('8.8.8.8', 80))
             return s.getsockname()[0]
     except Exception:
-        return socket.gethostbyname(socket.gethostname())
+        pass
+    result_list = []
+
+    def resolve():
+        try:
+            result_list.append(socket.gethostbyname(socket.gethostname()))
+        except Exception:
+            pass
+    thread = threading.Thread(target=resolve, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return result_list[0] if result_list else "127.0.0.1"
+
+
+client_host_lock = threading.Lock()
+
+
+def get_client_host() -> str:
+    '''
+    二维码与内置客户端使用的本机地址，配置文件未指定 CLIENT_HOST 时在首次调用时检测
+    '''
+    global WS_CLIENT_HOST
+    with client_host_lock:
+        if not WS_CLIENT_HOST:
+            WS_CLIENT_HOST = get_local_ip(LOCAL_IP_TIMEOUT)
+    return WS_CLIENT_HOST
 
 ensure_config()
 toml_config = load_toml_config().get("Misc", {})
 RUN_TEMP_CLIENT = toml_config.get("RUN_TEMP_CLIENT", True)
 WS_SERVER_HOST = "0.0.0.0"
-WS_CLIENT_HOST = get_local_ip() #socket.gethostbyname(socket.gethostname())
+WS_CLIENT_HOST = toml_config.get("CLIENT_HOST", "")  # 二维码与内置客户端使用的本机地址，留空时自动检测
+LOCAL_IP_TIMEOUT = toml_config.get("LOCAL_IP_TIMEOUT", 1.0)  # 自动检测本机地址的超时秒数，超时使用 127.0.0.1
+PRESET_LIBRARY = toml_config.get("PRESET_LIBRARY", "")  # 预编译波形库文件路径，相对路径基于程序所在目录，留空为不加载
+COMPOSE_CACHE_SIZE = toml_config.get("COMPOSE_CACHE_SIZE", 128)  # 合成波形编译结果缓存数
+COMPOSE_CACHE_MEMORY_MB = toml_config.get("COMPOSE_CACHE_MEMORY_MB", 32)  # 合成波形编译结果缓存的估算内存上限，0 为不限制
+COMPOSE_MAX_FRAMES = toml_config.get("COMPOSE_MAX_FRAMES", 6000)  # 单个通道合成波形的最大帧数，每帧 100ms
 WS_SERVER_PORT = toml_config.get("PORT", 4503)
 HEARTBEAT_INTERVAL = toml_config.get("HEARTBEAT_INTERVAL", 30)
-LOG_LEVEL = logging.DEBUG
+HEARTBEAT_BATCH_SIZE = toml_config.get("HEARTBEAT_BATCH_SIZE", 500)
+HEARTBEAT_SEND_TIMEOUT = toml_config.get("HEARTBEAT_SEND_TIMEOUT", 5)
+HEARTBEAT_TIMEOUT = toml_config.get("HEARTBEAT_TIMEOUT", 0)  # 超过该秒数未收到消息则断开，0 为不检测
+PRESET_CACHE_SIZE = toml_config.get("PRESET_CACHE_SIZE", 256)
+PRESET_CACHE_MEMORY_MB = toml_config.get("PRESET_CACHE_MEMORY_MB", 32)  # 预编译波形缓存的估算内存上限，0 为不限制
+DECODE_CACHE_SIZE = toml_config.get("DECODE_CACHE_SIZE", 1024)
+DECODE_CACHE_MEMORY_MB = toml_config.get("DECODE_CACHE_MEMORY_MB", 16)
+PULSE_ENGINE = toml_config.get("PULSE_ENGINE", "python")  # python 或 numpy
+PULSE_STREAM = toml_config.get("PULSE_STREAM", False)  # 预设波形按实时进度分批推送
+PULSE_STREAM_BATCH_FRAMES = toml_config.get("PULSE_STREAM_BATCH_FRAMES", 10)  # 每条消息的波形帧数，每帧 100ms
+PULSE_STREAM_LOOKAHEAD = toml_config.get("PULSE_STREAM_LOOKAHEAD", 1.0)  # 已发送波形最多领先播放进度的秒数
+BATCH_SEND_CONCURRENCY = toml_config.get("BATCH_SEND_CONCURRENCY", 64)  # 批量发送时同时发送的目标数上限
+BATCH_SEND_TIMEOUT = toml_config.get("BATCH_SEND_TIMEOUT", 5)  # 批量发送时单个目标的超时秒数，0 为不限制
+OUTBOUND_QUEUE_SIZE = toml_config.get("OUTBOUND_QUEUE_SIZE", 256)  # 每个连接发送队列的最大消息数，0 为不使用队列直接发送
+OUTBOUND_OVERFLOW_POLICY = toml_config.get("OUTBOUND_OVERFLOW_POLICY", "drop_oldest")  # drop_oldest, coalesce 或 disconnect
+STRENGTH_COALESCE = toml_config.get("STRENGTH_COALESCE", True)  # 发送队列中同通道未发送的设定强度消息只保留最新一条
+STRENGTH_RAMP_TICK_RATE = toml_config.get("STRENGTH_RAMP_TICK_RATE", 10)  # 强度渐变每秒最多发送的设定强度消息数
+EVENT_KEEPALIVE_INTERVAL = toml_config.get("EVENT_KEEPALIVE_INTERVAL", 15)  # 事件订阅无事件时发送保活注释行的间隔秒数
+EVENT_BUFFER_SIZE = toml_config.get("EVENT_BUFFER_SIZE", 64)  # 每个 APP 缓存的反馈事件数，订阅者落后更多时丢弃最早的事件
+WORKERS = toml_config.get("WORKERS", 1)  # 服务进程数，大于 1 时自动使用 socket 背板
+BACKPLANE = toml_config.get("BACKPLANE", "memory")  # memory 或 socket
+BACKPLANE_ADDRESS = toml_config.get("BACKPLANE_ADDRESS", "127.0.0.1:4504")  # host:port 或 Unix 域套接字路径
+BACKPLANE_BROKER = toml_config.get("BACKPLANE_BROKER", True)  # 是否在本机启动背板 broker，多机部署时只需一台启动
+QR_CODE_MODE = toml_config.get("QR_CODE_MODE", "window")  # window, terminal 或 headless
+QR_CODE_CACHE_SIZE = toml_config.get("QR_CODE_CACHE_SIZE", 256)
+QR_CODE_MAX_PENDING = toml_config.get("QR_CODE_MAX_PENDING", 8)  # 排队等待显示或生成的二维码数上限，超出时跳过显示、图片请求返回 503
+CLIENT_RECONNECT_DELAY = toml_config.get("CLIENT_RECONNECT_DELAY", 1)  # 客户端断线后首次重连的等待秒数，之后按指数退避
+CLIENT_RECONNECT_MAX_DELAY = toml_config.get("CLIENT_RECONNECT_MAX_DELAY", 30)  # 客户端重连等待秒数上限
+PROCESS_RESTART_DELAY = toml_config.get("PROCESS_RESTART_DELAY", 1)  # 服务或内置客户端进程意外退出后首次重启的等待秒数，之后按指数退避
+PROCESS_RESTART_MAX_DELAY = toml_config.get("PROCESS_RESTART_MAX_DELAY", 60)  # 进程重启等待秒数上限
+LOG_LEVEL = logging.getLevelName(str(toml_config.get("LOG_LEVEL", "INFO")).upper())  # DEBUG, INFO, WARNING, ERROR 或 CRITICAL
+if not isinstance(LOG_LEVEL, int):
+    LOG_LEVEL = logging.INFO
+LOG_QUEUE = toml_config.get("LOG_QUEUE", True)  # 日志由后台线程输出
 LOG_TO_FILE = toml_config.get("LOG_TO_FILE", False)
@@ -1,4 +1,9 @@
+import atexit
 import logging
+import logging.handlers
+import multiprocessing.util
+import queue
+import threading
 import colorlog
 import os
 import config
@@ -7,6 +12,7 @@ from datetime import datetime
 
 logger = logging.getLogger("custom_logger")
 logger.setLevel(config.LOG_LEVEL)
+handler_list = []
 
 console_handler = logging.StreamHandler()
 console_handler.setLevel(config.LOG_LEVEL)
@@ -26,7 +32,7 @@ color_formatter = colorlog.ColoredFormatter(
     }
 )
 console_handler.setFormatter(color_formatter)
-logger.addHandler(console_handler)
+handler_list.append(console_handler)
 
 if config.LOG_TO_FILE:
     base_path = config.get_base_path()
@@ -37,11 +43,77 @@ if config.LOG_TO_FILE:
     file_handler = logging.FileHandler(log_file_path, encoding="utf-8")
     file_handler.setLevel(config.LOG_LEVEL)
     file_handler.setFormatter(logging.Formatter(log_format))
-    logger.addHandler(file_handler)
+    handler_list.append(file_handler)
 
+class ProcessQueueHandler(logging.handlers.QueueHandler):
+    '''
+    开启 LOG_QUEUE 时调用方只把日志记录放入队列，由后台线程写入终端与文件，不阻塞事件循环
+    后台线程在每个进程首次输出日志时才启动，fork 出的子进程不会继承父进程的线程，需要各自启动
+    '''
 
-def debug(msg): logger.debug(msg)
-def info(msg): logger.info(msg)
-def warning(msg): logger.warning(msg)
-def error(msg): logger.error(msg)
-def critical(msg): logger.critical(msg)
+    def __init__(self):
+        super().__init__(queue.SimpleQueue())
+        self.listener = None
+        self.pid = None
+        self.listener_lock = threading.Lock()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset_lock)
+
+    def _reset_lock(self):
+        # fork 时若有其他线程持有锁，子进程中的锁永远不会被释放
+        self.listener_lock = threading.Lock()
+
+    def enqueue(self, record):
+        if self.pid != os.getpid():
+            self.start_listener()
+        super().enqueue(record)
+
+    def start_listener(self):
+        with self.listener_lock:
+            if self.pid == os.getpid():
+                return
+            # 子进程中使用新的队列，父进程尚未输出的记录不会在子进程中重复输出
+            self.queue = queue.SimpleQueue()
+            self.listener = logging.handlers.QueueListener(self.queue, *handler_list, respect_handler_level=True)
+            self.listener.start()
+            self.pid = os.getpid()
+            # multiprocessing 子进程退出时不执行 atexit，由其退出流程调用 Finalize 输出剩余记录
+            multiprocessing.util.Finalize(self, self.stop_listener, exitpriority=0)
+
+    def stop_listener(self):
+        if self.listener is not None and self.pid == os.getpid():
+            self.listener.stop()
+            self.listener = None
+            self.pid = None
+
+
+queue_handler = None
+if config.LOG_QUEUE:
+    queue_handler = ProcessQueueHandler()
+    logger.addHandler(queue_handler)
+    atexit.register(queue_handler.stop_listener)
+else:
+    for handler in handler_list:
+        logger.addHandler(handler)
+
+
+def set_level(level):
+    logger.setLevel(level)
+    for handler in handler_list:
+        handler.setLevel(level)
+
+
+def is_debug_enabled() -> bool:
+    return logger.isEnabledFor(logging.DEBUG)
+
+
+# 支持 %s 延迟格式化，日志级别未开启时不会格式化参数
+def debug(msg, *args):
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(msg, *args)
+
+
+def info(msg, *args): logger.info(msg, *args)
+def warning(msg, *args): logger.warning(msg, *args)
+def error(msg, *args): logger.error(msg, *args)
+def critical(msg, *args): logger.critical(msg, *args)
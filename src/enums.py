@@ -70,4 +70,36 @@ class ChannelType(Enum):
 class StrengthChangeMode(Enum):
     DECREASE = 0
     INCREASE = 1
-    FIXED = 2
\ No newline at end of file
+    FIXED = 2
+
+class OutboundFrameKind(Enum):
+    '''
+    - PULSE : 波形消息，队列溢出时可丢弃
+    - STRENGTH : 强度消息，队列溢出时可合并
+    - OTHER : 其他消息，不丢弃
+    '''
+    PULSE = 1
+    STRENGTH = 2
+    OTHER = 3
+
+
+class OverflowPolicy(Enum):
+    '''
+    - DROP_OLDEST : 丢弃最早的波形消息
+    - COALESCE : 优先合并同通道的强度消息，无可合并时丢弃最早的波形消息
+    - DISCONNECT : 直接断开连接
+    '''
+    DROP_OLDEST = "drop_oldest"
+    COALESCE = "coalesce"
+    DISCONNECT = "disconnect"
+
+
+class StrengthRampCurve(Enum):
+    '''
+    - LINEAR : 匀速
+    - EASE : 缓入缓出
+    - STEP : 到时一次跳变
+    '''
+    LINEAR = "linear"
+    EASE = "ease"
+    STEP = "step"
@@ -0,0 +1,130 @@
+import asyncio
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, Tuple
+
+KEEPALIVE_PAYLOAD = ": keepalive\n\n"
+
+
+def format_event(event: str, data: str) -> str:
+    '''
+    Server-Sent Events 格式的一条事件，data 不能包含换行
+    '''
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+class EventChannel:
+    '''
+    单个 APP 的事件广播通道
+    强度信息只保留最新一条，订阅者落后时直接取最新值；其他事件保存在定长缓冲中，订阅者落后超过缓冲长度时丢弃最早的事件
+    发布时只唤醒一次共享的 asyncio.Event，事件内容预先格式化，各订阅者共用同一份
+    '''
+
+    def __init__(self, target_id: str, buffer_size: int):
+        self.target_id = target_id
+        self.strength_version = 0
+        self.strength_payload = ""
+        self.event_seq = 0
+        self.event_buffer: Deque[Tuple[int, str]] = deque(maxlen=max(1, buffer_size))
+        self.subscriber_count = 0
+        self.closed = False
+        self.close_payload = ""
+        self._changed = asyncio.Event()
+
+    def notify(self):
+        changed = self._changed
+        self._changed = asyncio.Event()
+        changed.set()
+
+    def get_changed_event(self) -> asyncio.Event:
+        return self._changed
+
+
+class EventHub:
+    '''
+    按 APP 的 uid 向订阅者推送强度变化与反馈事件，没有订阅者的 APP 发布时直接跳过
+    '''
+
+    def __init__(self, buffer_size: int = 64, keepalive: float = 15):
+        self.buffer_size = buffer_size
+        self.keepalive = keepalive
+        self.channel_dict: Dict[str, EventChannel] = {}
+
+    def is_subscribed(self, target_id: str) -> bool:
+        return target_id in self.channel_dict
+
+    def get_subscriber_count(self) -> int:
+        return sum(channel.subscriber_count for channel in self.channel_dict.values())
+
+    def publish_strength(self, target_id: str, payload: str):
+        channel = self.channel_dict.get(target_id)
+        if channel is None or channel.strength_payload == payload:
+            return
+        channel.strength_payload = payload
+        channel.strength_version += 1
+        channel.notify()
+
+    def publish_event(self, target_id: str, payload: str):
+        channel = self.channel_dict.get(target_id)
+        if channel is None:
+            return
+        channel.event_seq += 1
+        channel.event_buffer.append((channel.event_seq, payload))
+        channel.notify()
+
+    def close(self, target_id: str, payload: str = ""):
+        '''
+        APP 断开时结束该 APP 的所有订阅，payload 为结束前发送的最后一条事件
+        '''
+        channel = self.channel_dict.pop(target_id, None)
+        if channel is not None:
+            channel.closed = True
+            channel.close_payload = payload
+            channel.notify()
+
+    def close_all(self):
+        for target_id in list(self.channel_dict.keys()):
+            self.close(target_id)
+
+    def open(self, target_id: str, strength_payload: str) -> EventChannel:
+        '''
+        在请求处理中同步取得通道并计入订阅数，此后 APP 断开时 close 会结束该通道，不会留下无人关闭的通道
+        返回的通道必须交给 subscribe，订阅结束时才减少订阅数，其他订阅先结束也不会移除尚未开始迭代的订阅所持有的通道
+        '''
+        channel = self.channel_dict.get(target_id)
+        if channel is None:
+            channel = EventChannel(target_id, self.buffer_size)
+            channel.strength_payload = strength_payload
+            self.channel_dict[target_id] = channel
+        channel.subscriber_count += 1
+        return channel
+
+    async def subscribe(self, channel: EventChannel) -> AsyncIterator[str]:
+        '''
+        先返回当前强度信息，之后返回变化的强度信息与新事件，keepalive 秒内没有事件时返回注释行保持连接
+        '''
+        strength_version = channel.strength_version
+        event_seq = channel.event_seq
+        try:
+            yield channel.strength_payload
+            while not channel.closed:
+                changed = channel.get_changed_event()
+                if channel.event_seq != event_seq:
+                    payload_list = [payload for seq, payload in channel.event_buffer if seq > event_seq]
+                    event_seq = channel.event_seq
+                    for payload in payload_list:
+                        yield payload
+                    continue
+                if channel.strength_version != strength_version:
+                    strength_version = channel.strength_version
+                    yield channel.strength_payload
+                    continue
+                try:
+                    await asyncio.wait_for(changed.wait(), self.keepalive)
+                except asyncio.TimeoutError:
+                    yield KEEPALIVE_PAYLOAD
+            if channel.close_payload:
+                yield channel.close_payload
+        finally:
+            channel.subscriber_count -= 1
+            if channel.subscriber_count == 0 and self.channel_dict.get(channel.target_id) is channel:
+                del self.channel_dict[channel.target_id]
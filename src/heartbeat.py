@@ -0,0 +1,115 @@
+import asyncio
+import math
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+import custom_logger
+from client_registry import ClientRegistry
+
+
+class HeartbeatStats:
+    def __init__(self):
+        self.sweep_count = 0
+        self.sent_count = 0
+        self.failed_count = 0
+        self.dropped_count = 0
+        self.last_sweep_clients = 0
+        self.last_sweep_duration = 0.0
+        self.max_sweep_duration = 0.0
+
+
+class HeartbeatScheduler:
+    '''
+    全服共用的心跳调度器
+    每个心跳周期遍历一次连接索引，将连接按 batch_size 分批，批次均匀分布在整个周期内发送，
+    发送失败或超过 timeout 秒未收到任何消息的连接将通过 on_drop 断开
+    '''
+
+    def __init__(self, registry: ClientRegistry,
+                 send: Callable[[Any, str], Awaitable[None]],
+                 on_drop: Callable[[Any], Awaitable[None]],
+                 interval: float, batch_size: int = 500,
+                 send_timeout: float = 5, timeout: float = 0):
+        self.registry = registry
+        self.send = send
+        self.on_drop = on_drop
+        self.interval = interval
+        self.batch_size = max(1, batch_size)
+        self.send_timeout = send_timeout
+        self.timeout = timeout
+        self.stats = HeartbeatStats()
+        self.last_seen_dict: Dict[Any, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def touch(self, websocket):
+        self.last_seen_dict[websocket] = time.monotonic()
+
+    def forget(self, websocket):
+        self.last_seen_dict.pop(websocket, None)
+
+    async def run(self):
+        while True:
+            await self.sweep()
+
+    async def sweep(self):
+        loop = asyncio.get_running_loop()
+        start_time = loop.time()
+        client_list = list(self.registry.items())
+        batch_num = max(1, math.ceil(len(client_list) / self.batch_size))
+        slice_time = self.interval / batch_num
+        busy_time = 0.0
+        for i in range(batch_num):
+            await asyncio.sleep(max(0.0, start_time + (i + 1) * slice_time - loop.time()))
+            batch_start_time = loop.time()
+            batch = client_list[i * self.batch_size:(i + 1) * self.batch_size]
+            await self._send_batch(batch)
+            busy_time += loop.time() - batch_start_time
+        stats = self.stats
+        stats.sweep_count += 1
+        stats.last_sweep_clients = len(client_list)
+        stats.last_sweep_duration = busy_time
+        stats.max_sweep_duration = max(stats.max_sweep_duration, busy_time)
+
+    async def _send_batch(self, batch):
+        now = time.monotonic()
+        send_list = []
+        for uid, websocket in batch:
+            if self.registry.get_uid(websocket) != uid:
+                continue
+            if self.timeout > 0 and now - self.last_seen_dict.get(websocket, now) > self.timeout:
+                custom_logger.warning(f"【Server】 Client {uid} heartbeat timeout")
+                await self._drop(websocket)
+                continue
+            send_list.append((uid, websocket))
+        if not send_list:
+            return
+        result_list = await asyncio.gather(
+            *(asyncio.wait_for(self.send(websocket, uid), self.send_timeout) for uid, websocket in send_list),
+            return_exceptions=True)
+        for (uid, websocket), result in zip(send_list, result_list):
+            if isinstance(result, BaseException):
+                self.stats.failed_count += 1
+                custom_logger.warning(f"【Server】 Send heartbeat to client {uid} error: {result!r}")
+                await self._drop(websocket)
+            else:
+                self.stats.sent_count += 1
+
+    async def _drop(self, websocket):
+        self.stats.dropped_count += 1
+        self.forget(websocket)
+        try:
+            await self.on_drop(websocket)
+        except Exception as e:
+            custom_logger.error(f"【Server】 Drop client error: {e}")
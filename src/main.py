@@ -1,10 +1,17 @@
 import asyncio
 import multiprocessing
+import multiprocessing.connection
+import signal
+import time
+from typing import Callable, List, Optional
 import config
 import custom_logger
 import server
 import client
 
+STOP_TIMEOUT = 10  # 关闭时等待每个子进程退出的秒数，超时后强制结束
+STABLE_UPTIME = 60  # 子进程运行超过该秒数后才退出视为偶发故障，重启等待从最小值重新开始
+
 
 def run_server():
     server.server_run()
@@ -14,23 +21,147 @@ def run_client():
     client.client_run()
 
 
-def start_process(target):
-    p = multiprocessing.Process(target=target)
-    p.daemon = True
+def run_child(target: Callable[[], None]):
+    # fork 出的子进程会继承监控进程的信号处理，恢复默认处理以便能被 terminate 与 Ctrl+C 结束
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    target()
+
+
+def start_process(target, daemon: bool = True):
+    p = multiprocessing.Process(target=run_child, args=(target,))
+    p.daemon = daemon
     p.start()
     return p
 
 
+class SupervisedProcess:
+    '''
+    由 Supervisor 看护的子进程，记录累计运行时间与重启次数
+    '''
+
+    def __init__(self, name: str, target: Callable[[], None], daemon: bool = True):
+        self.name = name
+        self.target = target
+        self.daemon = daemon
+        self.process: Optional[multiprocessing.Process] = None
+        self.start_time = 0.0
+        self.uptime = 0.0
+        self.restart_count = 0
+        self.failure_count = 0
+        self.restart_time: Optional[float] = None
+        self.exitcode: Optional[int] = None
+
+    def start(self):
+        self.process = start_process(self.target, self.daemon)
+        self.start_time = time.monotonic()
+        self.restart_time = None
+
+    def get_run_time(self) -> float:
+        return time.monotonic() - self.start_time if self.process is not None else 0.0
+
+    def get_uptime(self) -> float:
+        return self.uptime + self.get_run_time()
+
+    def on_exited(self) -> float:
+        run_time = self.get_run_time()
+        self.uptime += run_time
+        self.process.join()
+        self.exitcode = self.process.exitcode
+        self.process = None
+        return run_time
+
+
+class Supervisor:
+    '''
+    启动并看护服务与内置客户端进程
+    阻塞等待子进程的 sentinel，不占用 CPU；子进程意外退出时按指数退避重启，
+    收到 SIGTERM 或 SIGINT 时按启动的逆序结束子进程，并输出各进程的运行时间与重启次数
+    '''
+
+    def __init__(self, restart_delay: float = 1, restart_max_delay: float = 60):
+        self.restart_delay = restart_delay
+        self.restart_max_delay = restart_max_delay
+        self.process_list: List[SupervisedProcess] = []
+        self.stopping = False
+        # 信号处理中写入管道以唤醒阻塞在 wait 上的主循环
+        self.wakeup_reader, self.wakeup_writer = multiprocessing.Pipe(duplex=False)
+
+    def add(self, name: str, target: Callable[[], None], daemon: bool = True):
+        self.process_list.append(SupervisedProcess(name, target, daemon))
+
+    def request_stop(self, signum=None, frame=None):
+        if not self.stopping:
+            self.stopping = True
+            self.wakeup_writer.send_bytes(b"")
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.request_stop)
+        signal.signal(signal.SIGINT, self.request_stop)
+        try:
+            for supervised in self.process_list:
+                supervised.start()
+            while not self.stopping:
+                self.restart_due()
+                self.wait()
+        finally:
+            self.stop()
+
+    def restart_due(self):
+        now = time.monotonic()
+        for supervised in self.process_list:
+            if supervised.restart_time is not None and supervised.restart_time <= now:
+                supervised.restart_count += 1
+                supervised.start()
+                custom_logger.info(f"【Main】 {supervised.name} process restarted, restart count: {supervised.restart_count}")
+
+    def wait(self):
+        sentinel_dict = {supervised.process.sentinel: supervised for supervised in self.process_list if supervised.process is not None}
+        restart_time_list = [supervised.restart_time for supervised in self.process_list if supervised.restart_time is not None]
+        timeout = max(0.0, min(restart_time_list) - time.monotonic()) if restart_time_list else None
+        for ready in multiprocessing.connection.wait([self.wakeup_reader, *sentinel_dict.keys()], timeout):
+            supervised = sentinel_dict.get(ready)
+            if supervised is not None:
+                self.on_process_exited(supervised)
+
+    def on_process_exited(self, supervised: SupervisedProcess):
+        run_time = supervised.on_exited()
+        if self.stopping:
+            return
+        if run_time >= STABLE_UPTIME:
+            supervised.failure_count = 0
+        delay = min(self.restart_max_delay, self.restart_delay * 2 ** supervised.failure_count)
+        supervised.failure_count += 1
+        supervised.restart_time = time.monotonic() + delay
+        custom_logger.warning(f"【Main】 {supervised.name} process exited with code {supervised.exitcode} after {run_time:.1f}s, "
+                              f"restart in {delay:.1f}s")
+
+    def stop(self):
+        for supervised in reversed(self.process_list):
+            process = supervised.process
+            if process is None:
+                continue
+            if process.is_alive():
+                process.terminate()
+            process.join(STOP_TIMEOUT)
+            if process.is_alive():
+                custom_logger.warning(f"【Main】 {supervised.name} process did not exit in {STOP_TIMEOUT}s, killing")
+                process.kill()
+            supervised.on_exited()
+        for supervised in self.process_list:
+            custom_logger.info(f"【Main】 {supervised.name} process uptime: {supervised.get_uptime():.1f}s, "
+                               f"restart count: {supervised.restart_count}")
+
+
 def main():
     custom_logger.info("Starting...")
-    try:
-        start_process(run_server)
-        if config.RUN_TEMP_CLIENT:
-            start_process(run_client)
-        while True:
-            pass
-    except KeyboardInterrupt:
-        custom_logger.info("Exiting...")
+    supervisor = Supervisor(config.PROCESS_RESTART_DELAY, config.PROCESS_RESTART_MAX_DELAY)
+    # 多 worker 或需要启动背板 broker 时服务进程还要创建子进程，不能为守护进程
+    supervisor.add("Server", run_server, not server.has_child_process())
+    if config.RUN_TEMP_CLIENT:
+        supervisor.add("Client", run_client)
+    supervisor.run()
+    custom_logger.info("Exiting...")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,175 @@
+'''
+Prometheus 文本格式的运行指标
+所有指标只在事件循环线程中更新，计数器与直方图均为普通整数/浮点数累加，无锁，
+只有请求 /metrics 时才会格式化输出，gauge 类指标在输出时通过回调实时读取
+'''
+import bisect
+import time
+from typing import Callable, Dict, Iterable, List, Tuple
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(label_names: Tuple[str, ...], label_values: LabelValues, extra: str = "") -> str:
+    label_list = [f'{name}="{escape_label_value(value)}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        label_list.append(extra)
+    return "{" + ",".join(label_list) + "}" if label_list else ""
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, int) or value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.value_dict: Dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1):
+        self.value_dict[label_values] = self.value_dict.get(label_values, 0) + amount
+
+    def get(self, *label_values: str) -> float:
+        return self.value_dict.get(label_values, 0)
+
+    def collect(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        for label_values, value in list(self.value_dict.items()):
+            yield f"{self.name}{format_labels(self.label_names, label_values)} {format_value(value)}"
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = tuple(sorted(buckets))
+        # 每组标签: [各桶计数(不累计)..., 超出最大桶的计数], 总和, 总数
+        self.value_dict: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *label_values: str):
+        item = self.value_dict.get(label_values)
+        if item is None:
+            item = ([0] * (len(self.buckets) + 1), [0.0, 0])
+            self.value_dict[label_values] = item
+        item[0][bisect.bisect_left(self.buckets, value)] += 1
+        item[1][0] += value
+        item[1][1] += 1
+
+    def get_count(self, *label_values: str) -> int:
+        item = self.value_dict.get(label_values)
+        return 0 if item is None else item[1][1]
+
+    def collect(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        for label_values, (bucket_count_list, (total, count)) in list(self.value_dict.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_count_list):
+                cumulative += bucket_count
+                labels = format_labels(self.label_names, label_values, f'le="{format_value(bound)}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = format_labels(self.label_names, label_values)
+            yield f"{self.name}_sum{labels} {format_value(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+class Gauge:
+    '''
+    输出时调用 getter 取值，getter 返回数值或 {标签值元组: 数值}
+    已由其他模块统计的累计值可将 metric_type 设为 counter 输出
+    '''
+
+    def __init__(self, name: str, documentation: str, getter: Callable[[], object], label_names: Tuple[str, ...] = (),
+                 metric_type: str = "gauge"):
+        self.name = name
+        self.documentation = documentation
+        self.getter = getter
+        self.label_names = label_names
+        self.metric_type = metric_type
+
+    def collect(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.metric_type}"
+        value = self.getter()
+        if isinstance(value, dict):
+            for label_values, item_value in value.items():
+                yield f"{self.name}{format_labels(self.label_names, label_values)} {format_value(item_value)}"
+        else:
+            yield f"{self.name} {format_value(value)}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metric_list: list = []
+
+    def counter(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, documentation, label_names)
+        self.metric_list.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, label_names: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, label_names, buckets)
+        self.metric_list.append(metric)
+        return metric
+
+    def gauge(self, name: str, documentation: str, getter: Callable[[], object], label_names: Tuple[str, ...] = (),
+              metric_type: str = "gauge") -> Gauge:
+        metric = Gauge(name, documentation, getter, label_names, metric_type)
+        self.metric_list.append(metric)
+        return metric
+
+    def render(self) -> str:
+        line_list = []
+        for metric in self.metric_list:
+            line_list.extend(metric.collect())
+        return "\n".join(line_list) + "\n"
+
+
+class HttpMetricsMiddleware:
+    '''
+    纯 ASGI 中间件，按路由模板统计 HTTP 请求数与耗时
+    不创建任务也不包装响应流，只从 http.response.start 中取得状态码，事件流等长响应原样透传；
+    发送响应头前抛出异常的请求按 500 计入后继续抛出，由上层返回错误响应
+    '''
+
+    def __init__(self, app, requests: Counter, latency: Histogram):
+        self.app = app
+        self.requests = requests
+        self.latency = latency
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            path = route.path if route is not None else "unknown"
+            self.latency.observe(time.perf_counter() - start_time, scope["method"], path)
+            self.requests.inc(scope["method"], path, str(status_code))
@@ -1,5 +1,6 @@
+from typing import List, Optional
 from pydantic import BaseModel
-from enums import MessageType, ChannelType, StrengthChangeMode
+from enums import MessageType, ChannelType, StrengthChangeMode, StrengthRampCurve
 class DungeonLabMessage(BaseModel):
     type: MessageType = MessageType.MSG
     clientId: str = ""
@@ -13,6 +14,13 @@ class DungeonLabStrengthMessage(BaseModel):
     value: int = 0
 
 
+class DungeonLabStrengthRampMessage(BaseModel):
+    channel: ChannelType = ChannelType.A
+    value: int = 0
+    duration: float = 1.0
+    curve: StrengthRampCurve = StrengthRampCurve.LINEAR
+
+
 class DungeonLabClearMessage(BaseModel):
     channel: ChannelType = ChannelType.A
 
@@ -27,6 +35,12 @@ class DungeonLabPresetPulseMessage(BaseModel):
     preset: str = ""
 
 
+class DungeonLabFeedbackEvent(BaseModel):
+    button: str = ""
+    name: str = ""
+    channel: ChannelType = ChannelType.A
+
+
 class DungeonLabSimpleMessage(BaseModel):
     type: MessageType = MessageType.MSG
     message: str = ""
@@ -36,4 +50,102 @@ class DungeonLabStrengthInfo(BaseModel):
     strengthA: int = 0
     strengthB: int = 0
     strengthLimitA: int = 0
-    strengthLimitB: int = 0
\ No newline at end of file
+    strengthLimitB: int = 0
+
+
+class DungeonLabSessionInfo(BaseModel):
+    clientId: str = ""
+    targetId: str = ""
+
+
+class DungeonLabSessionGroup(BaseModel):
+    name: str = ""
+    sessions: List[str] = []
+
+
+class DungeonLabBatchMessage(BaseModel):
+    sessions: List[str] = []
+    group: str = ""
+    strength: Optional[DungeonLabStrengthMessage] = None
+    clear: Optional[DungeonLabClearMessage] = None
+    pulse: Optional[DungeonLabPulseMessage] = None
+    preset: Optional[DungeonLabPresetPulseMessage] = None
+
+
+class DungeonLabBatchTargetResult(BaseModel):
+    sessionId: str = ""
+    clientId: str = ""
+    targetId: str = ""
+    success: bool = False
+    error: str = ""
+
+
+class DungeonLabBatchResult(BaseModel):
+    total: int = 0
+    successCount: int = 0
+    results: List[DungeonLabBatchTargetResult] = []
+
+
+class DungeonLabHeartbeatStats(BaseModel):
+    sweepCount: int = 0
+    sentCount: int = 0
+    failedCount: int = 0
+    droppedCount: int = 0
+    lastSweepClients: int = 0
+    lastSweepDuration: float = 0
+    maxSweepDuration: float = 0
+
+
+class DungeonLabCacheStats(BaseModel):
+    size: int = 0
+    maxSize: int = 0
+    memory: int = 0
+    maxMemory: int = 0
+    hitCount: int = 0
+    missCount: int = 0
+    evictCount: int = 0
+
+
+class DungeonLabOutboundStats(BaseModel):
+    clientId: str = ""
+    depth: int = 0
+    maxDepth: int = 0
+    enqueuedCount: int = 0
+    sentCount: int = 0
+    droppedCount: int = 0
+    coalescedCount: int = 0
+
+
+class DungeonLabPresetInfo(BaseModel):
+    name: str = ""
+    source: str = ""
+    frameCount: int = 0
+    duration: float = 0
+
+
+class DungeonLabPresetDetail(DungeonLabPresetInfo):
+    preset: str = ""
+
+
+class DungeonLabComposeItem(BaseModel):
+    preset: str = ""
+    loop: int = 1
+    strengthScale: float = 1.0
+    frequencyScale: float = 1.0
+    speed: float = 1.0
+
+
+class DungeonLabComposeProgram(BaseModel):
+    items: List[DungeonLabComposeItem] = []
+    loop: int = 1
+
+
+class DungeonLabComposeMessage(BaseModel):
+    a: Optional[DungeonLabComposeProgram] = None
+    b: Optional[DungeonLabComposeProgram] = None
+
+
+class DungeonLabComposeResult(BaseModel):
+    frameCountA: int = 0
+    frameCountB: int = 0
+    duration: float = 0
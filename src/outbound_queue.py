@@ -0,0 +1,204 @@
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, Optional, Tuple
+import custom_logger
+from enums import MessageType, OutboundFrameKind, OverflowPolicy
+
+
+class OutboundStats:
+    def __init__(self):
+        self.enqueued_count = 0
+        self.sent_count = 0
+        self.dropped_count = 0
+        self.coalesced_count = 0
+        self.max_depth = 0
+
+
+class OutboundFrame:
+    __slots__ = ("text", "kind", "key")
+
+    def __init__(self, text: str, kind: OutboundFrameKind, key: Optional[str]):
+        self.text = text
+        self.kind = kind
+        self.key = key
+
+
+def get_frame_kind(type: MessageType, message: str) -> OutboundFrameKind:
+    if type == MessageType.MSG:
+        if message.startswith("pulse-"):
+            return OutboundFrameKind.PULSE
+        if message.startswith("strength-"):
+            return OutboundFrameKind.STRENGTH
+    return OutboundFrameKind.OTHER
+
+
+def get_strength_coalesce_key(message: str) -> Optional[str]:
+    '''
+    可合并的强度消息返回合并键，只有后一条能完全覆盖前一条时才可合并
+    - APP 上报的 strength-A强度+B强度+A上限+B上限 : 整条覆盖
+    - 设定模式的 strength-通道+2+强度值 : 按通道覆盖
+    增减模式的消息是相对变化，不可合并
+    '''
+    value_arr = message[len("strength-"):].split("+")
+    if len(value_arr) == 4:
+        return "strength"
+    if len(value_arr) == 3 and value_arr[1] == "2":
+        return f"strength-{value_arr[0]}"
+    return None
+
+
+class OutboundQueue:
+    '''
+    单个连接的有界发送队列，由独立的写任务按顺序发送，转发方无需等待接收方的网络
+    coalesce 为 True 时，新入队的消息直接替换队列中尚未发送的同合并键消息的内容，位置不变，同一通道只发送最新的强度
+    队列满时按 overflow_policy 处理，无法腾出空间时关闭队列并通过 on_close 断开连接：
+    drop_oldest 与 coalesce 只丢弃波形消息，队列中没有波形消息(全是强度、清空等不可丢弃的消息)时同样断开连接
+    '''
+
+    def __init__(self, send_text: Callable[[str], Awaitable[None]], on_close: Callable[[], Awaitable[None]],
+                 max_size: int = 256, overflow_policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+                 coalesce: bool = True):
+        self.send_text = send_text
+        self.on_close = on_close
+        self.max_size = max(1, max_size)
+        self.overflow_policy = overflow_policy
+        self.coalesce = coalesce
+        self.frame_queue: Deque[OutboundFrame] = deque()
+        self.key_dict: Dict[str, OutboundFrame] = {}
+        self.stats = OutboundStats()
+        self.closed = False
+        self._event = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._close_task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self.frame_queue)
+
+    def put(self, text: str, kind: OutboundFrameKind = OutboundFrameKind.OTHER, key: Optional[str] = None) -> bool:
+        if self.closed:
+            return False
+        is_full = len(self.frame_queue) >= self.max_size
+        if key is not None and (self.coalesce or (is_full and self.overflow_policy == OverflowPolicy.COALESCE)):
+            old_frame = self.key_dict.get(key)
+            if old_frame is not None:
+                # 原位替换，保持与之后入队的消息之间的顺序
+                old_frame.text = text
+                old_frame.kind = kind
+                self.stats.enqueued_count += 1
+                self.stats.coalesced_count += 1
+                return True
+        if is_full and not self._make_room():
+            custom_logger.warning(f"【Server】 Outbound queue overflow, policy: {self.overflow_policy.value}")
+            self._schedule_close()
+            return False
+        frame = OutboundFrame(text, kind, key)
+        self.frame_queue.append(frame)
+        if key is not None:
+            self.key_dict[key] = frame
+        stats = self.stats
+        stats.enqueued_count += 1
+        if len(self.frame_queue) > stats.max_depth:
+            stats.max_depth = len(self.frame_queue)
+        self._event.set()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return True
+
+    def close(self):
+        self.closed = True
+        self.frame_queue.clear()
+        self.key_dict.clear()
+        if self._task is not None and self._task is not asyncio.current_task():
+            self._task.cancel()
+
+    def _make_room(self) -> bool:
+        if self.overflow_policy == OverflowPolicy.DISCONNECT:
+            return False
+        if self._remove_first(lambda frame: frame.kind == OutboundFrameKind.PULSE):
+            self.stats.dropped_count += 1
+            return True
+        return False
+
+    def _remove_first(self, predicate: Callable[[OutboundFrame], bool]) -> bool:
+        for i, frame in enumerate(self.frame_queue):
+            if predicate(frame):
+                del self.frame_queue[i]
+                self._forget_key(frame)
+                return True
+        return False
+
+    def _forget_key(self, frame: OutboundFrame):
+        if frame.key is not None and self.key_dict.get(frame.key) is frame:
+            del self.key_dict[frame.key]
+
+    def _schedule_close(self):
+        self.stats.dropped_count += len(self.frame_queue)
+        self.close()
+        if self._close_task is None:
+            self._close_task = asyncio.create_task(self.on_close())
+
+    async def _run(self):
+        try:
+            while not self.closed:
+                if not self.frame_queue:
+                    self._event.clear()
+                    await self._event.wait()
+                    continue
+                frame = self.frame_queue.popleft()
+                self._forget_key(frame)
+                await self.send_text(frame.text)
+                self.stats.sent_count += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            custom_logger.warning(f"【Server】 Outbound queue send error: {e!r}")
+            self._schedule_close()
+
+
+class OutboundQueueManager:
+    '''
+    以 websocket 为键管理所有连接的发送队列
+    '''
+
+    def __init__(self, on_close: Callable[[Any], Awaitable[None]],
+                 max_size: int = 256, overflow_policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+                 coalesce: bool = True, send_text: Optional[Callable[[Any, str], Awaitable[None]]] = None):
+        self.on_close = on_close
+        self.send_text = send_text
+        self.max_size = max_size
+        self.overflow_policy = overflow_policy
+        self.coalesce = coalesce
+        self.queue_dict: Dict[Any, OutboundQueue] = {}
+        # 已关闭队列累计丢弃的消息数
+        self.closed_dropped_count = 0
+
+    def __len__(self) -> int:
+        return len(self.queue_dict)
+
+    def open(self, websocket) -> OutboundQueue:
+        queue = self.queue_dict.get(websocket)
+        if queue is None:
+            send_text = websocket.send_text if self.send_text is None else lambda text: self.send_text(websocket, text)
+            queue = OutboundQueue(send_text, lambda: self.on_close(websocket),
+                                  self.max_size, self.overflow_policy, self.coalesce)
+            self.queue_dict[websocket] = queue
+        return queue
+
+    def get(self, websocket) -> Optional[OutboundQueue]:
+        return self.queue_dict.get(websocket)
+
+    def close(self, websocket):
+        queue = self.queue_dict.pop(websocket, None)
+        if queue is not None:
+            queue.close()
+            self.closed_dropped_count += queue.stats.dropped_count
+
+    def close_all(self):
+        for websocket in list(self.queue_dict.keys()):
+            self.close(websocket)
+
+    def get_dropped_count(self) -> int:
+        return self.closed_dropped_count + sum(queue.stats.dropped_count for queue in self.queue_dict.values())
+
+    def items(self) -> Iterator[Tuple[Any, OutboundQueue]]:
+        return iter(list(self.queue_dict.items()))
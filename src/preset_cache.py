@@ -0,0 +1,71 @@
+import sys
+from typing import Dict, List
+import codec
+import utils
+from bounded_cache import BoundedCache
+from enums import ChannelType, MessageType
+
+
+class PresetError(ValueError):
+    pass
+
+
+class CompiledPreset:
+    '''
+    预编译的波形消息，每个小节至少一条，超过 message 长度上限的小节按帧切分，保存 message 字段之后的 Json 片段，
+    发送时只需拼入 clientId 和 targetId，与 utils.get_dg_message_json 的输出一致
+    '''
+
+    def __init__(self, channel: ChannelType, preset: str):
+        self.channel = channel
+        self.preset = preset
+        self.body_list: List[str] = []
+        for section in utils.get_preset_pulse_section_str_list(preset, utils.get_pulse_value_max_length(channel)):
+            message = utils.get_pulse_str(channel, section)
+            self.body_list.append(codec.encode_message_body(message))
+
+    def get_size(self) -> int:
+        '''
+        估算占用的内存(字节)，波形字符串由调用方传入，较长的波形展开后可达数 MB
+        '''
+        size = sys.getsizeof(self) + sys.getsizeof(self.preset) + sys.getsizeof(self.body_list)
+        return size + sum(sys.getsizeof(body) for body in self.body_list)
+
+    def render(self, client_id: str, target_id: str) -> List[str]:
+        head = codec.get_message_head(MessageType.MSG, client_id, target_id)
+        return [head + body for body in self.body_list]
+
+
+class PresetFrameCache:
+    '''
+    以 (preset, channel) 为键的预编译波形缓存，按条目数与估算内存(max_memory 字节，0 为不限制) LRU 淘汰
+    '''
+
+    def __init__(self, max_size: int = 256, max_memory: int = 0):
+        self.cache: BoundedCache[CompiledPreset] = BoundedCache(max_size, max_memory)
+        self.stats = self.cache.stats
+
+    def __len__(self) -> int:
+        return len(self.cache)
+
+    def clear(self):
+        self.cache.clear()
+
+    def get(self, preset: str, channel: ChannelType) -> CompiledPreset:
+        key = (preset, channel)
+        compiled = self.cache.get(key)
+        if compiled is None:
+            compiled = CompiledPreset(channel, preset)
+            self.cache.set(key, compiled, compiled.get_size())
+        return compiled
+
+    def get_message_json_list(self, preset: str, channel: ChannelType, client_id: str, target_id: str) -> List[str]:
+        return self.get(preset, channel).render(client_id, target_id)
+
+    def warm_up(self, preset_dict: Dict[str, str]):
+        for preset in preset_dict.values():
+            for channel in ChannelType:
+                key = (preset, channel)
+                if key not in self.cache and not self.cache.is_full():
+                    compiled = CompiledPreset(channel, preset)
+                    self.cache.set(key, compiled, compiled.get_size())
@@ -0,0 +1,260 @@
+'''
+预编译波形库
+将 Dungeonlab+pulse: 波形字符串预先解码并编码为二进制文件，服务启动时以 mmap 只读映射，
+发送时直接从映射区按偏移取出已编码的消息 Json 片段，无需再解码波形，多个 worker 进程共享同一份页缓存
+文件结构(小端):
+- 文件头 : 魔数 DGPL, 版本, 通道数, 波形数
+- 索引表 : 每个波形一项，名称/原始字符串/波形帧的偏移与长度，以及每个通道在片段表中的起始序号与数量
+- 片段表 : 每条消息 Json 片段(message 字段之后的部分，与 CompiledPreset.body_list 相同)的偏移与长度
+- 数据区 : 名称、原始字符串、逐帧的波形帧与消息 Json 片段
+在 src 目录下运行:
+    python -m preset_library build 输出文件 [波形文件 ...] [--builtin]
+    python -m preset_library list 波形库文件
+    python -m preset_library show 波形库文件 名称
+波形文件为 {名称: 波形字符串} 的 Json，或每行 "名称 Dungeonlab+pulse:..." 的文本
+'''
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from typing import Dict, Iterator, List, Optional, Tuple
+import config
+import custom_logger
+from enums import ChannelType
+from preset_cache import CompiledPreset
+import utils
+
+MAGIC = b"DGPL"
+VERSION = 1
+FRAME_SIZE = 18  # 带引号的 16 位十六进制波形帧，与 utils.iter_preset_pulse_frames 一致
+FRAME_TIME = 0.1
+PULSE_PREFIX = "Dungeonlab+pulse:"
+CHANNEL_LIST = list(ChannelType)
+HEADER = struct.Struct("<4sHHI")
+ENTRY = struct.Struct("<IHIIII" + "II" * len(CHANNEL_LIST))
+BODY = struct.Struct("<II")
+
+
+class PresetLibraryError(Exception):
+    pass
+
+
+class PresetLibrary:
+    '''
+    只读的预编译波形库，path 为空时为空库
+    '''
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.entry_dict: Dict[str, tuple] = {}
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._buffer: Optional[memoryview] = None
+        self._body_offset = 0
+        if path:
+            self._open(path)
+
+    def __len__(self) -> int:
+        return len(self.entry_dict)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.entry_dict
+
+    def _open(self, path: str):
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise PresetLibraryError(f"Empty preset library: {path}")
+        self._buffer = memoryview(self._mmap)
+        magic, version, channel_count, preset_count = HEADER.unpack_from(self._buffer, 0)
+        if magic != MAGIC or version != VERSION or channel_count != len(CHANNEL_LIST):
+            self.close()
+            raise PresetLibraryError(f"Invalid preset library: {path}")
+        self._body_offset = HEADER.size + ENTRY.size * preset_count
+        for i in range(preset_count):
+            entry = ENTRY.unpack_from(self._buffer, HEADER.size + ENTRY.size * i)
+            name = self._get_str(entry[0], entry[1])
+            self.entry_dict[name] = entry
+
+    def close(self):
+        self.entry_dict.clear()
+        if self._buffer is not None:
+            self._buffer.release()
+            self._buffer = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _get_str(self, offset: int, length: int) -> str:
+        return str(self._buffer[offset:offset + length], "utf-8")
+
+    def names(self) -> List[str]:
+        return list(self.entry_dict)
+
+    def get_preset(self, name: str) -> Optional[str]:
+        entry = self.entry_dict.get(name)
+        return None if entry is None else self._get_str(entry[2], entry[3])
+
+    def get_frame_count(self, name: str) -> int:
+        entry = self.entry_dict.get(name)
+        return 0 if entry is None else entry[5]
+
+    def iter_frames(self, name: str) -> Iterator[str]:
+        entry = self.entry_dict[name]
+        offset = entry[4]
+        for i in range(entry[5]):
+            yield self._get_str(offset + FRAME_SIZE * i, FRAME_SIZE)
+
+    def get_body_list(self, name: str, channel: ChannelType) -> List[str]:
+        '''
+        返回指定通道已编码的消息 Json 片段，拼入 codec.get_message_head 的前缀即可发送
+        '''
+        entry = self.entry_dict[name]
+        channel_index = 6 + CHANNEL_LIST.index(channel) * 2
+        body_index, body_count = entry[channel_index], entry[channel_index + 1]
+        body_list = []
+        for i in range(body_index, body_index + body_count):
+            offset, length = BODY.unpack_from(self._buffer, self._body_offset + BODY.size * i)
+            body_list.append(self._get_str(offset, length))
+        return body_list
+
+
+def load_preset_library(path: str) -> PresetLibrary:
+    '''
+    加载配置的波形库，相对路径基于程序所在目录，未配置或加载失败时返回空库
+    '''
+    if not path:
+        return PresetLibrary()
+    path = os.path.join(config.get_base_path(), path)
+    try:
+        library = PresetLibrary(path)
+    except (OSError, PresetLibraryError) as e:
+        custom_logger.error(f"【Server】 Load preset library {path} error: {e}")
+        return PresetLibrary()
+    custom_logger.info(f"【Server】 Loaded {len(library)} presets from {path}")
+    return library
+
+
+def compile_preset(preset: str) -> Tuple[List[str], List[List[str]]]:
+    '''
+    返回波形帧列表与每个通道的消息 Json 片段列表
+    '''
+    frame_list = list(utils.iter_preset_pulse_frames(preset))
+    for frame in frame_list:
+        if len(frame) != FRAME_SIZE:
+            raise PresetLibraryError(f"Invalid pulse frame: {frame}")
+    return frame_list, [CompiledPreset(channel, preset).body_list for channel in CHANNEL_LIST]
+
+
+def build_library(preset_dict: Dict[str, str], path: str):
+    compiled_list = [(name, preset) + compile_preset(preset) for name, preset in preset_dict.items()]
+    body_count = sum(len(body_list) for *_, channel_body_list in compiled_list for body_list in channel_body_list)
+    data = bytearray()
+    data_offset = HEADER.size + ENTRY.size * len(compiled_list) + BODY.size * body_count
+
+    def append(text: str) -> Tuple[int, int]:
+        encoded = text.encode("utf-8")
+        offset = data_offset + len(data)
+        data.extend(encoded)
+        return offset, len(encoded)
+
+    entry_data = bytearray()
+    body_data = bytearray()
+    body_index = 0
+    for name, preset, frame_list, channel_body_list in compiled_list:
+        name_offset, name_length = append(name)
+        preset_offset, preset_length = append(preset)
+        frame_offset, _ = append("".join(frame_list))
+        channel_field_list = []
+        for body_list in channel_body_list:
+            channel_field_list += [body_index, len(body_list)]
+            for body in body_list:
+                body_data += BODY.pack(*append(body))
+            body_index += len(body_list)
+        entry_data += ENTRY.pack(name_offset, name_length, preset_offset, preset_length, frame_offset,
+                                 len(frame_list), *channel_field_list)
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(CHANNEL_LIST), len(compiled_list)))
+        f.write(entry_data)
+        f.write(body_data)
+        f.write(data)
+    # 先写临时文件再替换，正在映射旧文件的进程不受影响
+    os.replace(temp_path, path)
+
+
+def load_preset_file(path: str) -> Dict[str, str]:
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if path.endswith(".json"):
+        return {str(name): preset for name, preset in json.loads(text).items()}
+    preset_dict = {}
+    for line_number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        index = line.find(PULSE_PREFIX)
+        name = line[:index].strip().rstrip("=:,").strip() if index > 0 else ""
+        if not name:
+            raise PresetLibraryError(f"{path}:{line_number}: expected \"name {PULSE_PREFIX}...\"")
+        preset_dict[name] = line[index:]
+    return preset_dict
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="preset_library", description="DG-LAB compiled preset library")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="编译波形文件为波形库")
+    build_parser.add_argument("output")
+    build_parser.add_argument("input", nargs="*")
+    build_parser.add_argument("--builtin", action="store_true", help="包含内置的预设波形")
+    list_parser = subparsers.add_parser("list", help="列出波形库中的波形")
+    list_parser.add_argument("library")
+    show_parser = subparsers.add_parser("show", help="输出指定波形的原始字符串与消息")
+    show_parser.add_argument("library")
+    show_parser.add_argument("name")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        preset_dict = dict(utils.get_preset_wave_data_dict()) if args.builtin else {}
+        for path in args.input:
+            for name, preset in load_preset_file(path).items():
+                if name in preset_dict:
+                    print(f"Duplicate preset {name!r} in {path}, overriding", file=sys.stderr)
+                preset_dict[name] = preset
+        if not preset_dict:
+            parser.error("no presets to build")
+        for name, preset in preset_dict.items():
+            try:
+                compile_preset(preset)
+            except Exception as e:
+                parser.error(f"invalid preset {name!r}: {e}")
+        build_library(preset_dict, args.output)
+        print(f"Built {len(preset_dict)} presets into {args.output} ({os.path.getsize(args.output)} bytes)")
+        return
+    library = PresetLibrary(args.library)
+    try:
+        if args.command == "list":
+            for name in library.names():
+                frame_count = library.get_frame_count(name)
+                print(f"{name}\t{frame_count} frames\t{frame_count * FRAME_TIME:.1f}s")
+        elif args.command == "show":
+            if args.name not in library:
+                parser.error(f"preset {args.name!r} not found")
+            print(library.get_preset(args.name))
+            for channel in CHANNEL_LIST:
+                for body in library.get_body_list(args.name, channel):
+                    print(f"{channel.name}: {body}")
+    finally:
+        library.close()
+
+
+if __name__ == "__main__":
+    main()
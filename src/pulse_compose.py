@@ -0,0 +1,169 @@
+'''
+波形合成
+在 PulseSection 逐点生成的 (频率, 强度) 数据(每点 25ms，4 点为一帧)上对多个波形拼接、循环、缩放强度、变速与变频，
+编译为与 utils.iter_preset_pulse_frames 格式相同的波形帧，A/B 通道各自独立编排
+未做任何变换的单个波形编译结果与直接发送该波形完全一致
+'''
+import itertools
+import math
+import sys
+from typing import Callable, Dict, Iterator, List, Tuple
+import codec
+import utils
+from bounded_cache import BoundedCache
+from enums import ChannelType
+from models import DungeonLabComposeItem, DungeonLabComposeProgram
+
+POINT_PER_FRAME = 4
+SPEED_MIN = 0.1
+SPEED_MAX = 10
+STRENGTH_SCALE_MAX = 10
+FREQUENCY_SCALE_MIN = 0.1
+FREQUENCY_SCALE_MAX = 10
+
+Point = Tuple[float, float]
+
+
+class ComposeError(ValueError):
+    pass
+
+
+class CompiledProgram:
+    '''
+    编译后的波形帧，按通道缓存切分编码后的消息 Json 片段
+    '''
+
+    def __init__(self, frame_list: List[str]):
+        self.frame_list = frame_list
+        self.body_dict: Dict[ChannelType, List[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.frame_list)
+
+    def get_size(self) -> int:
+        '''
+        估算占用的内存(字节)，按每个通道都生成一份切分编码后的消息计算，消息与波形帧的内容基本相同
+        '''
+        frame_size = sys.getsizeof(self.frame_list) + sum(sys.getsizeof(frame) for frame in self.frame_list)
+        return sys.getsizeof(self) + frame_size * (1 + len(ChannelType))
+
+    def get_body_list(self, channel: ChannelType) -> List[str]:
+        body_list = self.body_dict.get(channel)
+        if body_list is None:
+            body_list = [codec.encode_message_body(utils.get_pulse_str(channel, chunk))
+                         for chunk in utils.chunk_pulse_frames(self.frame_list, utils.get_pulse_value_max_length(channel))]
+            self.body_dict[channel] = body_list
+        return body_list
+
+
+def iter_preset_points(preset: str) -> Iterator[Point]:
+    '''
+    逐点生成波形字符串的 (频率, 强度)，每个小节末尾不足一帧的部分补 0，与逐帧生成时一致
+    '''
+    for section in utils.simple_decode_dg_pulse_str(preset):
+        point_count = 0
+        for point in section.iter_whole_wave():
+            point_count += 1
+            yield point
+        for _ in range(-point_count % POINT_PER_FRAME):
+            yield (0, 0)
+
+
+def transform_points(point_list: List[Point], strength_scale: float, speed: float, frequency_scale: float) -> List[Point]:
+    '''
+    speed 大于 1 时加快播放(按最近点重采样)，frequency_scale 缩放频率，休息点(频率为 0)保持不变
+    '''
+    if speed != 1 and point_list:
+        point_count = max(1, round(len(point_list) / speed))
+        last_index = len(point_list) - 1
+        point_list = [point_list[min(int(i * speed), last_index)] for i in range(point_count)]
+    if strength_scale == 1 and frequency_scale == 1:
+        return point_list
+    result = []
+    for frequency, strength in point_list:
+        if frequency > 0:
+            frequency = utils.clamp(frequency * frequency_scale, utils.FREQUENCY_MIN, utils.FREQUENCY_MAX)
+        result.append((frequency, strength * strength_scale))
+    return result
+
+
+def encode_frame_list(point_list: List[Point]) -> List[str]:
+    '''
+    每 4 点编码为一帧，与 PulseSection 逐帧生成的格式相同
+    '''
+    hex_byte_table = utils.HEX_BYTE_TABLE
+    frame_list = []
+    for i in range(0, len(point_list), POINT_PER_FRAME):
+        group = point_list[i:i + POINT_PER_FRAME]
+        group += [(0, 0)] * (POINT_PER_FRAME - len(group))
+        frequency_str = "".join(hex_byte_table[utils.get_pulse_frequency_code(math.floor(frequency))] for frequency, _ in group)
+        strength_str = "".join(hex_byte_table[utils.clamp(math.floor(strength), 0, 100)] for _, strength in group)
+        frame_list.append(f'"{frequency_str}{strength_str}"')
+    return frame_list
+
+
+def get_preset_label(preset: str, max_length: int = 40) -> str:
+    '''
+    错误信息中的波形，波形字符串可能很长，只保留开头
+    '''
+    return preset if len(preset) <= max_length else preset[:max_length] + "..."
+
+
+def compile_item(item: DungeonLabComposeItem, resolve: Callable[[str], str], max_frames: int) -> List[str]:
+    '''
+    max_frames 为该波形项(含循环)可用的帧数，逐点展开波形时超过可用帧数对应的点数即停止，
+    变速后的帧数先按点数算出并检查，不会为过长的波形或结果分配内存
+    '''
+    if (item.loop < 1 or not SPEED_MIN <= item.speed <= SPEED_MAX or not 0 <= item.strengthScale <= STRENGTH_SCALE_MAX
+            or not FREQUENCY_SCALE_MIN <= item.frequencyScale <= FREQUENCY_SCALE_MAX):
+        raise ComposeError(f"Invalid compose item: {item}")
+    # 变速前的点数超过 point_limit 时变速后的帧数必然超出上限
+    point_limit = math.floor((max(0, max_frames) // item.loop * POINT_PER_FRAME + 0.5) * item.speed) + 1
+    try:
+        point_list = list(itertools.islice(iter_preset_points(resolve(item.preset)), point_limit + 1))
+    except Exception as e:
+        raise ComposeError(f"Invalid preset {get_preset_label(item.preset)!r}: {e!r}")
+    point_count = len(point_list) if item.speed == 1 else max(1, round(len(point_list) / item.speed))
+    if len(point_list) > point_limit or math.ceil(point_count / POINT_PER_FRAME) * item.loop > max_frames:
+        raise ComposeError(f"Compose item {get_preset_label(item.preset)!r} exceeds the remaining {max(0, max_frames)} frames")
+    if item.strengthScale == 1 and item.speed == 1 and item.frequencyScale == 1:
+        return encode_frame_list(point_list)
+    return encode_frame_list(transform_points(point_list, item.strengthScale, item.speed, item.frequencyScale))
+
+
+def compile_program(program: DungeonLabComposeProgram, resolve: Callable[[str], str], max_frames: int) -> CompiledProgram:
+    '''
+    resolve 将波形名称解析为波形字符串，总帧数超过 max_frames 时抛出 ComposeError
+    '''
+    if program.loop < 1:
+        raise ComposeError(f"Invalid program loop: {program.loop}")
+    # 整段循环后才超出上限时也应在编译前拒绝，按循环次数平分帧数上限
+    frame_budget = max_frames // program.loop
+    frame_list: List[str] = []
+    for item in program.items:
+        item_frame_list = compile_item(item, resolve, frame_budget - len(frame_list))
+        frame_list.extend(item_frame_list * item.loop)
+    return CompiledProgram(frame_list * program.loop)
+
+
+class ComposeCache:
+    '''
+    以程序 Json 为键的编译结果缓存，按条目数与估算内存限制，按 LRU 淘汰
+    '''
+
+    def __init__(self, resolve: Callable[[str], str], max_size: int = 128, max_frames: int = 6000, max_memory: int = 0):
+        self.resolve = resolve
+        self.max_frames = max_frames
+        self.cache: BoundedCache[CompiledProgram] = BoundedCache(max_size, max_memory)
+        self.stats = self.cache.stats
+
+    def __len__(self) -> int:
+        return len(self.cache)
+
+    def get(self, program: DungeonLabComposeProgram) -> CompiledProgram:
+        key = program.model_dump_json()
+        compiled = self.cache.get(key)
+        if compiled is None:
+            compiled = compile_program(program, self.resolve, self.max_frames)
+            self.cache.set(key, compiled, compiled.get_size())
+        return compiled
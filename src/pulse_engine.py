@@ -0,0 +1,93 @@
+'''
+基于 NumPy 的 PulseSection 波形生成，输出与 PulseSection.get_pulse_str_list / get_pulse_value_str 逐字节一致
+'''
+import math
+from typing import List
+import numpy as np
+import enums
+import utils
+from pulse_section import PulseSection
+
+POINT_TIME = 0.1 / 4
+HEX_TABLE = np.frombuffer("".join(utils.HEX_BYTE_TABLE).encode("ascii"), dtype=np.uint8).reshape(256, 2)
+PULSE_FREQUENCY_CODE_TABLE = np.array(utils.PULSE_FREQUENCY_CODE_TABLE, dtype=np.int64)
+QUOTE = ord('"')
+COMMA = ord(',')
+
+
+def _linear_interpolation(array_length: int, from_value, to_value) -> np.ndarray:
+    if array_length <= 1:
+        return np.full(array_length, from_value, dtype=np.float64)
+    step = (to_value - from_value) / (array_length - 1)
+    return from_value + np.arange(array_length, dtype=np.float64) * step
+
+
+def get_whole_wave_array(section: PulseSection) -> np.ndarray:
+    '''
+    返回 shape 为 (n, 2) 的 [频率, 强度] 数组
+    注意 PulseSection.get_whole_wave 中每轮重复共享同一组点，BETWEEN_PULSE 与 IN_SECTION 的插值结果
+    最终只保留在一轮波形上，此处按相同语义生成
+    '''
+    point_num = int(4 / section.speed)
+    strength = np.repeat(np.array([pulse.strength for pulse in section.pulse_list], dtype=np.float64), point_num)
+    frequency = np.repeat(np.array([pulse.frequency for pulse in section.pulse_list], dtype=np.float64), point_num)
+    wave_length = len(frequency)
+    gradient_type = section.frequency_gradient_type
+    if gradient_type == enums.PulseFrequencyGradientType.IN_PULSE.value:
+        frequency = _linear_interpolation(wave_length, section.from_frequency, section.to_frequency)
+    wave_time = wave_length * POINT_TIME
+    wave_num = int(math.ceil(section.section_time / wave_time))
+    if gradient_type == enums.PulseFrequencyGradientType.BETWEEN_PULSE.value and wave_num > 0:
+        if wave_num > wave_length:
+            raise IndexError("list index out of range")
+        frequency[:wave_num] = _linear_interpolation(wave_num, section.from_frequency, section.to_frequency)
+    if gradient_type == enums.PulseFrequencyGradientType.IN_SECTION.value and wave_num > 0:
+        whole_wave_length = wave_length * wave_num
+        frequency = _linear_interpolation(whole_wave_length, section.from_frequency, section.to_frequency)[-wave_length:]
+    whole_wave = np.empty((wave_length * wave_num, 2), dtype=np.float64)
+    whole_wave[:, 0] = np.tile(frequency, wave_num)
+    whole_wave[:, 1] = np.tile(strength, wave_num)
+    if section.rest_time > 0:
+        rest_point_num = math.floor(section.rest_time / POINT_TIME)
+        if rest_point_num > 0:
+            whole_wave = np.concatenate((whole_wave, np.zeros((rest_point_num, 2), dtype=np.float64)))
+    return whole_wave
+
+
+def convert_pulse_frequency(frequency: np.ndarray) -> np.ndarray:
+    value = np.clip(np.floor(frequency).astype(np.int64), utils.FREQUENCY_MIN, utils.FREQUENCY_MAX)
+    return PULSE_FREQUENCY_CODE_TABLE[value]
+
+
+def _get_frame_bytes(section: PulseSection) -> np.ndarray:
+    '''
+    返回 shape 为 (n, 19) 的 ASCII 数组，每行为 "频率x4强度x4",
+    '''
+    whole_wave = get_whole_wave_array(section)
+    point_count = len(whole_wave)
+    group_count = (point_count + 3) // 4
+    frequency = np.zeros(group_count * 4, dtype=np.float64)
+    strength = np.zeros(group_count * 4, dtype=np.float64)
+    frequency[:point_count] = whole_wave[:, 0]
+    strength[:point_count] = whole_wave[:, 1]
+    frequency_code = convert_pulse_frequency(frequency).reshape(group_count, 4)
+    strength_code = np.clip(np.floor(strength).astype(np.int64), 0, 100).reshape(group_count, 4)
+    code = np.concatenate((frequency_code, strength_code), axis=1)
+    frame = np.empty((group_count, 19), dtype=np.uint8)
+    frame[:, 0] = QUOTE
+    frame[:, 1:17] = HEX_TABLE[code].reshape(group_count, 16)
+    frame[:, 17] = QUOTE
+    frame[:, 18] = COMMA
+    return frame
+
+
+def get_pulse_str_list(section: PulseSection) -> List[str]:
+    frame = _get_frame_bytes(section)
+    text = frame[:, :18].tobytes().decode("ascii")
+    return [text[i:i + 18] for i in range(0, len(text), 18)]
+
+
+def get_pulse_value_str(section: PulseSection) -> str:
+    frame = _get_frame_bytes(section)
+    text = frame.tobytes().decode("ascii")
+    return f"[{text[:-1]}]"
@@ -0,0 +1,94 @@
+import asyncio
+from collections import deque
+from itertools import islice
+from typing import Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+import custom_logger
+from enums import ChannelType
+
+FRAME_TIME = 0.1  # 每个波形帧(4个点)的时长 单位秒
+
+
+class PulseStream:
+    def __init__(self, client_id: str, target_id: str, channel: ChannelType):
+        self.client_id = client_id
+        self.target_id = target_id
+        self.channel = channel
+        self.frame_iter_queue: Deque[Iterator[str]] = deque()
+        self.task: Optional[asyncio.Task] = None
+        self.sent_frame_count = 0
+
+
+class PulsePlayer:
+    '''
+    按目标与通道实时推送波形帧的调度器
+    每次从帧生成器中惰性取出至多 batch_frames 帧发送，保证已发送的波形最多领先播放进度 lookahead 秒，
+    同一通道的多个波形按顺序排队播放，cancel 会丢弃该通道正在播放及排队中的波形
+    '''
+
+    def __init__(self, send: Callable[[str, str, ChannelType, List[str]], Awaitable[bool]],
+                 batch_frames: int = 10, lookahead: float = 1.0):
+        self.send = send
+        self.batch_frames = max(1, batch_frames)
+        self.lookahead = max(0.0, lookahead)
+        self.stream_dict: Dict[Tuple[str, ChannelType], PulseStream] = {}
+
+    def play(self, client_id: str, target_id: str, channel: ChannelType, frame_iter: Iterator[str]):
+        key = (target_id, channel)
+        stream = self.stream_dict.get(key)
+        if stream is None:
+            stream = PulseStream(client_id, target_id, channel)
+            self.stream_dict[key] = stream
+        stream.client_id = client_id
+        stream.frame_iter_queue.append(frame_iter)
+        if stream.task is None or stream.task.done():
+            stream.task = asyncio.create_task(self._run(stream))
+
+    def cancel(self, target_id: str, channel: Optional[ChannelType] = None):
+        channel_list = list(ChannelType) if channel is None else [channel]
+        for channel in channel_list:
+            stream = self.stream_dict.pop((target_id, channel), None)
+            if stream is not None:
+                stream.frame_iter_queue.clear()
+                if stream.task is not None:
+                    stream.task.cancel()
+
+    async def stop(self):
+        task_list = [stream.task for stream in self.stream_dict.values() if stream.task is not None]
+        for key in list(self.stream_dict.keys()):
+            self.cancel(*key)
+        for task in task_list:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def is_playing(self, target_id: str, channel: ChannelType) -> bool:
+        return (target_id, channel) in self.stream_dict
+
+    async def _run(self, stream: PulseStream):
+        loop = asyncio.get_running_loop()
+        start_time = loop.time()
+        sent_time = 0.0
+        try:
+            while stream.frame_iter_queue:
+                frame_list = list(islice(stream.frame_iter_queue[0], self.batch_frames))
+                if not frame_list:
+                    stream.frame_iter_queue.popleft()
+                    continue
+                now = loop.time()
+                if start_time + sent_time < now:
+                    start_time = now - sent_time
+                ahead_time = start_time + sent_time - now
+                if ahead_time > self.lookahead:
+                    await asyncio.sleep(ahead_time - self.lookahead)
+                if not await self.send(stream.client_id, stream.target_id, stream.channel, frame_list):
+                    break
+                stream.sent_frame_count += len(frame_list)
+                sent_time += len(frame_list) * FRAME_TIME
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            custom_logger.error(f"【Server】 Pulse stream to {stream.target_id} error: {e}")
+        finally:
+            if self.stream_dict.get((stream.target_id, stream.channel)) is stream:
+                del self.stream_dict[(stream.target_id, stream.channel)]
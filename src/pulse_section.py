@@ -2,9 +2,16 @@
 import utils
 import math
 import enums
+from typing import Iterator, Tuple
+
+
+class FrozenError(AttributeError):
+    pass
 
 
 class PulseSection:
+    frozen = False
+
     def __init__(self, from_frequency: int, to_frequency: int, section_time: float, frequency_gradient_type: int, is_active: int = 1, speed: int = 1, rest_time: float = 0):
         self.from_frequency = from_frequency
         self.to_frequency = to_frequency
@@ -15,7 +22,23 @@ class PulseSection:
         self.rest_time = rest_time
         self.pulse_list = []
 
+    def __setattr__(self, name, value):
+        if self.frozen:
+            raise FrozenError(f"PulseSection is frozen, can not set {name}")
+        super().__setattr__(name, value)
+
+    def freeze(self):
+        '''
+        冻结小节及其脉冲，冻结后不可修改，用于在缓存中共享
+        '''
+        for pulse in self.pulse_list:
+            pulse.freeze()
+        self.pulse_list = tuple(self.pulse_list)
+        self.frozen = True
+
     def add_pulse(self, strength: int, anchor: int = 0):
+        if self.frozen:
+            raise FrozenError("PulseSection is frozen, can not add pulse")
         pulse = Pulse(strength, self.from_frequency, anchor)
         self.pulse_list.append(pulse)
 
@@ -26,84 +49,92 @@ class PulseSection:
         return wave_time
 
     def get_whole_wave(self):
-        whole_wave = []
+        return [[frequency, strength] for frequency, strength in self.iter_whole_wave()]
+
+    def iter_whole_wave(self) -> Iterator[Tuple[float, float]]:
+        '''
+        逐点生成 (频率, 强度)，只保存一轮波形，内存占用与小节时长无关
+        旧实现中每轮重复共享同一组点，BETWEEN_PULSE 与 IN_SECTION 的插值结果最终只体现在最后一轮上并作用于所有轮次，此处保持一致
+        '''
         wave = []
         for pulse in self.pulse_list:
             point_num = 4 / self.speed
             for i in range(int(point_num)):
-                frequency = pulse.frequency
-                strength = pulse.strength
-                wave.append([frequency, strength])
+                wave.append([pulse.frequency, pulse.strength])
+        wave_length = len(wave)
         if self.frequency_gradient_type == enums.PulseFrequencyGradientType.IN_PULSE.value:
-            whole_wave_length = len(wave)
             frequency_list = self._fill_linear_interpolation(
-                whole_wave_length, self.from_frequency, self.to_frequency)
-            for i in range(whole_wave_length):
+                wave_length, self.from_frequency, self.to_frequency)
+            for i in range(wave_length):
                 wave[i][0] = frequency_list[i]
         point_time = 0.1 / 4
-        wave_time = len(wave) * point_time
-        wave_num = math.ceil(self.section_time / wave_time)
-        for i in range(int(wave_num)):
-            if self.frequency_gradient_type == enums.PulseFrequencyGradientType.BETWEEN_PULSE.value:
-                frequency_list = self._fill_linear_interpolation(
-                    wave_num, self.from_frequency, self.to_frequency)
-                frequency = frequency_list[i]
-                wave[i][0] = frequency
-            whole_wave.extend(wave)
-        if self.frequency_gradient_type == enums.PulseFrequencyGradientType.IN_SECTION.value:
-            whole_wave_length = len(whole_wave)
+        wave_time = wave_length * point_time
+        wave_num = int(math.ceil(self.section_time / wave_time))
+        if self.frequency_gradient_type == enums.PulseFrequencyGradientType.BETWEEN_PULSE.value:
+            if wave_num > wave_length:
+                raise IndexError("list index out of range")
             frequency_list = self._fill_linear_interpolation(
-                whole_wave_length, self.from_frequency, self.to_frequency)
-            for i in range(whole_wave_length):
-                whole_wave[i][0] = frequency_list[i]
+                wave_num, self.from_frequency, self.to_frequency)
+            for i in range(wave_num):
+                wave[i][0] = frequency_list[i]
+        if self.frequency_gradient_type == enums.PulseFrequencyGradientType.IN_SECTION.value and wave_num > 0:
+            whole_wave_length = wave_length * wave_num
+            offset = whole_wave_length - wave_length
+            if whole_wave_length <= 1:
+                for i in range(wave_length):
+                    wave[i][0] = self.from_frequency
+            else:
+                step = (self.to_frequency - self.from_frequency) / (whole_wave_length - 1)
+                for i in range(wave_length):
+                    wave[i][0] = self.from_frequency + (offset + i) * step
+        wave = [(frequency, strength) for frequency, strength in wave]
+        for i in range(wave_num):
+            yield from wave
         if self.rest_time > 0:
-            rest_point_num = self.rest_time / point_time
-            rest_point_num = math.floor(rest_point_num)
-            if rest_point_num > 0:
-                for i in range(int(rest_point_num)):
-                    whole_wave.append([0, 0])
-        return whole_wave
+            rest_point_num = math.floor(self.rest_time / point_time)
+            for i in range(rest_point_num):
+                yield (0, 0)
+
+    def iter_pulse_str(self, to_hex: bool = True) -> Iterator[str]:
+        '''
+        逐帧生成波形帧，每帧为4个点的频率与强度，形如 "0A0A0A0A00000000"
+        '''
+        hex_byte_table = utils.HEX_BYTE_TABLE
+        frequency_group = []
+        strength_group = []
+        for frequency, strength in self.iter_whole_wave():
+            frequency_group.append(frequency)
+            strength_group.append(strength)
+            if len(frequency_group) == 4:
+                yield self._get_frame_str(frequency_group, strength_group, hex_byte_table, to_hex)
+                frequency_group = []
+                strength_group = []
+        if frequency_group:
+            padding = [0] * (4 - len(frequency_group))
+            yield self._get_frame_str(frequency_group + padding, strength_group + padding, hex_byte_table, to_hex)
+
+    def _get_frame_str(self, frequency_group, strength_group, hex_byte_table, to_hex: bool) -> str:
+        frequency_str = ""
+        for frequency in frequency_group:
+            frequency = utils.get_pulse_frequency_code(math.floor(frequency))
+            if to_hex:
+                frequency_str = frequency_str + hex_byte_table[frequency]
+            else:
+                frequency_str = frequency_str + str(frequency) + ","
+        strength_str = ""
+        for strength in strength_group:
+            strength = utils.clamp(math.floor(strength), 0, 100)
+            if to_hex:
+                strength_str = strength_str + hex_byte_table[strength]
+            else:
+                strength_str = strength_str + str(strength) + ","
+        return rf'"{frequency_str}{strength_str}"'
 
     def get_pulse_str_list(self, to_hex: bool = True):
-        whole_wave = self.get_whole_wave()
-        frequency_list = []
-        strength_list = []
-        for i in range(len(whole_wave)):
-            frequency = whole_wave[i][0]
-            strength = whole_wave[i][1]
-            frequency_list.append(frequency)
-            strength_list.append(strength)
-        group_frequency_list = self._group_by_four_with_padding(frequency_list)
-        group_strength_list = self._group_by_four_with_padding(strength_list)
-        target_str_list = []
-        for i in range(len(group_frequency_list)):
-            frequency_group = group_frequency_list[i]
-            frequency_str = ""
-            for frequency in frequency_group:
-                frequency = math.floor(frequency)
-                frequency = self._convert_pulse_frequency(frequency)
-                if to_hex:
-                    frequency = utils.decimal_to_hex_byte(frequency)
-                    frequency_str = frequency_str + str(frequency)
-                else:
-                    frequency_str = frequency_str + str(frequency) + ","
-            strength_group = group_strength_list[i]
-            strength_str = ""
-            for strength in strength_group:
-                strength = math.floor(strength)
-                strength = utils.clamp(strength, 0, 100)
-                if to_hex:
-                    strength = utils.decimal_to_hex_byte(strength)
-                    strength_str = strength_str + str(strength)
-                else:
-                    strength_str = strength_str + str(strength) + ","
-            target_str = rf'"{frequency_str}{strength_str}"'
-            target_str_list.append(target_str)
-        return target_str_list
+        return list(self.iter_pulse_str(to_hex))
 
     def get_pulse_value_str(self, to_hex: bool = True):
-        target_str_list = self.get_pulse_str_list(to_hex)
-        result = ','.join(target_str_list)
+        result = ','.join(self.iter_pulse_str(to_hex))
         result = rf"[{result}]"
         return result
 
@@ -113,36 +144,25 @@ class PulseSection:
         step = (to_value - from_value) / (array_length - 1)
         return [from_value + i * step for i in range(array_length)]
 
-    def _group_by_four_with_padding(self, arr):
-        result = []
-        for i in range(0, len(arr), 4):
-            group = arr[i:i+4]
-            if len(group) < 4:
-                group += [0] * (4 - len(group))
-            result.append(group)
-        return result
-
     def _convert_pulse_frequency(self, value: int) -> int:
-        value = round(value)
-        value = utils.clamp(value, 10, 1000)
-        if value <= 100:
-            value = value
-        elif value <= 600:
-            value = math.floor((value - 100) / 5 + 100)
-        elif value <= 1000:
-            value = math.floor((value - 600) / 10 + 200)
-        else:
-            value = 10
-        value = math.floor(value)
-        value = utils.clamp(value, 10, 240)
-        return value
+        return utils.get_pulse_frequency_code(value)
 
 
 class Pulse:
+    frozen = False
+
     def __init__(self, strength: int, frequency: int, anchor: int = 0):
         self.strength = strength
         self.frequency = frequency
         self.anchor = anchor
 
+    def __setattr__(self, name, value):
+        if self.frozen:
+            raise FrozenError(f"Pulse is frozen, can not set {name}")
+        super().__setattr__(name, value)
+
+    def freeze(self):
+        self.frozen = True
+
     def set_frequency(self, frequency):
         self.frequency = frequency
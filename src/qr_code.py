@@ -0,0 +1,106 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Set, Tuple
+import custom_logger
+import utils
+from bounded_cache import BoundedCache
+
+QR_CODE_MEDIA_TYPE_DICT = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
+
+
+class QrCodeBusyError(Exception):
+    pass
+
+
+class QrCodeRenderer:
+    '''
+    二维码的显示与生成都在单独的线程中进行，不阻塞事件循环，生成的图片按 (uid, 格式) 缓存
+    - window : 终端输出并弹出图片窗口
+    - terminal : 仅终端输出
+    - headless : 不显示，只通过 Http 获取图片
+    每个 uid 只显示一次，同一图片的并发请求共用一次生成；排队中的任务达到 max_pending 时，
+    显示直接跳过，生成图片抛出 QrCodeBusyError，大量连接同时建立时不会积压无限的任务
+    '''
+
+    def __init__(self, mode: str = "window", cache_size: int = 256, max_pending: int = 8):
+        self.mode = mode
+        self.max_pending = max(1, max_pending)
+        self.qr_code_str_dict: Dict[str, str] = {}
+        self.shown_set: Set[str] = set()
+        self.cache: BoundedCache[bytes] = BoundedCache(cache_size)
+        self.image_future_dict: Dict[Tuple[str, str], asyncio.Future] = {}
+        self.pending_count = 0
+        self.skipped_count = 0
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="qr_code")
+
+    def show(self, uid: str, qr_code_str: str):
+        self.qr_code_str_dict[uid] = qr_code_str
+        if self.mode not in ("window", "terminal") or uid in self.shown_set:
+            return
+        if self.pending_count >= self.max_pending:
+            self.skipped_count += 1
+            custom_logger.warning(f"【Server】 Too many pending QR codes, skip showing QR code of {uid}")
+            return
+        self.shown_set.add(uid)
+        render = self._show if self.mode == "window" else self._draw_terminal
+        self._submit(self._render_connected, render, uid, qr_code_str)
+
+    def forget(self, uid: str):
+        self.shown_set.discard(uid)
+        if self.qr_code_str_dict.pop(uid, None) is not None:
+            for image_format in QR_CODE_MEDIA_TYPE_DICT:
+                self.cache.remove((uid, image_format))
+
+    async def get_image(self, uid: str, image_format: str = "png") -> Optional[bytes]:
+        qr_code_str = self.qr_code_str_dict.get(uid)
+        if qr_code_str is None:
+            return None
+        key = (uid, image_format)
+        image = self.cache.get(key)
+        if image is None:
+            future = self.image_future_dict.get(key)
+            if future is None:
+                if self.pending_count >= self.max_pending:
+                    raise QrCodeBusyError("Too many pending QR codes")
+                future = self._submit(utils.get_qr_code_image, qr_code_str, image_format)
+                self.image_future_dict[key] = future
+                future.add_done_callback(lambda _: self.image_future_dict.pop(key, None))
+            # 多个请求共用同一次生成，其中一个请求取消时不能取消生成任务
+            image = await asyncio.shield(future)
+            if uid in self.qr_code_str_dict:
+                self.cache.set(key, image)
+        return image
+
+    def _submit(self, func: Callable, *args) -> asyncio.Future:
+        self.pending_count += 1
+        future = asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _on_done(self, future: asyncio.Future):
+        self.pending_count -= 1
+
+    def _render_connected(self, render: Callable[[str], None], uid: str, qr_code_str: str):
+        # 排队期间已断开的客户端不再显示
+        if uid in self.qr_code_str_dict:
+            render(qr_code_str)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _show(qr_code_str: str):
+        try:
+            utils.show_qr_code(qr_code_str)
+        except Exception as e:
+            custom_logger.error(f"【Server】 Show QR code error: {e}")
+
+    @staticmethod
+    def _draw_terminal(qr_code_str: str):
+        try:
+            utils.draw_qr_code_terminal(qr_code_str)
+        except Exception as e:
+            custom_logger.error(f"【Server】 Draw QR code error: {e}")
@@ -5,27 +5,73 @@ import config
 import utils
 import enums
 import custom_logger
-import uuid
-import json
-from models import DungeonLabMessage, DungeonLabSimpleMessage, DungeonLabStrengthInfo, DungeonLabStrengthMessage, DungeonLabClearMessage, DungeonLabPulseMessage, DungeonLabPresetPulseMessage
-from enums import MessageType, ChannelType
+import time
+from client_registry import ClientRegistry
+from heartbeat import HeartbeatScheduler
+from preset_cache import PresetError, PresetFrameCache
+from preset_library import FRAME_TIME, load_preset_library
+from pulse_compose import CompiledProgram, ComposeCache, ComposeError
+from bounded_cache import BoundedCache
+from pulse_player import PulsePlayer
+from strength_ramp import StrengthRamper, StrengthRampError
+from backplane import create_backplane, run_broker
+from outbound_queue import OutboundQueueManager, get_frame_kind, get_strength_coalesce_key
+from session import SessionGroupStore, StrengthStateStore
+from qr_code import QR_CODE_MEDIA_TYPE_DICT, QrCodeBusyError, QrCodeRenderer
+from metrics import HttpMetricsMiddleware, MetricsRegistry
+from event_hub import EventHub, format_event
+from contextlib import asynccontextmanager
+import codec
+from models import DungeonLabSimpleMessage, DungeonLabStrengthInfo, DungeonLabSessionInfo, DungeonLabSessionGroup, DungeonLabBatchMessage, DungeonLabBatchResult, DungeonLabBatchTargetResult, DungeonLabHeartbeatStats, DungeonLabCacheStats, DungeonLabOutboundStats, DungeonLabPresetInfo, DungeonLabPresetDetail, DungeonLabFeedbackEvent, DungeonLabComposeMessage, DungeonLabComposeResult, DungeonLabStrengthMessage, DungeonLabStrengthRampMessage, DungeonLabClearMessage, DungeonLabPulseMessage, DungeonLabPresetPulseMessage
+from enums import MessageType, ChannelType, FeedbackType, OutboundFrameKind, OverflowPolicy
+import uvicorn
 from uvicorn import Config, Server
-from typing import Optional
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+from fastapi import Depends, FastAPI, HTTPException, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 
 # region Server
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 在后台线程中提前检测本机地址，避免首个客户端连接时阻塞事件循环
+    asyncio.get_running_loop().run_in_executor(None, config.get_client_host)
+    preset_cache.warm_up(utils.get_preset_wave_data_dict())
+    await backplane.start(on_backplane_deliver)
+    heartbeat_scheduler.start()
+    yield
+    await heartbeat_scheduler.stop()
+    await backplane.stop()
+    await pulse_player.stop()
+    await strength_ramper.stop()
+    event_hub.close_all()
+    outbound_queue_manager.close_all()
+    qr_code_renderer.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 server: Optional[Server] = None
+GRACEFUL_SHUTDOWN_TIMEOUT = 3  # 事件订阅等长连接不会自行结束，关闭服务时最多等待的秒数
+DROP_CLOSE_TIMEOUT = 1  # 主动断开连接时等待关闭握手的秒数
 temp_client_id: Optional[str] = None
-strength_a = 0
-strength_b = 0
-strength_limit_a = 0
-strength_limit_b = 0
+
+
+def has_child_process() -> bool:
+    return config.WORKERS > 1 or (config.BACKPLANE == "socket" and config.BACKPLANE_BROKER)
 
 
 def server_run():
     global server
-    server = Server(Config(app=app, host=config.WS_SERVER_HOST, port=config.WS_SERVER_PORT))
+    if has_child_process() and config.BACKPLANE_BROKER:
+        broker_process = multiprocessing.Process(target=run_broker, args=(config.BACKPLANE_ADDRESS,))
+        broker_process.daemon = True
+        broker_process.start()
+    if config.WORKERS > 1:
+        # 多 worker 时由 uvicorn 按模块路径在各子进程中分别导入 app，连接经背板互通
+        uvicorn.run("server:app", host=config.WS_SERVER_HOST, port=config.WS_SERVER_PORT,
+                    workers=config.WORKERS, app_dir=config.get_base_path(), timeout_graceful_shutdown=GRACEFUL_SHUTDOWN_TIMEOUT)
+        return
+    server = Server(Config(app=app, host=config.WS_SERVER_HOST, port=config.WS_SERVER_PORT,
+                           timeout_graceful_shutdown=GRACEFUL_SHUTDOWN_TIMEOUT))
     server.run()
 
 
@@ -41,137 +87,229 @@ async def websocket_endpoint(websocket: WebSocket, full_path: str):
     await websocket.accept()
     await on_client_connected(websocket, full_path)
     try:
-        heartbeat_task = asyncio.create_task(send_heartbeat(websocket))
         while True:
             message = await websocket.receive_text()
+            heartbeat_scheduler.touch(websocket)
             await on_receive_message(websocket, message)
     except WebSocketDisconnect:
-        await on_client_disconnected(websocket)
+        pass
     finally:
-        heartbeat_task.cancel()
+        await on_client_disconnected(websocket)
 # endregion
 
 
 # region ClientManager
-client_dict = {}  # {uid:websocket}
-relationship_dict = {}  # {client_id:target_id}
+registry = ClientRegistry()
+preset_cache = PresetFrameCache(config.PRESET_CACHE_SIZE, config.PRESET_CACHE_MEMORY_MB * 1024 * 1024)
+preset_library = load_preset_library(config.PRESET_LIBRARY)
+compose_cache = ComposeCache(lambda preset: get_preset_str(preset), config.COMPOSE_CACHE_SIZE, config.COMPOSE_MAX_FRAMES,
+                             config.COMPOSE_CACHE_MEMORY_MB * 1024 * 1024)
+strength_store = StrengthStateStore()
+group_store = SessionGroupStore()
+qr_code_renderer = QrCodeRenderer(config.QR_CODE_MODE, config.QR_CODE_CACHE_SIZE, config.QR_CODE_MAX_PENDING)
+event_hub = EventHub(config.EVENT_BUFFER_SIZE, config.EVENT_KEEPALIVE_INTERVAL)
 
 
 def clear_client_dict():
-    client_dict.clear()
-    relationship_dict.clear()
+    registry.clear()
 
 
 def add_client(websocket: WebSocket) -> str:
     global temp_client_id
-    if websocket not in client_dict.values():
-        uid = str(uuid.uuid4())
-        client_dict[uid] = websocket
-        if temp_client_id is None:
-            temp_client_id = uid
+    uid = registry.add(websocket)
+    backplane.register(uid)
+    if config.OUTBOUND_QUEUE_SIZE > 0:
+        outbound_queue_manager.open(websocket)
+    # 多 worker 时各进程首个连接的不一定是内置客户端，不设置临时客户端
+    if temp_client_id is None and config.WORKERS <= 1:
+        temp_client_id = uid
     return uid
 
 
-def remove_client(websocket: WebSocket):
-    for uid, ws in client_dict.items():
-        if ws == websocket:
-            del client_dict[uid]
-            break
-    for client_id, target_id in relationship_dict.items():
-        if client_id == uid or target_id == uid:
-            del relationship_dict[client_id]
-            break
+def remove_client(websocket: WebSocket) -> Optional[str]:
+    global temp_client_id
+    uid = registry.remove(websocket)
+    if uid is not None:
+        backplane.unregister(uid)
+        if uid == temp_client_id:
+            temp_client_id = None
+    return uid
 
 
 def get_client_websocket(uid) -> Optional[WebSocket]:
-    if uid in client_dict:
-        return client_dict[uid]
-    return None
+    return registry.get_websocket(uid)
 
 
 def get_client_uid(websocket: WebSocket) -> Optional[str]:
-    for uid, ws in client_dict.items():
-        if ws == websocket:
-            return uid
-    return None
+    return registry.get_uid(websocket)
 
 
 def get_target_id_by_client_id(client_id: str) -> Optional[str]:
-    if client_id in relationship_dict:
-        return relationship_dict[client_id]
-    return None
+    return registry.get_target_id(client_id)
 
 
 def get_client_id_by_target_id(target_id: str) -> Optional[str]:
-    for client_id, target in relationship_dict.items():
-        if target == target_id:
-            return client_id
-    return None
+    return registry.get_client_id(target_id)
 
 
 def bind_client(client_id: str, target_id: str):
-    relationship_dict[client_id] = target_id
+    backplane.bind(client_id, target_id)
+
+
+def get_session(session_id: Optional[str]) -> Optional[Tuple[str, str]]:
+    '''
+    会话即一组绑定关系，session_id 可为任一方的 uid，返回 (client_id, target_id)
+    '''
+    if not session_id:
+        return None
+    return registry.get_pair(session_id)
+
+
+def get_temp_session() -> Optional[Tuple[str, str]]:
+    return get_session(temp_client_id)
+
+
+def require_temp_client():
+    '''
+    不区分会话的旧版请求只作用于内置客户端，多 worker 时无法确定内置客户端所在进程，返回 409
+    '''
+    if config.WORKERS > 1:
+        raise HTTPException(status_code=409, detail="Temp client endpoints are disabled when WORKERS > 1, use the session endpoints")
+
+
+def get_session_or_404(session_id: str) -> Tuple[str, str]:
+    session = get_session(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+    return session
+
+
+async def drop_client(websocket: WebSocket):
+    '''
+    先注销连接并通知绑定的另一方再关闭，发送卡住的连接可能无法完成关闭握手，关闭最多等待 DROP_CLOSE_TIMEOUT 秒
+    '''
+    await on_client_disconnected(websocket)
+    try:
+        await asyncio.wait_for(websocket.close(), DROP_CLOSE_TIMEOUT)
+    except Exception:
+        pass
+# endregion
+
+
+# region Metrics
+metrics_registry = MetricsRegistry()
+metrics_connections_opened = metrics_registry.counter("dglab_connections_opened_total", "WebSocket connections accepted")
+metrics_connections_closed = metrics_registry.counter("dglab_connections_closed_total", "WebSocket connections closed")
+metrics_frames_received = metrics_registry.counter("dglab_frames_received_total", "Frames received from clients", ("type",))
+metrics_frames_relayed = metrics_registry.counter("dglab_frames_relayed_total", "Frames relayed to the bound peer", ("type",))
+metrics_decode_errors = metrics_registry.counter("dglab_decode_errors_total", "Frames that failed to decode")
+metrics_frames_sent = metrics_registry.counter("dglab_frames_sent_total", "Frames written to WebSocket connections")
+metrics_send_errors = metrics_registry.counter("dglab_send_errors_total", "Failed WebSocket writes")
+metrics_send_latency = metrics_registry.histogram("dglab_send_latency_seconds", "Time spent in a single WebSocket write")
+metrics_handle_latency = metrics_registry.histogram("dglab_receive_handle_latency_seconds", "Time spent handling a received frame")
+metrics_http_requests = metrics_registry.counter("dglab_http_requests_total", "HTTP requests", ("method", "path", "status"))
+metrics_http_latency = metrics_registry.histogram("dglab_http_request_latency_seconds", "HTTP request latency", ("method", "path"))
+metrics_registry.gauge("dglab_connections", "Connections on this process", lambda: len(registry))
+metrics_registry.gauge("dglab_bound_pairs", "Bound client and APP pairs", lambda: len(registry.client_to_target))
+metrics_registry.gauge("dglab_outbound_queue_depth", "Frames waiting in outbound queues",
+                       lambda: sum(len(queue) for _, queue in outbound_queue_manager.items()))
+metrics_registry.gauge("dglab_outbound_dropped_total", "Frames dropped by outbound queues",
+                       lambda: outbound_queue_manager.get_dropped_count(), metric_type="counter")
+metrics_registry.gauge("dglab_heartbeat_sent_total", "Heartbeats sent", lambda: heartbeat_scheduler.stats.sent_count, metric_type="counter")
+metrics_registry.gauge("dglab_heartbeat_failed_total", "Heartbeats that failed to send",
+                       lambda: heartbeat_scheduler.stats.failed_count, metric_type="counter")
+metrics_registry.gauge("dglab_heartbeat_dropped_total", "Connections dropped by the heartbeat scheduler",
+                       lambda: heartbeat_scheduler.stats.dropped_count, metric_type="counter")
+metrics_registry.gauge("dglab_event_subscribers", "Open strength and feedback event subscriptions", lambda: event_hub.get_subscriber_count())
+
+
+app.add_middleware(HttpMetricsMiddleware, requests=metrics_http_requests, latency=metrics_http_latency)
+
+
+@app.get("/metrics")
+async def on_get_metrics():
+    return Response(content=metrics_registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 # endregion
 
 
 # region Handlers
+async def get_client_host() -> str:
+    '''
+    已检测到时直接返回，否则在后台线程中等待检测完成，检测期间不阻塞事件循环
+    '''
+    if config.WS_CLIENT_HOST:
+        return config.WS_CLIENT_HOST
+    return await asyncio.get_running_loop().run_in_executor(None, config.get_client_host)
+
+
 async def on_client_connected(websocket: WebSocket, full_path: str):
     uid = add_client(websocket)
+    metrics_connections_opened.inc()
+    heartbeat_scheduler.touch(websocket)
     custom_logger.info(f"【Server】 Client {uid} connected to {full_path}")
     await send_dg_message(websocket, enums.MessageType.BIND, uid, "", "targetId")
     if not full_path.strip():
-        qr_code_str = utils.get_qr_code_str(config.WS_CLIENT_HOST, config.WS_SERVER_PORT, uid)
-        custom_logger.debug(f"【Server】 QR code string: {qr_code_str}")
-        utils.show_qr_code(qr_code_str)
+        qr_code_str = utils.get_qr_code_str(await get_client_host(), config.WS_SERVER_PORT, uid)
+        custom_logger.debug("【Server】 QR code string: %s", qr_code_str)
+        qr_code_renderer.show(uid, qr_code_str)
+        if config.QR_CODE_MODE == "headless":
+            custom_logger.info(f"【Server】 QR code image: /dungeon_lab_qr_code/{uid}")
 
 
 async def on_client_disconnected(websocket):
+    heartbeat_scheduler.forget(websocket)
+    outbound_queue_manager.close(websocket)
     uid = get_client_uid(websocket)
+    if uid is None:
+        return
     custom_logger.info(f"【Server】 Client {uid} disconnected")
-    if uid is not None:
-        if uid in relationship_dict.keys():
-            target_id = get_target_id_by_client_id(uid)
-            if target_id is not None:
-                target_websocket = get_client_websocket(target_id)
-                await send_dg_message(target_websocket, enums.MessageType.BREAK, uid, target_id, enums.StatusCode.CLIENT_DISCONNECTED.value)
-        if uid in relationship_dict.values():
-            client_id = get_client_id_by_target_id(uid)
-            if client_id is not None:
-                client_websocket = get_client_websocket(client_id)
-                await send_dg_message(client_websocket, enums.MessageType.BREAK, client_id, uid, enums.StatusCode.CLIENT_DISCONNECTED.value)
+    metrics_connections_closed.inc()
+    target_id = get_target_id_by_client_id(uid)
+    client_id = get_client_id_by_target_id(uid)
     remove_client(websocket)
+    qr_code_renderer.forget(uid)
+    strength_store.remove(uid)
+    group_store.discard(uid)
+    pulse_player.cancel(uid)
+    strength_ramper.cancel(uid)
+    event_hub.close(uid, format_event("break", enums.StatusCode.CLIENT_DISCONNECTED.value))
+    try:
+        if target_id is not None:
+            await send_dg_message_to_uid(target_id, enums.MessageType.BREAK, uid, target_id, enums.StatusCode.CLIENT_DISCONNECTED.value)
+        if client_id is not None:
+            await send_dg_message_to_uid(client_id, enums.MessageType.BREAK, client_id, uid, enums.StatusCode.CLIENT_DISCONNECTED.value)
+    except Exception as e:
+        custom_logger.error(f"【Server】 Send break message error: {e}")
 # endregion
 
 
 # region Handlers
 async def on_receive_message(websocket, response):
-    global strength_a, strength_b, strength_limit_a, strength_limit_b, temp_client_id
+    start_time = time.perf_counter()
     try:
         uid = get_client_uid(websocket)
         try:
-            custom_logger.debug(f"【Server】 Receive client {uid} message: {response}")
-            data = DungeonLabMessage.model_validate_json(json_data=response)
-        except json.JSONDecodeError:
+            custom_logger.debug("【Server】 Receive client %s message: %s", uid, response)
+            data = codec.decode_message(response)
+        except ValueError:
+            data = None
+            metrics_decode_errors.inc()
             await send_dg_message(websocket, enums.MessageType.MSG, "", "", enums.StatusCode.INVALID_JSON_FORMAT.value)
         if data:
             type = data.type
+            metrics_frames_received.inc(type.value)
             message = data.message
             client_id = data.clientId
             target_id = data.targetId
             if type == enums.MessageType.BIND:
                 await on_receive_bind_type_message(websocket, client_id, target_id, message)
             elif type == enums.MessageType.MSG:
-                if temp_client_id:
-                    temp_target_id = get_target_id_by_client_id(temp_client_id)
-                    if temp_target_id and client_id == temp_client_id and uid == temp_target_id:
-                        if message.startswith("strength"):
-                            strength_arr = message.split("-")
-                            strength_str = strength_arr[1]
-                            strength_value_arr = strength_str.split("+")
-                            strength_a = int(strength_value_arr[0])
-                            strength_b = int(strength_value_arr[1])
-                            strength_limit_a = int(strength_value_arr[2])
-                            strength_limit_b = int(strength_value_arr[3])
+                if message.startswith("strength") and uid is not None and client_id == get_client_id_by_target_id(uid):
+                    if strength_store.get_or_create(uid).update_from_message(message) and event_hub.is_subscribed(uid):
+                        event_hub.publish_strength(uid, get_strength_event(uid))
+                elif message.startswith("feedback-") and uid is not None and client_id == get_client_id_by_target_id(uid):
+                    if event_hub.is_subscribed(uid):
+                        on_receive_feedback_message(uid, message)
             elif type == enums.MessageType.HEARTBEAT:
                 pass
             elif type == enums.MessageType.BREAK:
@@ -181,27 +319,39 @@ async def on_receive_message(websocket, response):
             elif type == enums.MessageType.CUSTOM:
                 await on_receive_custom_message(websocket, client_id, target_id, message)
             if type != enums.MessageType.CUSTOM and uid is not None:
-                if uid in relationship_dict.keys():
-                    target_id = get_target_id_by_client_id(uid)
-                    if target_id is not None:
-                        target_websocket = get_client_websocket(target_id)
-                        await send_dg_message(target_websocket, type, uid, target_id, message)
-                if uid in relationship_dict.values():
-                    client_id = get_client_id_by_target_id(uid)
-                    if client_id is not None:
-                        client_websocket = get_client_websocket(client_id)
-                        await send_dg_message(client_websocket, type, client_id, uid, message)
+                target_id = get_target_id_by_client_id(uid)
+                if target_id is not None:
+                    if type == enums.MessageType.MSG:
+                        on_send_msg_to_target(target_id, message)
+                    await send_dg_message_to_uid(target_id, type, uid, target_id, message)
+                    metrics_frames_relayed.inc(type.value)
+                client_id = get_client_id_by_target_id(uid)
+                if client_id is not None:
+                    await send_dg_message_to_uid(client_id, type, client_id, uid, message)
+                    metrics_frames_relayed.inc(type.value)
     except Exception as e:
         custom_logger.error(f"【Server】 Error processing message: {e}")
+    finally:
+        metrics_handle_latency.observe(time.perf_counter() - start_time)
+
+
+def on_receive_feedback_message(uid: str, message: str):
+    try:
+        feedback = FeedbackType(message[len("feedback-"):])
+    except ValueError:
+        return
+    channel = ChannelType.A if feedback.name.endswith("_A") else ChannelType.B
+    event = DungeonLabFeedbackEvent(button=feedback.value, name=feedback.name, channel=channel)
+    event_hub.publish_event(uid, format_event("feedback", event.model_dump_json()))
 
 
 async def on_receive_bind_type_message(websocket, client_id, target_id, message):
-    is_client_id_exist = client_id in client_dict.keys()
-    is_target_id_exist = target_id in client_dict.keys()
+    is_client_id_exist = backplane.is_online(client_id)
+    is_target_id_exist = backplane.is_online(target_id)
     if not is_client_id_exist or not is_target_id_exist:
         await send_dg_message(websocket, enums.MessageType.BIND, client_id, target_id, enums.StatusCode.TARGET_CLIENT_NOT_FOUND.value)
-    is_client_id_bind = client_id in relationship_dict.keys() or client_id in relationship_dict.values()
-    is_target_id_bind = target_id in relationship_dict.keys() or target_id in relationship_dict.values()
+    is_client_id_bind = registry.is_bound(client_id)
+    is_target_id_bind = registry.is_bound(target_id)
     if is_client_id_bind or is_target_id_bind:
         await send_dg_message(websocket, enums.MessageType.MSG, client_id, target_id, enums.StatusCode.ID_ALREADY_BOUND.value)
     else:
@@ -216,52 +366,317 @@ async def on_receive_custom_message(websocket, client_id: str, target_id: str, m
             channel_str = match.group(1)
             channel = ChannelType[channel_str]
             preset = match.group(2)
-            preset_pulse_section_list = utils.get_preset_pulse_section_str_list(preset)
-            target_websocket = get_client_websocket(target_id)
-            for section in preset_pulse_section_list:
-                pulse_str = utils.get_pulse_str(channel, section)
-                await send_dg_message(target_websocket, enums.MessageType.MSG, client_id, target_id, pulse_str)
+            try:
+                await send_preset(client_id, target_id, channel, preset)
+            except PresetError as e:
+                custom_logger.warning(f"【Server】 Client {client_id} sent {e}")
 
 
-@app.post("/dungeon_lab_message")
+@app.post("/dungeon_lab_message", dependencies=[Depends(require_temp_client)])
 async def on_post_dungeon_lab_message(dungeon_lab_message: DungeonLabSimpleMessage):
     await send_dg_message_to_temp_target(dungeon_lab_message.type, dungeon_lab_message.message)
 
 
-@app.post("/dungeon_lab_strength_message")
+@app.post("/dungeon_lab_strength_message", dependencies=[Depends(require_temp_client)])
 async def on_post_dungeon_lab_strength_message(pulse_message: DungeonLabStrengthMessage):
     strength_str = utils.get_strength_str(pulse_message.channel, pulse_message.mode, pulse_message.value)
     await send_dg_message_to_temp_target(MessageType.MSG, strength_str)
 
 
-@app.post("/dungeon_lab_clear_message")
+@app.post("/dungeon_lab_strength_ramp_message", dependencies=[Depends(require_temp_client)])
+async def on_post_dungeon_lab_strength_ramp_message(ramp_message: DungeonLabStrengthRampMessage):
+    session = get_temp_session()
+    if session:
+        start_strength_ramp(session[0], session[1], ramp_message)
+
+
+@app.post("/dungeon_lab_clear_message", dependencies=[Depends(require_temp_client)])
 async def on_post_dungeon_lab_clear_message(pulse_message: DungeonLabClearMessage):
     clear_str = utils.get_clear_str(pulse_message.channel)
     await send_dg_message_to_temp_target(MessageType.MSG, clear_str)
 
 
-@app.post("/dungeon_lab_pulse_message")
+@app.post("/dungeon_lab_pulse_message", dependencies=[Depends(require_temp_client)])
 async def on_post_dungeon_lab_pulse_message(pulse_message: DungeonLabPulseMessage):
     pulse_str = utils.get_pulse_str(pulse_message.channel, pulse_message.pulse)
     await send_dg_message_to_temp_target(MessageType.MSG, pulse_str)
 
 
-@app.post("/dungeon_lab_preset_pulse_message")
+@app.post("/dungeon_lab_preset_pulse_message", dependencies=[Depends(require_temp_client)])
 async def on_post_dungeon_lab_preset_pulse_message(pulse_message: DungeonLabPresetPulseMessage):
-    section_pulse_list = utils.get_preset_pulse_section_str_list(pulse_message.preset)
-    for section_pulse in section_pulse_list:
-        pulse_str = utils.get_pulse_str(pulse_message.channel, section_pulse)
-        await send_dg_message_to_temp_target(MessageType.MSG, pulse_str)
+    check_preset_or_400(pulse_message.preset)
+    await send_preset_to_temp_target(pulse_message.channel, pulse_message.preset)
+
+
+@app.post("/dungeon_lab_compose_message", dependencies=[Depends(require_temp_client)])
+async def on_post_dungeon_lab_compose_message(compose_message: DungeonLabComposeMessage):
+    compiled_list = compile_composition(compose_message)
+    await send_composition_to_temp_target(compiled_list)
+    return get_composition_result(compiled_list)
 
 
-@app.get("/dungeon_lab_temp_strength_info")
+@app.get("/dungeon_lab_temp_strength_info", dependencies=[Depends(require_temp_client)])
 async def on_get_dungeon_lab_temp_strength_info():
-    global strength_a, strength_b, strength_limit_a, strength_limit_b
+    session = get_temp_session()
+    return get_strength_info(session[1] if session else None)
+
+
+@app.get("/dungeon_lab_temp_events", dependencies=[Depends(require_temp_client)])
+async def on_get_dungeon_lab_temp_events():
+    session = get_temp_session()
+    if session is None:
+        raise HTTPException(status_code=404, detail="Temp client is not bound")
+    return get_event_stream_response(session[1])
+
+
+@app.get("/dungeon_lab_sessions")
+async def on_get_dungeon_lab_sessions():
+    return [DungeonLabSessionInfo(clientId=client_id, targetId=target_id) for client_id, target_id in registry.get_pair_list()]
+
+
+@app.post("/dungeon_lab_message/{session_id}")
+async def on_post_session_dungeon_lab_message(session_id: str, dungeon_lab_message: DungeonLabSimpleMessage):
+    client_id, target_id = get_session_or_404(session_id)
+    await send_dg_message_to_session(client_id, target_id, dungeon_lab_message.type, dungeon_lab_message.message)
+
+
+@app.post("/dungeon_lab_strength_message/{session_id}")
+async def on_post_session_dungeon_lab_strength_message(session_id: str, pulse_message: DungeonLabStrengthMessage):
+    client_id, target_id = get_session_or_404(session_id)
+    strength_str = utils.get_strength_str(pulse_message.channel, pulse_message.mode, pulse_message.value)
+    await send_dg_message_to_session(client_id, target_id, MessageType.MSG, strength_str)
+
+
+@app.post("/dungeon_lab_strength_ramp_message/{session_id}")
+async def on_post_session_dungeon_lab_strength_ramp_message(session_id: str, ramp_message: DungeonLabStrengthRampMessage):
+    client_id, target_id = get_session_or_404(session_id)
+    start_strength_ramp(client_id, target_id, ramp_message)
+
+
+@app.post("/dungeon_lab_clear_message/{session_id}")
+async def on_post_session_dungeon_lab_clear_message(session_id: str, pulse_message: DungeonLabClearMessage):
+    client_id, target_id = get_session_or_404(session_id)
+    clear_str = utils.get_clear_str(pulse_message.channel)
+    await send_dg_message_to_session(client_id, target_id, MessageType.MSG, clear_str)
+
+
+@app.post("/dungeon_lab_pulse_message/{session_id}")
+async def on_post_session_dungeon_lab_pulse_message(session_id: str, pulse_message: DungeonLabPulseMessage):
+    client_id, target_id = get_session_or_404(session_id)
+    pulse_str = utils.get_pulse_str(pulse_message.channel, pulse_message.pulse)
+    await send_dg_message_to_session(client_id, target_id, MessageType.MSG, pulse_str)
+
+
+@app.post("/dungeon_lab_preset_pulse_message/{session_id}")
+async def on_post_session_dungeon_lab_preset_pulse_message(session_id: str, pulse_message: DungeonLabPresetPulseMessage):
+    client_id, target_id = get_session_or_404(session_id)
+    check_preset_or_400(pulse_message.preset)
+    await send_preset(client_id, target_id, pulse_message.channel, pulse_message.preset)
+
+
+@app.post("/dungeon_lab_compose_message/{session_id}")
+async def on_post_session_dungeon_lab_compose_message(session_id: str, compose_message: DungeonLabComposeMessage):
+    client_id, target_id = get_session_or_404(session_id)
+    compiled_list = compile_composition(compose_message)
+    await send_composition(client_id, target_id, compiled_list)
+    return get_composition_result(compiled_list)
+
+
+@app.get("/dungeon_lab_strength_info/{session_id}")
+async def on_get_session_dungeon_lab_strength_info(session_id: str):
+    _, target_id = get_session_or_404(session_id)
+    return get_strength_info(target_id)
+
+
+@app.get("/dungeon_lab_events/{session_id}")
+async def on_get_session_dungeon_lab_events(session_id: str):
+    _, target_id = get_session_or_404(session_id)
+    return get_event_stream_response(target_id)
+
+
+@app.post("/dungeon_lab_group")
+async def on_post_dungeon_lab_group(session_group: DungeonLabSessionGroup):
+    if not session_group.name:
+        raise HTTPException(status_code=400, detail="Group name is required")
+    if session_group.sessions:
+        group_store.set(session_group.name, session_group.sessions)
+    else:
+        group_store.remove(session_group.name)
+
+
+@app.get("/dungeon_lab_groups")
+async def on_get_dungeon_lab_groups():
+    return [DungeonLabSessionGroup(name=name, sessions=session_id_list) for name, session_id_list in group_store.items()]
+
+
+@app.post("/dungeon_lab_batch_message")
+async def on_post_dungeon_lab_batch_message(batch_message: DungeonLabBatchMessage):
+    command_list = [command for command in (batch_message.strength, batch_message.clear, batch_message.pulse, batch_message.preset)
+                    if command is not None]
+    if len(command_list) != 1:
+        raise HTTPException(status_code=400, detail="Exactly one of strength, clear, pulse or preset is required")
+    session_id_list = list(batch_message.sessions)
+    if batch_message.group:
+        group = group_store.get(batch_message.group)
+        if group is None:
+            raise HTTPException(status_code=404, detail=f"Group {batch_message.group} not found")
+        session_id_list.extend(group)
+    return await send_batch(session_id_list, get_batch_sender(batch_message))
+
+
+def get_strength_info(target_id: Optional[str]) -> DungeonLabStrengthInfo:
+    state = strength_store.get(target_id) if target_id else None
+    if state is None:
+        return DungeonLabStrengthInfo()
     info = DungeonLabStrengthInfo(
-        strengthA=strength_a,
-        strengthB=strength_b,
-        strengthLimitA=strength_limit_a,
-        strengthLimitB=strength_limit_b
+        strengthA=state.strength_a,
+        strengthB=state.strength_b,
+        strengthLimitA=state.strength_limit_a,
+        strengthLimitB=state.strength_limit_b
+    )
+    return info
+
+
+def get_strength_event(target_id: str) -> str:
+    return format_event("strength", get_strength_info(target_id).model_dump_json())
+
+
+def get_event_stream_response(target_id: str) -> StreamingResponse:
+    '''
+    以 Server-Sent Events 推送 APP 的强度变化与反馈事件，APP 断开时发送 break 事件后结束
+    事件只在 APP 所连接的进程中产生，多 worker 时 APP 连接在其他进程上则返回 409
+    '''
+    if get_client_websocket(target_id) is None:
+        raise HTTPException(status_code=409, detail=f"APP {target_id} is connected to another worker")
+    channel = event_hub.open(target_id, get_strength_event(target_id))
+    return StreamingResponse(event_hub.subscribe(channel), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.get("/dungeon_lab_qr_code/{client_id}")
+async def on_get_dungeon_lab_qr_code(client_id: str, format: str = "png"):
+    media_type = QR_CODE_MEDIA_TYPE_DICT.get(format)
+    if media_type is None:
+        raise HTTPException(status_code=400, detail=f"Unsupported format {format}")
+    try:
+        image = await qr_code_renderer.get_image(client_id, format)
+    except QrCodeBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if image is None:
+        raise HTTPException(status_code=404, detail=f"QR code of client {client_id} not found")
+    return Response(content=image, media_type=media_type)
+
+
+@app.get("/dungeon_lab_presets")
+async def on_get_dungeon_lab_presets(keyword: str = "", offset: int = 0, limit: int = 0):
+    name_list = preset_library.names() + [name for name in utils.get_preset_wave_data_dict() if name not in preset_library]
+    if keyword:
+        name_list = [name for name in name_list if keyword in name]
+    name_list = name_list[offset:offset + limit] if limit > 0 else name_list[offset:]
+    return [get_preset_info(name) for name in name_list]
+
+
+@app.get("/dungeon_lab_presets/{name}")
+async def on_get_dungeon_lab_preset(name: str):
+    info = get_preset_info(name)
+    if info is None:
+        raise HTTPException(status_code=404, detail=f"Preset {name} not found")
+    preset = preset_library.get_preset(name) if name in preset_library else utils.get_preset_wave_data(name)
+    return DungeonLabPresetDetail(**info.model_dump(), preset=preset)
+
+
+builtin_frame_count_dict: Dict[str, int] = {}  # 内置预设波形不会变化，帧数只需计算一次
+
+
+def get_preset_info(name: str) -> Optional[DungeonLabPresetInfo]:
+    if name in preset_library:
+        source = "library"
+        frame_count = preset_library.get_frame_count(name)
+    else:
+        preset = utils.get_preset_wave_data(name)
+        if preset is None:
+            return None
+        source = "builtin"
+        frame_count = builtin_frame_count_dict.get(name)
+        if frame_count is None:
+            frame_count = sum(1 for _ in utils.iter_preset_pulse_frames(preset))
+            builtin_frame_count_dict[name] = frame_count
+    return DungeonLabPresetInfo(name=name, source=source, frameCount=frame_count, duration=round(frame_count * FRAME_TIME, 1))
+
+
+def compile_composition(compose_message: DungeonLabComposeMessage) -> List[Tuple[ChannelType, CompiledProgram]]:
+    program_list = [(ChannelType.A, compose_message.a), (ChannelType.B, compose_message.b)]
+    try:
+        return [(channel, compose_cache.get(program)) for channel, program in program_list if program is not None]
+    except ComposeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def get_composition_result(compiled_list: List[Tuple[ChannelType, CompiledProgram]]) -> DungeonLabComposeResult:
+    frame_count_dict = {channel: len(compiled) for channel, compiled in compiled_list}
+    frame_count_a = frame_count_dict.get(ChannelType.A, 0)
+    frame_count_b = frame_count_dict.get(ChannelType.B, 0)
+    return DungeonLabComposeResult(frameCountA=frame_count_a, frameCountB=frame_count_b,
+                                   duration=round(max(frame_count_a, frame_count_b) * FRAME_TIME, 1))
+
+
+@app.get("/dungeon_lab_compose_cache_stats")
+async def on_get_dungeon_lab_compose_cache_stats():
+    return get_cache_stats(compose_cache.cache)
+
+
+@app.get("/dungeon_lab_heartbeat_stats")
+async def on_get_dungeon_lab_heartbeat_stats():
+    stats = heartbeat_scheduler.stats
+    info = DungeonLabHeartbeatStats(
+        sweepCount=stats.sweep_count,
+        sentCount=stats.sent_count,
+        failedCount=stats.failed_count,
+        droppedCount=stats.dropped_count,
+        lastSweepClients=stats.last_sweep_clients,
+        lastSweepDuration=stats.last_sweep_duration,
+        maxSweepDuration=stats.max_sweep_duration
+    )
+    return info
+
+
+@app.get("/dungeon_lab_preset_cache_stats")
+async def on_get_dungeon_lab_preset_cache_stats():
+    return get_cache_stats(preset_cache.cache)
+
+
+@app.get("/dungeon_lab_decode_cache_stats")
+async def on_get_dungeon_lab_decode_cache_stats():
+    return get_cache_stats(utils.decode_cache)
+
+
+@app.get("/dungeon_lab_outbound_stats")
+async def on_get_dungeon_lab_outbound_stats():
+    stats_list = []
+    for websocket, queue in outbound_queue_manager.items():
+        stats = queue.stats
+        stats_list.append(DungeonLabOutboundStats(
+            clientId=get_client_uid(websocket) or "",
+            depth=len(queue),
+            maxDepth=stats.max_depth,
+            enqueuedCount=stats.enqueued_count,
+            sentCount=stats.sent_count,
+            droppedCount=stats.dropped_count,
+            coalescedCount=stats.coalesced_count
+        ))
+    return stats_list
+
+
+def get_cache_stats(cache: BoundedCache) -> DungeonLabCacheStats:
+    stats = cache.stats
+    info = DungeonLabCacheStats(
+        size=len(cache),
+        maxSize=cache.max_size,
+        memory=cache.memory,
+        maxMemory=cache.max_memory,
+        hitCount=stats.hit_count,
+        missCount=stats.miss_count,
+        evictCount=stats.evict_count
     )
     return info
 # endregion
@@ -269,35 +684,316 @@ async def on_get_dungeon_lab_temp_strength_info():
 
 # region Send
 async def send_dg_message_to_temp_target(type: MessageType, message: str):
-    global temp_client_id
     try:
-        custom_logger.debug(f"【Server】 Send message to temp DG-LAB: {{type:{type.value},message:{message},...}}")
-        if temp_client_id:
-            temp_target_id = get_target_id_by_client_id(temp_client_id)
-            if temp_target_id:
-                ws = get_client_websocket(temp_target_id)
-                await send_dg_message(ws, type, temp_client_id, temp_target_id, message)
+        custom_logger.debug("【Server】 Send message to temp DG-LAB: {type:%s,message:%s,...}", type.value, message)
+        session = get_temp_session()
+        if session:
+            await send_dg_message_to_session(session[0], session[1], type, message)
     except Exception as e:
         custom_logger.error(f"【Server】 Error sending message to temp DG-LAB: {e}")
 
 
-async def send_heartbeat(websocket: WebSocket):
-    while True:
-        await asyncio.sleep(config.HEARTBEAT_INTERVAL)
+async def send_preset_to_temp_target(channel: ChannelType, preset: str):
+    try:
+        session = get_temp_session()
+        if session:
+            await send_preset(session[0], session[1], channel, preset)
+    except Exception as e:
+        custom_logger.error(f"【Server】 Error sending preset to temp DG-LAB: {e}")
+
+
+async def send_composition_to_temp_target(compiled_list: List[Tuple[ChannelType, CompiledProgram]]):
+    try:
+        session = get_temp_session()
+        if session:
+            await send_composition(session[0], session[1], compiled_list)
+    except Exception as e:
+        custom_logger.error(f"【Server】 Error sending composition to temp DG-LAB: {e}")
+
+
+async def send_dg_message_to_session(client_id: str, target_id: str, type: MessageType, message: str):
+    if type == MessageType.MSG:
+        on_send_msg_to_target(target_id, message)
+    await send_dg_message_to_uid(target_id, type, client_id, target_id, message)
+
+
+def resolve_preset(preset: str) -> str:
+    builtin_preset = utils.get_preset_wave_data(preset)
+    return preset if builtin_preset is None else builtin_preset
+
+
+def get_preset_str(preset: str) -> str:
+    if preset in preset_library:
+        return preset_library.get_preset(preset)
+    return resolve_preset(preset)
+
+
+def check_preset(preset: str):
+    '''
+    波形库之外的波形先解析一次(结果会被缓存)，名称不存在或波形字符串格式错误时抛出 PresetError
+    '''
+    if preset in preset_library:
+        return
+    try:
+        utils.simple_decode_dg_pulse_str(resolve_preset(preset))
+    except Exception as e:
+        raise PresetError(f"Invalid preset {preset!r}: {e}")
+
+
+def check_preset_or_400(preset: str):
+    try:
+        check_preset(preset)
+    except PresetError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def get_preset_body_list(preset: str, channel: ChannelType) -> List[str]:
+    '''
+    preset 可为波形库或内置预设波形的名称，也可为 Dungeonlab+pulse: 波形字符串，
+    波形库中的波形直接取映射区中已编码的片段，其余经 preset_cache 编译
+    '''
+    if preset in preset_library:
+        return preset_library.get_body_list(preset, channel)
+    return preset_cache.get(resolve_preset(preset), channel).body_list
+
+
+def iter_preset_frames(preset: str) -> Iterator[str]:
+    if preset in preset_library:
+        return preset_library.iter_frames(preset)
+    return utils.iter_preset_pulse_frames(resolve_preset(preset))
+
+
+async def send_preset(client_id: str, target_id: str, channel: ChannelType, preset: str):
+    check_preset(preset)
+    if config.PULSE_STREAM:
+        pulse_player.play(client_id, target_id, channel, iter_preset_frames(preset))
+        return
+    head = codec.get_message_head(MessageType.MSG, client_id, target_id)
+    for body in get_preset_body_list(preset, channel):
+        if not await send_dg_message_json_to_uid(target_id, head + body, OutboundFrameKind.PULSE):
+            break
+
+
+async def send_composition(client_id: str, target_id: str, compiled_list: List[Tuple[ChannelType, CompiledProgram]]):
+    '''
+    A/B 通道的合成波形各自独立播放，非流式发送时两个通道的消息依次全部发出，由 APP 的波形队列同时播放
+    '''
+    if config.PULSE_STREAM:
+        for channel, compiled in compiled_list:
+            pulse_player.play(client_id, target_id, channel, iter(compiled.frame_list))
+        return
+    head = codec.get_message_head(MessageType.MSG, client_id, target_id)
+    for channel, compiled in compiled_list:
+        for body in compiled.get_body_list(channel):
+            if not await send_dg_message_json_to_uid(target_id, head + body, OutboundFrameKind.PULSE):
+                return
+
+
+def get_batch_sender(batch_message: DungeonLabBatchMessage) -> Callable[[str, str], Awaitable[None]]:
+    '''
+    将批量消息预先编码为与目标无关的 Json 片段，返回向单个 (client_id, target_id) 发送的协程函数
+    '''
+    message = None
+    kind = OutboundFrameKind.PULSE
+    key = None
+    if batch_message.preset is not None:
+        channel = batch_message.preset.channel
+        preset = batch_message.preset.preset
+        try:
+            check_preset(preset)
+        except PresetError as e:
+            error = e
+
+            # 波形无效时每个目标都记为失败，不影响批量请求本身
+            async def reject(client_id: str, target_id: str):
+                raise error
+            return reject
+        if config.PULSE_STREAM:
+            frame_list = list(iter_preset_frames(preset))
+
+            async def play(client_id: str, target_id: str):
+                if not backplane.is_online(target_id):
+                    raise ConnectionError("Target not connected")
+                pulse_player.play(client_id, target_id, channel, iter(frame_list))
+            return play
+        body_list = get_preset_body_list(preset, channel)
+    else:
+        if batch_message.strength is not None:
+            command = batch_message.strength
+            message = utils.get_strength_str(command.channel, command.mode, command.value)
+        elif batch_message.clear is not None:
+            message = utils.get_clear_str(batch_message.clear.channel)
+        else:
+            message = utils.get_pulse_str(batch_message.pulse.channel, batch_message.pulse.pulse)
+        body_list = [codec.encode_message_body(m) for m in utils.split_pulse_message(message)]
+        kind = get_frame_kind(MessageType.MSG, message)
+        if kind == OutboundFrameKind.STRENGTH:
+            key = get_strength_coalesce_key(message)
+
+    async def send(client_id: str, target_id: str):
+        if not backplane.is_online(target_id):
+            raise ConnectionError("Target not connected")
+        if message is not None:
+            on_send_msg_to_target(target_id, message)
+        head = codec.get_message_head(MessageType.MSG, client_id, target_id)
+        for body in body_list:
+            if not await send_dg_message_json_to_uid(target_id, head + body, kind, key):
+                raise ConnectionError("Target not connected")
+    return send
+
+
+async def send_batch(session_id_list: List[str], send: Callable[[str, str], Awaitable[None]]) -> DungeonLabBatchResult:
+    '''
+    按会话并发发送，同时进行的发送数不超过 BATCH_SEND_CONCURRENCY，同一 APP 只发送一次
+    '''
+    result_list: List[DungeonLabBatchTargetResult] = []
+    pending_list: List[DungeonLabBatchTargetResult] = []
+    target_id_set = set()
+    for session_id in dict.fromkeys(session_id_list):
+        session = get_session(session_id)
+        if session is None:
+            result_list.append(DungeonLabBatchTargetResult(sessionId=session_id, error="Session not found"))
+        elif session[1] not in target_id_set:
+            target_id_set.add(session[1])
+            result = DungeonLabBatchTargetResult(sessionId=session_id, clientId=session[0], targetId=session[1])
+            result_list.append(result)
+            pending_list.append(result)
+    semaphore = asyncio.Semaphore(max(1, config.BATCH_SEND_CONCURRENCY))
+    timeout = config.BATCH_SEND_TIMEOUT or None
+
+    async def send_to(result: DungeonLabBatchTargetResult):
+        async with semaphore:
+            try:
+                await asyncio.wait_for(send(result.clientId, result.targetId), timeout)
+                result.success = True
+            except asyncio.TimeoutError:
+                result.error = "Timeout"
+            except Exception as e:
+                result.error = str(e) or type(e).__name__
+
+    await asyncio.gather(*(send_to(result) for result in pending_list))
+    success_count = sum(1 for result in result_list if result.success)
+    custom_logger.debug("【Server】 Batch message sent to %d/%d targets", success_count, len(result_list))
+    return DungeonLabBatchResult(total=len(result_list), successCount=success_count, results=result_list)
+
+
+async def send_pulse_frames(client_id: str, target_id: str, channel: ChannelType, frame_list: List[str]) -> bool:
+    for value_str in utils.chunk_pulse_frames(frame_list, utils.get_pulse_value_max_length(channel)):
+        if not await send_dg_message_to_uid(target_id, MessageType.MSG, client_id, target_id, utils.get_pulse_str(channel, value_str)):
+            return False
+    return True
+
+
+def start_strength_ramp(client_id: str, target_id: str, ramp_message: DungeonLabStrengthRampMessage):
+    '''
+    强度信息只保存在 APP 所连接的进程中，APP 尚未上报或连接在其他进程时返回 409
+    '''
+    try:
+        strength_ramper.start(client_id, target_id, ramp_message.channel, ramp_message.value, ramp_message.duration, ramp_message.curve)
+    except StrengthRampError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+async def send_strength_ramp_message(client_id: str, target_id: str, message: str) -> bool:
+    return await send_dg_message_to_uid(target_id, MessageType.MSG, client_id, target_id, message)
+
+
+def on_send_msg_to_target(target_id: str, message: str):
+    if message.startswith("strength-"):
+        # 新的强度指令打断正在进行的渐变
+        try:
+            channel = ChannelType(int(message[len("strength-"):].split("+")[0]))
+        except ValueError:
+            return
+        strength_ramper.cancel(target_id, channel)
+    elif message.startswith("clear-"):
         try:
-            uid = get_client_uid(websocket)
-            if uid:
-                await send_dg_message(websocket, MessageType.HEARTBEAT, uid, "", enums.StatusCode.SUCCESS.value)
-        except Exception as e:
-            print(f"【Server】 Send heartbeat error: {e}")
+            channel = ChannelType(int(message[len("clear-"):]))
+        except ValueError:
+            return
+        pulse_player.cancel(target_id, channel)
+
+
+pulse_player = PulsePlayer(send_pulse_frames, config.PULSE_STREAM_BATCH_FRAMES, config.PULSE_STREAM_LOOKAHEAD)
+strength_ramper = StrengthRamper(send_strength_ramp_message, strength_store.get, config.STRENGTH_RAMP_TICK_RATE)
+
+
+async def send_heartbeat(websocket: WebSocket, uid: str):
+    await send_dg_message(websocket, MessageType.HEARTBEAT, uid, "", enums.StatusCode.SUCCESS.value)
+
+
+backplane = create_backplane(registry)
+async def send_websocket_text(websocket: WebSocket, text: str):
+    start_time = time.perf_counter()
+    try:
+        await websocket.send_text(text)
+    except Exception:
+        metrics_send_errors.inc()
+        raise
+    metrics_send_latency.observe(time.perf_counter() - start_time)
+    metrics_frames_sent.inc()
+
+
+outbound_queue_manager = OutboundQueueManager(drop_client, config.OUTBOUND_QUEUE_SIZE, OverflowPolicy(config.OUTBOUND_OVERFLOW_POLICY),
+                                              config.STRENGTH_COALESCE, send_websocket_text)
+heartbeat_scheduler = HeartbeatScheduler(registry, send_heartbeat, drop_client, config.HEARTBEAT_INTERVAL,
+                                         config.HEARTBEAT_BATCH_SIZE, config.HEARTBEAT_SEND_TIMEOUT, config.HEARTBEAT_TIMEOUT)
+
+
+async def send_dg_message_to_uid(uid: str, type: MessageType, client_id: str, target_id: str, message: str) -> bool:
+    '''
+    向 uid 发送消息，uid 不在本进程时经背板转发，uid 不在线时返回 False
+    '''
+    websocket = get_client_websocket(uid)
+    if websocket is not None:
+        await send_dg_message(websocket, type, client_id, target_id, message)
+        return True
+    message_list = utils.split_pulse_message(message) if type == MessageType.MSG else [message]
+    kind = get_frame_kind(type, message)
+    key = get_strength_coalesce_key(message) if kind == OutboundFrameKind.STRENGTH else None
+    for message in message_list:
+        if not backplane.publish(uid, utils.get_dg_message_json(type, client_id, target_id, message), kind.value, key):
+            return False
+    return True
+
+
+async def send_dg_message_json_to_uid(uid: str, json: str, kind: OutboundFrameKind = OutboundFrameKind.OTHER,
+                                      key: Optional[str] = None) -> bool:
+    websocket = get_client_websocket(uid)
+    if websocket is not None:
+        await send_dg_message_json(websocket, json, kind, key)
+        return True
+    return backplane.publish(uid, json, kind.value, key)
+
+
+async def on_backplane_deliver(uid: str, json: str, kind: int, key: Optional[str]):
+    websocket = get_client_websocket(uid)
+    if websocket is not None:
+        await send_dg_message_json(websocket, json, OutboundFrameKind(kind), key)
 
 
 async def send_dg_message(websocket: Optional[WebSocket], type: MessageType, client_id: str, target_id: str, message: str):
     if websocket is not None:
-        json = utils.get_dg_message_json(type, client_id, target_id, message)
-        uid = get_client_uid(websocket)
-        custom_logger.debug(f"【Server】 Send message to client {uid}: {json}")
-        await websocket.send_text(json)
+        message_list = utils.split_pulse_message(message) if type == MessageType.MSG else [message]
+        kind = get_frame_kind(type, message)
+        key = get_strength_coalesce_key(message) if kind == OutboundFrameKind.STRENGTH else None
+        for message in message_list:
+            json = utils.get_dg_message_json(type, client_id, target_id, message)
+            await send_dg_message_json(websocket, json, kind, key)
+
+
+async def send_dg_message_json(websocket: WebSocket, json: str,
+                               kind: OutboundFrameKind = OutboundFrameKind.OTHER, key: Optional[str] = None):
+    '''
+    连接有发送队列时放入队列后立即返回，否则直接发送
+    '''
+    if custom_logger.is_debug_enabled():
+        custom_logger.debug("【Server】 Send message to client %s: %s", get_client_uid(websocket), json)
+    queue = outbound_queue_manager.get(websocket)
+    if queue is None:
+        await send_websocket_text(websocket, json)
+    elif not queue.put(json, kind, key):
+        raise ConnectionError(f"Client {get_client_uid(websocket)} outbound queue closed")
 # endregion
 
 
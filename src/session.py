@@ -0,0 +1,93 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class StrengthState:
+    '''
+    APP 上报的通道强度信息，按 APP 的 uid 保存
+    '''
+    __slots__ = ("strength_a", "strength_b", "strength_limit_a", "strength_limit_b")
+
+    def __init__(self):
+        self.strength_a = 0
+        self.strength_b = 0
+        self.strength_limit_a = 0
+        self.strength_limit_b = 0
+
+    def update_from_message(self, message: str) -> bool:
+        '''
+        解析 strength-通道A强度+通道B强度+通道A强度上限+通道B强度上限，格式不符时返回 False
+        '''
+        strength_arr = message.split("-")
+        if len(strength_arr) < 2:
+            return False
+        strength_value_arr = strength_arr[1].split("+")
+        if len(strength_value_arr) < 4:
+            return False
+        try:
+            strength_a = int(strength_value_arr[0])
+            strength_b = int(strength_value_arr[1])
+            strength_limit_a = int(strength_value_arr[2])
+            strength_limit_b = int(strength_value_arr[3])
+        except ValueError:
+            return False
+        self.strength_a = strength_a
+        self.strength_b = strength_b
+        self.strength_limit_a = strength_limit_a
+        self.strength_limit_b = strength_limit_b
+        return True
+
+
+class StrengthStateStore:
+    def __init__(self):
+        self.state_dict: Dict[str, StrengthState] = {}
+
+    def __len__(self) -> int:
+        return len(self.state_dict)
+
+    def get(self, target_id: str) -> Optional[StrengthState]:
+        return self.state_dict.get(target_id)
+
+    def get_or_create(self, target_id: str) -> StrengthState:
+        state = self.state_dict.get(target_id)
+        if state is None:
+            state = StrengthState()
+            self.state_dict[target_id] = state
+        return state
+
+    def remove(self, target_id: str):
+        self.state_dict.pop(target_id, None)
+
+    def clear(self):
+        self.state_dict.clear()
+
+
+class SessionGroupStore:
+    '''
+    命名的会话分组，用于批量发送，成员为会话中任一方的 uid
+    '''
+
+    def __init__(self):
+        self.group_dict: Dict[str, Dict[str, None]] = {}
+
+    def __len__(self) -> int:
+        return len(self.group_dict)
+
+    def get(self, name: str) -> Optional[List[str]]:
+        group = self.group_dict.get(name)
+        return None if group is None else list(group)
+
+    def set(self, name: str, session_id_list: Iterable[str]):
+        self.group_dict[name] = dict.fromkeys(session_id_list)
+
+    def remove(self, name: str) -> bool:
+        return self.group_dict.pop(name, None) is not None
+
+    def discard(self, session_id: str):
+        for group in self.group_dict.values():
+            group.pop(session_id, None)
+
+    def items(self) -> List[Tuple[str, List[str]]]:
+        return [(name, list(group)) for name, group in self.group_dict.items()]
+
+    def clear(self):
+        self.group_dict.clear()
@@ -0,0 +1,135 @@
+import asyncio
+import math
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+import custom_logger
+import utils
+from enums import ChannelType, StrengthChangeMode, StrengthRampCurve
+from session import StrengthState
+
+STRENGTH_MAX = 200
+
+
+def get_curve_progress(curve: StrengthRampCurve, t: float) -> float:
+    '''
+    t 为 0 ~ 1 的时间进度，返回 0 ~ 1 的强度进度
+    - LINEAR : 匀速
+    - EASE : 缓入缓出(smoothstep)
+    - STEP : 保持起始强度，结束时跳到目标强度
+    '''
+    if t >= 1:
+        return 1.0
+    if curve == StrengthRampCurve.EASE:
+        return t * t * (3 - 2 * t)
+    if curve == StrengthRampCurve.STEP:
+        return 0.0
+    return t
+
+
+class StrengthRampError(Exception):
+    pass
+
+
+def get_channel_strength(state: StrengthState, channel: ChannelType) -> Tuple[int, int]:
+    '''
+    返回 APP 上报的 (当前强度, 强度上限)
+    '''
+    if channel == ChannelType.A:
+        return state.strength_a, state.strength_limit_a
+    return state.strength_b, state.strength_limit_b
+
+
+class StrengthRamp:
+    def __init__(self, client_id: str, target_id: str, channel: ChannelType, start: int, value: int,
+                 duration: float, curve: StrengthRampCurve):
+        self.client_id = client_id
+        self.target_id = target_id
+        self.channel = channel
+        self.start = start
+        self.value = value
+        self.duration = duration
+        self.curve = curve
+        self.task: Optional[asyncio.Task] = None
+        self.sent_count = 0
+
+
+class StrengthRamper:
+    '''
+    按目标与通道在服务端渐变强度的调度器
+    以 tick_rate 次每秒的频率计算曲线上的强度，只在取整后的强度变化时发送设定强度消息，
+    每次发送前按 APP 最新上报的强度上限限制，同一通道开始新的渐变或 cancel 时停止正在进行的渐变
+    '''
+
+    def __init__(self, send: Callable[[str, str, str], Awaitable[bool]],
+                 get_state: Callable[[str], Optional[StrengthState]], tick_rate: float = 10):
+        self.send = send
+        self.get_state = get_state
+        self.tick_time = 1 / max(1.0, tick_rate)
+        self.ramp_dict: Dict[Tuple[str, ChannelType], StrengthRamp] = {}
+
+    def start(self, client_id: str, target_id: str, channel: ChannelType, value: int,
+              duration: float, curve: StrengthRampCurve = StrengthRampCurve.LINEAR) -> StrengthRamp:
+        '''
+        渐变以 APP 上报的强度为起点并受其强度上限限制，本进程没有该 APP 的上报时抛出 StrengthRampError
+        '''
+        state = self.get_state(target_id)
+        if state is None:
+            raise StrengthRampError(f"No strength reported by {target_id}")
+        self.cancel(target_id, channel)
+        start, _ = get_channel_strength(state, channel)
+        ramp = StrengthRamp(client_id, target_id, channel, start, utils.clamp(value, 0, STRENGTH_MAX), max(0.0, duration), curve)
+        self.ramp_dict[(target_id, channel)] = ramp
+        ramp.task = asyncio.create_task(self._run(ramp))
+        return ramp
+
+    def cancel(self, target_id: str, channel: Optional[ChannelType] = None):
+        channel_list = list(ChannelType) if channel is None else [channel]
+        for channel in channel_list:
+            ramp = self.ramp_dict.pop((target_id, channel), None)
+            if ramp is not None and ramp.task is not None:
+                ramp.task.cancel()
+
+    async def stop(self):
+        task_list = [ramp.task for ramp in self.ramp_dict.values() if ramp.task is not None]
+        for key in list(self.ramp_dict.keys()):
+            self.cancel(*key)
+        for task in task_list:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def is_ramping(self, target_id: str, channel: ChannelType) -> bool:
+        return (target_id, channel) in self.ramp_dict
+
+    async def _run(self, ramp: StrengthRamp):
+        loop = asyncio.get_running_loop()
+        start_time = loop.time()
+        last_value = ramp.start
+        tick_count = max(1, math.ceil(ramp.duration / self.tick_time))
+        try:
+            for tick in range(1, tick_count + 1):
+                # 按计划时间而不是上次唤醒时间计算，避免事件循环繁忙时渐变被拉长
+                delay = start_time + ramp.duration * tick / tick_count - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                progress = get_curve_progress(ramp.curve, tick / tick_count)
+                value = round(ramp.start + (ramp.value - ramp.start) * progress)
+                state = self.get_state(ramp.target_id)
+                if state is None:
+                    break
+                _, limit = get_channel_strength(state, ramp.channel)
+                value = utils.clamp(value, 0, limit)
+                if value == last_value:
+                    continue
+                message = utils.get_strength_str(ramp.channel, StrengthChangeMode.FIXED, value)
+                if not await self.send(ramp.client_id, ramp.target_id, message):
+                    break
+                ramp.sent_count += 1
+                last_value = value
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            custom_logger.error(f"【Server】 Strength ramp to {ramp.target_id} error: {e}")
+        finally:
+            if self.ramp_dict.get((ramp.target_id, ramp.channel)) is ramp:
+                del self.ramp_dict[(ramp.target_id, ramp.channel)]
@@ -1,12 +1,16 @@
+import io
 import math
-import qrcode
-from qrcode.image.pil import PilImage
-from typing import List, Optional
-import qrcode_terminal
+import config
+import custom_logger
+import sys
+from typing import Iterable, Iterator, List, Optional, Tuple
 from pulse_section import PulseSection
 from enums import MessageType, ChannelType, StrengthChangeMode
-from functools import lru_cache
-from models import DungeonLabMessage
+from bounded_cache import BoundedCache
+import codec
+
+
+MESSAGE_MAX_LENGTH = 1950  # APP 收信协议 message 最大长度，超过将返回 StatusCode.MESSAGE_TOO_LONG
 
 
 def get_strength_str(channel: ChannelType, mode: StrengthChangeMode, value: int) -> str:
@@ -21,36 +25,137 @@ def get_pulse_str(channel: ChannelType, pulse: str) -> str:
     return f"pulse-{channel.name}:{pulse}"
 
 
+def get_pulse_frames_value_str(frame_list: List[str]) -> str:
+    return f"[{','.join(frame_list)}]"
+
+
+def split_pulse_message(message: str, max_length: int = MESSAGE_MAX_LENGTH) -> List[str]:
+    '''
+    将超长的 pulse-通道:[...] 消息按帧切分为尽量少的多条消息，每条长度不超过 max_length
+    非 pulse 消息、未超长或格式无法解析的消息原样返回
+    '''
+    if len(message) <= max_length or not message.startswith("pulse-"):
+        return [message]
+    head_end = message.find(":")
+    if head_end < 0:
+        return [message]
+    head = message[:head_end + 1]
+    value = message[head_end + 1:].strip()
+    if len(value) < 2 or value[0] != "[" or value[-1] != "]":
+        return [message]
+    frame_list = [frame.strip() for frame in value[1:-1].split(",")]
+    value_max_length = max_length - len(head)
+    if any(len(frame) + 2 > value_max_length for frame in frame_list):
+        return [message]
+    return [head + chunk for chunk in chunk_pulse_frames(frame_list, value_max_length)]
+
+
+def get_pulse_value_max_length(channel: ChannelType) -> int:
+    '''
+    单条 pulse 消息中波形数据值字符串的最大长度
+    '''
+    return MESSAGE_MAX_LENGTH - len(get_pulse_str(channel, ""))
+
+
 def get_preset_pulse_str(channel: ChannelType, preset: str) -> str:
     return f"preset-{channel.value}:{preset}"
 
 
-def get_preset_pulse_section_str_list(preset: str) -> List[str]:
+def get_preset_pulse_section_str_list(preset: str, max_length: Optional[int] = None) -> List[str]:
+    '''
+    获取波形字符串每个小节的波形数据值字符串
+    指定 max_length 时按帧切分，每段形如 ["..","..."] 且长度不超过 max_length
+    '''
     result = []
     section_list = simple_decode_dg_pulse_str(preset)
     for section in section_list:
-        section_str = section.get_pulse_value_str()
-        result.append(section_str)
+        if max_length is None:
+            result.append(get_section_pulse_value_str(section))
+        else:
+            result.extend(chunk_pulse_frames(get_section_pulse_frame_list(section), max_length))
     return result
 
 
+def iter_preset_pulse_frames(preset: str) -> Iterator[str]:
+    '''
+    按顺序逐帧生成波形字符串中所有小节的波形帧，每帧形如 "0A0A0A0A00000000"
+    '''
+    for section in simple_decode_dg_pulse_str(preset):
+        yield from iter_section_pulse_frames(section)
+
+
+def chunk_pulse_frames(frame_iter: Iterable[str], max_length: int) -> Iterator[str]:
+    '''
+    将波形帧依次拼接为 ["..","..."] 形式的波形数据值字符串，每段长度不超过 max_length
+    '''
+    frame_list = []
+    length = 2
+    for frame in frame_iter:
+        frame_length = len(frame) + (1 if frame_list else 0)
+        if frame_list and length + frame_length > max_length:
+            yield get_pulse_frames_value_str(frame_list)
+            frame_list = []
+            length = 2
+            frame_length = len(frame)
+        frame_list.append(frame)
+        length += frame_length
+    if frame_list:
+        yield get_pulse_frames_value_str(frame_list)
+
+
+def get_section_pulse_value_str(section: PulseSection) -> str:
+    if pulse_engine is not None:
+        return pulse_engine.get_pulse_value_str(section)
+    return section.get_pulse_value_str()
+
+
+def get_section_pulse_frame_list(section: PulseSection) -> List[str]:
+    if pulse_engine is not None:
+        return pulse_engine.get_pulse_str_list(section)
+    return section.get_pulse_str_list()
+
+
+def iter_section_pulse_frames(section: PulseSection) -> Iterator[str]:
+    '''
+    逐帧生成，首帧无需等待整个小节计算完成，流式发送时使用；NumPy 引擎需要一次算出整个小节，不用于此处
+    '''
+    return section.iter_pulse_str()
+
+
 def get_dg_message_json(type: MessageType, client_id: str, target_id: str, message: str) -> str:
-    data = DungeonLabMessage(
-        type=type,
-        clientId=client_id,
-        targetId=target_id,
-        message=message,
-    )
-    json_str = data.model_dump_json()
-    return json_str
+    return codec.encode_message(type, client_id, target_id, message)
 
 
+# qrcode 与 PIL 导入较慢，只在首次生成二维码时导入，无界面部署不显示二维码时不会加载
 def show_qr_code(qr_code_str: str):
+    import qrcode
+    import qrcode_terminal
+    from qrcode.image.pil import PilImage
     qrcode_terminal.draw(qr_code_str)
     qr_code_img = qrcode.make(qr_code_str, image_factory=PilImage)
     qr_code_img.show()
 
 
+def draw_qr_code_terminal(qr_code_str: str):
+    import qrcode_terminal
+    qrcode_terminal.draw(qr_code_str)
+
+
+def get_qr_code_image(qr_code_str: str, image_format: str = "png") -> bytes:
+    '''
+    生成 png 或 svg 格式的二维码图片数据
+    '''
+    import qrcode
+    if image_format == "svg":
+        from qrcode.image.svg import SvgPathImage as image_factory
+    else:
+        from qrcode.image.pil import PilImage as image_factory
+    qr_code_img = qrcode.make(qr_code_str, image_factory=image_factory)
+    buffer = io.BytesIO()
+    qr_code_img.save(buffer)
+    return buffer.getvalue()
+
+
 def get_qr_code_str(host, port, client_id) -> str:
     return f"https://www.dungeon-lab.com/app-download.php#DGLAB-SOCKET#ws://{host}:{port}/{client_id}"
 
@@ -76,11 +181,29 @@ def clamp(n, min, max):
 
 
 def decimal_to_hex_byte(value: int) -> str:
-    value = clamp(value, 0, 255)
-    return f'{value:02X}'
+    return HEX_BYTE_TABLE[clamp(value, 0, 255)]
 
 
 def get_real_pulse_frequency(value: int) -> int:
+    if 0 <= value <= SLIDER_MAX:
+        return REAL_PULSE_FREQUENCY_TABLE[value]
+    return calc_real_pulse_frequency(value)
+
+
+def get_real_section_time(value: int) -> float:
+    if 0 <= value <= SLIDER_MAX:
+        return REAL_SECTION_TIME_TABLE[value]
+    return calc_real_section_time(value)
+
+
+def get_pulse_frequency_code(value: int) -> int:
+    '''
+    真实频率(10 ~ 1000)转换为 APP 收信协议的频率值(10 ~ 240)
+    '''
+    return PULSE_FREQUENCY_CODE_TABLE[clamp(round(value), FREQUENCY_MIN, FREQUENCY_MAX)]
+
+
+def calc_real_pulse_frequency(value: int) -> int:
     if value <= 0:
         value = 10
     elif value <= 40:
@@ -109,7 +232,7 @@ def get_real_pulse_frequency(value: int) -> int:
     return value
 
 
-def get_real_section_time(value: int) -> float:
+def calc_real_section_time(value: int) -> float:
     result = 0.1
     if value <= 49:
         result = 0.1 + value * 0.1
@@ -138,9 +261,71 @@ def get_real_section_time(value: int) -> float:
     return result
 
 
-@lru_cache(maxsize=None)
-def simple_decode_dg_pulse_str(dg_pulse_str: str) -> List[PulseSection]:
-    result: Optional[List[PulseSection]] = []
+def calc_pulse_frequency_code(value: int) -> int:
+    value = round(value)
+    value = clamp(value, 10, 1000)
+    if value <= 100:
+        value = value
+    elif value <= 600:
+        value = math.floor((value - 100) / 5 + 100)
+    elif value <= 1000:
+        value = math.floor((value - 600) / 10 + 200)
+    else:
+        value = 10
+    value = math.floor(value)
+    value = clamp(value, 10, 240)
+    return value
+
+
+# 滑条值与频率的定义域很小，导入时预先计算查找表
+SLIDER_MAX = 100
+FREQUENCY_MIN = 10
+FREQUENCY_MAX = 1000
+HEX_BYTE_TABLE = [f'{i:02X}' for i in range(256)]
+REAL_PULSE_FREQUENCY_TABLE = [calc_real_pulse_frequency(i) for i in range(SLIDER_MAX + 1)]
+REAL_SECTION_TIME_TABLE = [calc_real_section_time(i) for i in range(SLIDER_MAX + 1)]
+PULSE_FREQUENCY_CODE_TABLE = [0] * FREQUENCY_MIN + [calc_pulse_frequency_code(i) for i in range(FREQUENCY_MIN, FREQUENCY_MAX + 1)]
+
+# pulse_engine 导入时读取上面的查找表，须在查找表之后导入
+pulse_engine = None
+if config.PULSE_ENGINE == "numpy":
+    try:
+        import pulse_engine
+    except ImportError as e:
+        custom_logger.warning(f"NumPy pulse engine unavailable, fallback to python: {e}")
+
+
+decode_cache: BoundedCache[Tuple[PulseSection, ...]] = BoundedCache(
+    config.DECODE_CACHE_SIZE, config.DECODE_CACHE_MEMORY_MB * 1024 * 1024)
+
+
+def simple_decode_dg_pulse_str(dg_pulse_str: str) -> Tuple[PulseSection, ...]:
+    '''
+    解析 APP 导出的波形字符串，结果为冻结的 PulseSection 元组并缓存，调用方不可修改
+    '''
+    result = decode_cache.get(dg_pulse_str)
+    if result is None:
+        result = tuple(decode_dg_pulse_str(dg_pulse_str))
+        for section in result:
+            section.freeze()
+        decode_cache.set(dg_pulse_str, result, get_decode_result_size(dg_pulse_str, result))
+    return result
+
+
+def get_decode_result_size(dg_pulse_str: str, section_tuple: Tuple[PulseSection, ...]) -> int:
+    '''
+    估算解析结果占用的内存(字节)
+    '''
+    size = sys.getsizeof(dg_pulse_str) + sys.getsizeof(section_tuple)
+    for section in section_tuple:
+        size += sys.getsizeof(section) + sys.getsizeof(section.__dict__) + sys.getsizeof(section.pulse_list)
+        for pulse in section.pulse_list:
+            size += sys.getsizeof(pulse) + sys.getsizeof(pulse.__dict__)
+    return size
+
+
+def decode_dg_pulse_str(dg_pulse_str: str) -> List[PulseSection]:
+    result: List[PulseSection] = []
     str_list = dg_pulse_str.split("=")
     prefix_str = str_list[0]
     pulse_config_str = prefix_str.replace("Dungeonlab+pulse:", "")
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 源码为 src 下的平铺模块，与在 src 目录下运行时一样按模块名导入
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
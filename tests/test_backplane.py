@@ -0,0 +1,178 @@
+'''
+背板的连接同步、跨 worker 转发、broker 重启后的重连，以及多进程下的端到端绑定与转发
+'''
+import asyncio
+import multiprocessing
+import os
+import socket
+import backplane
+from client_registry import ClientRegistry
+
+
+async def wait_until(predicate, timeout: float = 5):
+    loop = asyncio.get_running_loop()
+    end_time = loop.time() + timeout
+    while not predicate():
+        assert loop.time() < end_time, "timeout"
+        await asyncio.sleep(0.02)
+
+
+class BrokerRunner:
+    '''
+    在测试的事件循环中运行 broker，stop 时同时关闭所有 worker 连接，与 broker 进程退出时一致
+    '''
+
+    def __init__(self, address: str):
+        self.address = address
+        self.broker = backplane.BackplaneBroker()
+        self.task = None
+
+    async def start(self):
+        if os.path.exists(self.address):
+            os.remove(self.address)
+        self.task = asyncio.create_task(self.broker.serve(self.address))
+        await wait_until(lambda: os.path.exists(self.address))
+
+    async def stop(self):
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        for writer in list(self.broker.writer_set):
+            writer.close()
+
+
+def test_register_bind_and_deliver(tmp_path):
+    async def run():
+        address = str(tmp_path / "backplane.sock")
+        broker = BrokerRunner(address)
+        await broker.start()
+        delivered = []
+
+        async def deliver(uid, text, kind, key):
+            delivered.append((uid, text, kind, key))
+
+        registry_a, registry_b = ClientRegistry(), ClientRegistry()
+        worker_a, worker_b = backplane.SocketBackplane(registry_a, address), backplane.SocketBackplane(registry_b, address)
+        await worker_a.start(deliver)
+        await worker_b.start(deliver)
+        try:
+            registry_a.add(object(), "controller")
+            worker_a.register("controller")
+            registry_b.add(object(), "app")
+            worker_b.register("app")
+            await wait_until(lambda: worker_a.is_online("app") and worker_b.is_online("controller"))
+            worker_a.bind("controller", "app")
+            await wait_until(lambda: registry_b.get_target_id("controller") == "app")
+            assert worker_a.publish("app", "text", 1, "key")
+            await wait_until(lambda: delivered)
+            assert delivered == [("app", "text", 1, "key")]
+            assert not worker_a.publish("unknown", "text")
+            worker_b.unregister("app")
+            await wait_until(lambda: not worker_a.is_online("app"))
+            assert registry_a.get_target_id("controller") is None
+        finally:
+            await worker_a.stop()
+            await worker_b.stop()
+            await broker.stop()
+
+    asyncio.run(run())
+
+
+def test_reconnect_after_broker_restart(tmp_path, monkeypatch):
+    monkeypatch.setattr(backplane, "RECONNECT_MAX_DELAY", 0.2)
+
+    async def run():
+        address = str(tmp_path / "backplane.sock")
+        broker = BrokerRunner(address)
+        await broker.start()
+        delivered = []
+
+        async def deliver(uid, text, kind, key):
+            delivered.append(text)
+
+        registry_a, registry_b = ClientRegistry(), ClientRegistry()
+        worker_a, worker_b = backplane.SocketBackplane(registry_a, address), backplane.SocketBackplane(registry_b, address)
+        await worker_a.start(deliver)
+        await worker_b.start(deliver)
+        try:
+            registry_a.add(object(), "controller")
+            worker_a.register("controller")
+            registry_b.add(object(), "app")
+            worker_b.register("app")
+            await wait_until(lambda: worker_a.is_online("app"))
+            await broker.stop()
+            await wait_until(lambda: not worker_a.is_online("app"))
+            assert not worker_a.publish("app", "lost")
+            broker = BrokerRunner(address)
+            await broker.start()
+            await wait_until(lambda: worker_a.is_online("app") and worker_b.is_online("controller"))
+            assert worker_a.publish("app", "resumed")
+            await wait_until(lambda: delivered)
+            assert delivered == ["resumed"]
+        finally:
+            await worker_a.stop()
+            await worker_b.stop()
+            await broker.stop()
+
+    asyncio.run(run())
+
+
+def test_broker_drops_relay_to_stalled_worker(tmp_path):
+    async def run():
+        address = str(tmp_path / "backplane.sock")
+        runner = BrokerRunner(address)
+        await runner.start()
+        broker = runner.broker
+        registry = ClientRegistry()
+        worker = backplane.SocketBackplane(registry, address)
+
+        async def deliver(uid, text, kind, key):
+            pass
+
+        await worker.start(deliver)
+        # 只注册不读取的 worker
+        _, stalled_writer = await asyncio.open_unix_connection(address)
+        stalled_writer.write(backplane.encode_event({"op": "register", "uid": "stalled"}))
+        await stalled_writer.drain()
+        try:
+            await wait_until(lambda: "stalled" in broker.uid_to_writer and worker.is_online("stalled"))
+            event_writer = broker.uid_to_writer["stalled"]
+            event_writer.buffer_limit = 64 * 1024
+            for _ in range(100):
+                for _ in range(100):
+                    worker.publish("stalled", "x" * 1000)
+                await asyncio.sleep(0.005)
+            await wait_until(lambda: event_writer.dropped_count > 0)
+            assert event_writer.writer.transport.get_write_buffer_size() < event_writer.buffer_limit + 2 * 1024
+        finally:
+            stalled_writer.close()
+            await worker.stop()
+            await runner.stop()
+
+    asyncio.run(run())
+
+
+def get_free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_multi_process_relay(tmp_path):
+    from benchmark import backplane as harness
+    address = str(tmp_path / "backplane.sock")
+    context = multiprocessing.get_context("spawn")
+    process_list = [context.Process(target=backplane.run_broker, args=(address,), daemon=True)]
+    port_list = [get_free_port() for _ in range(harness.WORKER_COUNT)]
+    process_list += [context.Process(target=harness.run_worker, args=(address, port), daemon=True) for port in port_list]
+    for process in process_list:
+        process.start()
+    try:
+        asyncio.run(harness.check(port_list))
+    finally:
+        for process in process_list:
+            process.terminate()
+        for process in process_list:
+            process.join()
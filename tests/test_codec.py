@@ -0,0 +1,54 @@
+'''
+codec 手写的消息编解码与 pydantic 模型的结果一致
+'''
+import uuid
+import pytest
+import codec
+import utils
+from enums import ChannelType, MessageType
+from models import DungeonLabMessage
+
+MESSAGE_LIST = [
+    (MessageType.HEARTBEAT, "200"),
+    (MessageType.BIND, "targetId"),
+    (MessageType.MSG, "strength-10+20+100+100"),
+    (MessageType.MSG, 'pulse-A:["0A0A0A0A00000000"]'),
+    (MessageType.MSG, "含\"引号\\与中文"),
+]
+
+
+@pytest.mark.parametrize("type, message", MESSAGE_LIST)
+def test_encode_matches_pydantic(type: MessageType, message: str):
+    client_id, target_id = str(uuid.uuid4()), str(uuid.uuid4())
+    expected = DungeonLabMessage(type=type, clientId=client_id, targetId=target_id, message=message).model_dump_json()
+    assert codec.encode_message(type, client_id, target_id, message) == expected
+
+
+def test_encode_preset_pulse_matches_pydantic():
+    preset = utils.get_preset_wave_data("心跳节奏")
+    message = utils.get_pulse_str(ChannelType.A, utils.get_preset_pulse_section_str_list(preset)[1])
+    expected = DungeonLabMessage(type=MessageType.MSG, clientId="a", targetId="b", message=message).model_dump_json()
+    assert codec.encode_message(MessageType.MSG, "a", "b", message) == expected
+
+
+@pytest.mark.parametrize("type, message", MESSAGE_LIST)
+def test_decode_round_trip(type: MessageType, message: str):
+    frame = codec.decode_message(codec.encode_message(type, "a", "b", message))
+    assert (frame.type, frame.clientId, frame.targetId, frame.message) == (type, "a", "b", message)
+
+
+@pytest.mark.parametrize("text", ['{"type": "msg", "clientId": "a"}', '{"type": "bind", "clientId": "a", "targetId": 1, "message": "b"}'])
+def test_decode_fallback_matches_pydantic(text: str):
+    try:
+        model = DungeonLabMessage.model_validate_json(json_data=text)
+    except ValueError:
+        with pytest.raises(ValueError):
+            codec.decode_message(text)
+        return
+    frame = codec.decode_message(text)
+    assert (frame.type, frame.clientId, frame.targetId, frame.message) == (model.type, model.clientId, model.targetId, model.message)
+
+
+def test_decode_invalid_json_raises():
+    with pytest.raises(ValueError):
+        codec.decode_message("not json")
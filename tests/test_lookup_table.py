@@ -0,0 +1,30 @@
+'''
+滑条/频率查找表与 NumPy 波形引擎在整个定义域上与原实现一致
+'''
+import pytest
+import utils
+
+
+def test_slider_tables_match_branch_implementations():
+    for value in range(-10, utils.SLIDER_MAX + 11):
+        assert utils.get_real_pulse_frequency(value) == utils.calc_real_pulse_frequency(value), value
+        assert utils.get_real_section_time(value) == utils.calc_real_section_time(value), value
+
+
+def test_frequency_code_table_matches_branch_implementation():
+    for value in range(0, utils.FREQUENCY_MAX + 101):
+        assert utils.get_pulse_frequency_code(value) == utils.calc_pulse_frequency_code(value), value
+
+
+def test_hex_byte_table():
+    for value in range(-10, 266):
+        assert utils.decimal_to_hex_byte(value) == f'{utils.clamp(value, 0, 255):02X}', value
+
+
+def test_numpy_engine_matches_python():
+    pytest.importorskip("numpy")
+    import pulse_engine
+    for name, preset in utils.get_preset_wave_data_dict().items():
+        for section in utils.simple_decode_dg_pulse_str(preset):
+            assert pulse_engine.get_pulse_value_str(section) == section.get_pulse_value_str(), name
+            assert pulse_engine.get_pulse_str_list(section) == section.get_pulse_str_list(), name
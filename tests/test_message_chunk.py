@@ -0,0 +1,65 @@
+'''
+pulse 消息切分的随机性质测试
+- 每条消息长度不超过上限且保留相同的消息头
+- 所有消息按顺序拼接后的波形帧与原消息一致
+- 消息条数与最优切分(动态规划)一致
+'''
+import random
+import pytest
+import utils
+from enums import ChannelType
+
+CASE_COUNT = 500
+
+
+def random_frame(rng: random.Random) -> str:
+    if rng.random() < 0.9:
+        return '"' + "".join(rng.choice("0123456789ABCDEF") for _ in range(16)) + '"'
+    return '"' + "".join(rng.choice("0123456789ABCDEF") for _ in range(rng.randint(0, 40))) + '"'
+
+
+def get_frame_list(message: str):
+    value = message[message.find(":") + 1:]
+    return value[1:-1].split(",")
+
+
+def get_min_message_count(head_length: int, frame_list, max_length: int) -> int:
+    value_max_length = max_length - head_length
+    frame_count = len(frame_list)
+    min_count = [0] + [frame_count + 1] * frame_count
+    for end in range(1, frame_count + 1):
+        length = 1
+        for start in range(end - 1, -1, -1):
+            length += len(frame_list[start]) + 1
+            if length > value_max_length:
+                break
+            min_count[end] = min(min_count[end], min_count[start] + 1)
+    return min_count[frame_count]
+
+
+@pytest.mark.parametrize("seed", range(CASE_COUNT))
+def test_split_pulse_message(seed: int):
+    rng = random.Random(seed)
+    channel = rng.choice(list(ChannelType))
+    frame_list = [random_frame(rng) for _ in range(rng.randint(1, 600))]
+    max_length = rng.choice([utils.MESSAGE_MAX_LENGTH, rng.randint(60, 400)])
+    message = utils.get_pulse_str(channel, utils.get_pulse_frames_value_str(frame_list))
+    message_list = utils.split_pulse_message(message, max_length)
+    if len(message) <= max_length:
+        assert message_list == [message]
+        return
+    head = utils.get_pulse_str(channel, "")
+    assert all(len(m) <= max_length for m in message_list)
+    assert all(m.startswith(head) for m in message_list)
+    assert [f for m in message_list for f in get_frame_list(m)] == frame_list
+    assert len(message_list) == get_min_message_count(len(head), frame_list, max_length)
+
+
+@pytest.mark.parametrize("channel", list(ChannelType))
+def test_preset_messages_fit_protocol_limit(channel: ChannelType):
+    max_length = utils.get_pulse_value_max_length(channel)
+    for name, preset in utils.get_preset_wave_data_dict().items():
+        frame_list = list(utils.iter_preset_pulse_frames(preset))
+        chunk_list = utils.get_preset_pulse_section_str_list(preset, max_length)
+        assert all(len(utils.get_pulse_str(channel, chunk)) <= utils.MESSAGE_MAX_LENGTH for chunk in chunk_list), name
+        assert [f for chunk in chunk_list for f in chunk[1:-1].split(",")] == frame_list, name